@@ -1,77 +1,607 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, g, stream_with_context
 from flask_cors import CORS
 import mysql.connector
-import face_recognition
 import numpy as np
-import pickle
 import base64
+import binascii
+import csv
 import cv2
-from datetime import datetime
+import io
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from threading import Lock
 
+from gallery import GalleryMatcher
+from gallery_shards import GalleryShards
+from face_index import load_or_build_index
+from face_codec import decode_encoding, decode_many, encode_encoding
+from gallery_snapshot import load_snapshot, write_snapshot
+from face_samples import add_sample, build_store, fetch_samples, group_samples
+from migrations import current_version
+from db_pool import PoolTimeout, db_connection, get_pool
+from attendance_writer import AttendanceWriter
+from attendance_summary import read_summary
+from face_pipeline import check_and_encode, detect_and_encode, detect_and_encode_group, detect_faces
+from face_quality import REASON_MESSAGES, LowQualityFace
+from face_tracker import KioskSessions
+from enrollment_script import ENROLL_QUALITY
+from inference_pool import InferenceBusy, InferencePool
+from metrics import (ABSENSI_OUTCOMES, KIOSK_FRAMES, REQUEST_SECONDS, STAGE_SECONDS, observe_stages, render_gauges,
+                     render_stats)
+from profiler import SamplingProfiler
+from ref_cache import (ALL_CACHES, KEGIATAN_CACHE, LOKASI_CACHE, WBS_LIST_CACHE, cache_metrics, invalidate_lokasi,
+                       invalidate_wbs_list)
+
 app = Flask(__name__)
 CORS(app)
 
-# --- KONFIGURASI DATABASE ---
-DB_CONFIG = {
-    'user': 'root',
-    'password': '',  # sesuaikan jika kamu pakai password MySQL
-    'host': 'localhost',
-    'database': 'psbr_tarunajaya2'
-}
+# --- BATAS UKURAN FRAME ---
+MAX_FRAME_BYTES = 2 * 1024 * 1024
+# Base64 di JSON lama ~33% lebih besar, ditambah sedikit ruang untuk field lain
+app.config['MAX_CONTENT_LENGTH'] = MAX_FRAME_BYTES * 4 // 3 + 64 * 1024
+
+# Konfigurasi database dan pool koneksi ada di db_pool.py
+DB_ERRORS = (mysql.connector.Error, PoolTimeout)
 
 # --- GLOBAL VARIABLE UNTUK DATA WAJAH ---
 data_lock = Lock()
-KNOWN_ENCODINGS = []
-WBS_LOOKUP = {}
+update_lock = Lock()  # serialisasi penulis galeri; pembaca cukup data_lock
+GALLERY = GalleryMatcher.empty()
+GALLERY_STAMP = None  # MAX(wbs.updated_at) terakhir yang sudah dimuat
+MATCH_TOLERANCE = 0.5
+# Pencocokan dua tahap jika tabel wbs_face_sample ada (lihat face_samples.py):
+# MATCH_SHORTLIST centroid terdekat dalam MATCH_TOLERANCE + CENTROID_SLACK,
+# lalu dinilai ulang dengan sampel terdekat tiap WBS.
+MATCH_SHORTLIST = 5
+CENTROID_SLACK = 0.1
+
+# Versi skema database (migrations.py), dibaca saat load_known_faces. Query
+# memakai kolom wbs.is_registered jika migrasi 3 sudah dijalankan.
+SCHEMA_VERSION = 0
+
+# Baca juga encoding pickle lama. Matikan setelah menjalankan migrate_encodings.py
+ALLOW_LEGACY_PICKLE = True
+
+# Cek perubahan dari proses lain (mis. enrollment_script.py) paling sering tiap N detik
+GALLERY_POLL_SECONDS = 5
+_last_gallery_poll = 0.0
+
+# --- KONFIGURASI INDEX WAJAH ---
+# 'brute' (scan penuh), 'ivf' (partisi k-means), atau 'rptree' (hutan pohon proyeksi acak).
+# Pilih per lokasi berdasarkan hasil bench/index_recall.py.
+INDEX_BACKEND = 'brute'
+INDEX_PARAMS = {}
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+INDEX_PATH = os.path.join(DATA_DIR, 'face_index.npz')
+# Bangun ulang index jika baris yang belum terindeks melebihi batas ini
+INDEX_REBUILD_PENDING = 1000
+
+# Snapshot galeri (memmap) agar worker baru tidak perlu decode ulang seluruh tabel wbs
+SNAPSHOT_DIR = DATA_DIR
+
+# --- INFERENSI WAJAH (pool proses) ---
+# None = jumlah core - 1; 0 = deteksi/encoding langsung di thread request
+INFERENCE_WORKERS = None
+INFERENCE_MAX_PENDING = None  # default: 2x jumlah worker; lebih dari ini dibalas 503
+INFERENCE_POOL = None if INFERENCE_WORKERS == 0 else InferencePool(INFERENCE_WORKERS, INFERENCE_MAX_PENDING)
+
+# --- RESOLUSI DETEKSI ---
+# Deteksi HOG dilakukan pada frame yang diperkecil ke lebar ini (None = ukuran asli);
+# encoding tetap dari frame asli. DETECT_ROI = fraksi tengah frame (panduan wajah kiosk),
+# None = seluruh frame. Pilih nilai berdasarkan bench/detect_scale.py.
+DETECT_OPTIONS = {
+    'detect_width': 320,
+    'roi': None,
+    'upsample': 1,
+}
+
+# --- ABSENSI GRUP (/api/absensi/grup) ---
+# Semua wajah di satu frame diabsen sekaligus. Wajah grup biasanya lebih kecil,
+# jadi deteksi memakai frame yang sedikit lebih besar; paling banyak
+# GROUP_MAX_FACES wajah terbesar yang diproses.
+GROUP_DETECT_OPTIONS = dict(DETECT_OPTIONS, detect_width=480)
+GROUP_MAX_FACES = 12
+
+# --- GERBANG KUALITAS WAJAH (face_quality.py) ---
+# Wajah pertama diperiksa (ukuran, terang, ketajaman, pose) sebelum encoding;
+# yang tidak lolos langsung dibalas dengan kode alasan ("closer", "hold_still", ...).
+# Kunci yang tidak diisi memakai face_quality.DEFAULT_THRESHOLDS; None = matikan.
+# /api/daftar_wajah memakai ENROLL_QUALITY dari enrollment_script.py (lebih ketat),
+# sama dengan enrollment massal.
+QUALITY_GATE = {
+    'min_face': 80,
+    'min_sharpness': 30.0,
+    'max_yaw': 0.35,
+}
+
+# --- PENULISAN ABSENSI (write-behind, digabung per batch) ---
+ATTENDANCE_WRITER = AttendanceWriter(
+    batch_size=50,
+    flush_interval=0.5,
+    spool_path=os.path.join(DATA_DIR, 'absensi_pending.jsonl'),
+    on_flush=lambda seconds, rows: STAGE_SECONDS.observe('attendance_writer', 'insert', value=seconds),
+)
 
+# --- MODE KIOSK KONTINU (tracking antar-frame, lihat face_tracker.py) ---
+# Deteksi penuh tiap KIOSK_DETECT_EVERY frame; di antaranya kotak wajah diikuti
+# dengan template matching. Encoding hanya untuk track baru atau yang kualitasnya
+# naik KIOSK_QUALITY_GAIN kali, paling banyak KIOSK_MAX_ENCODES kali per track.
+KIOSK_SESSIONS = KioskSessions(
+    ttl=60.0,
+    maxsize=64,
+    detect_every=5,
+    max_missed=5,
+    quality_gain=1.25,
+    max_encodes=3,
+)
 
-def connect_db():
+# --- PARTISI GALERI PER LOKASI (gallery_shards.py, perlu migrasi 6) ---
+# Scan hanya dicocokkan dengan WBS terdaftar di lokasi kiosk (field lokasi_id,
+# default kegiatan.id_lokasi), dipersempit lagi ke kegiatan_peserta jika
+# kegiatan itu punya daftar peserta. Kegiatan tanpa lokasi/peserta tetap memakai
+# galeri penuh. Daftar anggota dibaca ulang tiap GALLERY_SHARD_TTL detik;
+# partisi yang lama tidak dipakai dibuang jika melebihi GALLERY_SHARD_MAX_BYTES
+# atau GALLERY_SHARD_MAX_PARTITIONS. lokasi_id yang tidak dikenal (tidak ada di
+# wbs/kegiatan) ditolak 400, jadi klien tidak bisa mengisi cache dengan key asal.
+GALLERY_SHARDING = True
+GALLERY_SHARD_TTL = 300.0
+GALLERY_SHARD_MAX_BYTES = 256 * 1024 * 1024
+GALLERY_SHARD_MAX_PARTITIONS = 256
+GALLERY_SHARDS = GalleryShards(
+    lambda key: load_partition_ids(key),
+    ttl=GALLERY_SHARD_TTL,
+    max_bytes=GALLERY_SHARD_MAX_BYTES,
+    max_partitions=GALLERY_SHARD_MAX_PARTITIONS,
+    index_backend=INDEX_BACKEND,
+    index_params=INDEX_PARAMS,
+)
+
+# --- PROFILING PER REQUEST ---
+# Jika aktif, request dengan ?profile=1 (atau header X-Profile: 1) diprofil dengan
+# profiler sampling; hasilnya (format collapsed) disimpan di PROFILE_DIR dan nama
+# filenya dikirim di header X-Profile. Biarkan False di produksi kecuali sedang
+# menyelidiki request yang lambat.
+PROFILE_REQUESTS = False
+PROFILE_INTERVAL = 0.005
+PROFILE_DIR = os.path.join(DATA_DIR, 'profiles')
+
+# Fungsi tambahan yang mengembalikan baris metrik untuk /metrics (mis. lane asgi.py)
+EXTRA_METRICS = []
+
+
+def _read_gallery_version(cursor):
+    """(MAX(updated_at), jumlah wajah terdaftar) tabel wbs; stempel None jika kolomnya belum ada."""
+    try:
+        if SCHEMA_VERSION >= 3:
+            # Cukup baca index (is_registered, updated_at), tanpa menyentuh kolom BLOB
+            cursor.execute("SELECT MAX(updated_at) AS stamp, COALESCE(SUM(is_registered), 0) AS jumlah FROM wbs")
+        else:
+            cursor.execute("SELECT MAX(updated_at) AS stamp, COUNT(face_encoding) AS jumlah FROM wbs")
+        row = cursor.fetchone()
+        return row['stamp'] or datetime(1970, 1, 1), row['jumlah']
+    except mysql.connector.Error as e:
+        print(f"⚠️ Kolom wbs.updated_at tidak tersedia, pemuatan ulang otomatis nonaktif: {e}")
+        return None, None
+
+
+def _fetch_sample_rows(cursor, ids=None):
+    """Sampel wajah per WBS; None jika tabel wbs_face_sample belum ada."""
     try:
-        return mysql.connector.connect(**DB_CONFIG)
-    except mysql.connector.Error as err:
-        print(f"❌ ERROR Database: {err}")
+        return fetch_samples(cursor, ids)
+    except mysql.connector.Error as e:
+        print(f"⚠️ Tabel wbs_face_sample tidak tersedia, pencocokan multi-sampel nonaktif: {e}")
         return None
 
 
 def load_known_faces():
-    """Memuat semua wajah WBS dari database"""
-    global KNOWN_ENCODINGS, WBS_LOOKUP
-    db = connect_db()
-    if not db:
-        print("⚠️ Tidak bisa terhubung ke database.")
-        return
+    """Memuat semua wajah WBS (dari snapshot jika masih sama dengan database)"""
+    global GALLERY, GALLERY_STAMP, SCHEMA_VERSION
     try:
-        cursor = db.cursor(dictionary=True)
-        cursor.execute("SELECT id_wbs, nama, face_encoding FROM wbs WHERE face_encoding IS NOT NULL")
-        results = cursor.fetchall()
+        with db_connection() as db:
+            cursor = db.cursor(dictionary=True)
+            SCHEMA_VERSION = current_version(cursor)
+            # Stempel dibaca lebih dulu agar perubahan selama pemuatan tetap terambil saat poll berikutnya
+            stamp, jumlah = _read_gallery_version(cursor)
 
-        encodings_temp = []
-        lookup_temp = {}
+            gallery_baru = None
+            if stamp is not None:
+                gallery_baru = load_snapshot(SNAPSHOT_DIR, stamp, jumlah)
+                if gallery_baru is not None:
+                    print("⚡ Galeri dibuka dari snapshot (memmap).")
+
+            results = None
+            if gallery_baru is None:
+                terdaftar = "is_registered = 1" if SCHEMA_VERSION >= 3 else "face_encoding IS NOT NULL"
+                cursor.execute(f"SELECT id_wbs, nama, face_encoding FROM wbs WHERE {terdaftar}")
+                results = cursor.fetchall()
+            sample_rows = None
+            if gallery_baru is None or gallery_baru.samples is None:
+                sample_rows = _fetch_sample_rows(cursor)
+            cursor.close()
+    except DB_ERRORS as err:
+        print(f"⚠️ Tidak bisa terhubung ke database: {err}")
+        return
+
+    try:
+        if results is not None:
+            # Semua baris di-decode sekaligus ke satu matriks float32
+            matrix, ok = decode_many([row['face_encoding'] for row in results], allow_pickle=ALLOW_LEGACY_PICKLE)
+            for row in (results[i] for i in np.flatnonzero(~ok)):
+                print(f"Error decoding WBS {row['id_wbs']}: format encoding tidak dikenal")
+            ids_temp = [row['id_wbs'] for row, valid in zip(results, ok) if valid]
+            names_temp = [row['nama'] for row, valid in zip(results, ok) if valid]
+            gallery_baru = GalleryMatcher(matrix[ok], ids_temp, names_temp, dtype=np.float32)
+        if sample_rows is not None:
+            gallery_baru.samples = build_store(sample_rows, allow_pickle=ALLOW_LEGACY_PICKLE)
 
-        for i, row in enumerate(results):
+        # Tulis ulang snapshot jika ada yang baru dibaca dari database
+        if stamp is not None and (results is not None or sample_rows is not None):
             try:
-                enc = pickle.loads(row['face_encoding'])
-                encodings_temp.append(enc)
-                lookup_temp[i] = {'id_wbs': row['id_wbs'], 'nama': row['nama']}
-            except Exception as e:
-                print(f"Error decoding WBS {row['id_wbs']}: {e}")
+                write_snapshot(SNAPSHOT_DIR, gallery_baru, stamp, jumlah)
+            except OSError as e:
+                print(f"⚠️ Gagal menulis snapshot galeri: {e}")
 
+        # Bangun index di luar lock, lalu tukar referensinya sekaligus
+        gallery_baru.index = load_or_build_index(
+            INDEX_BACKEND, gallery_baru.matrix, gallery_baru.ids, INDEX_PATH, **INDEX_PARAMS)
         with data_lock:
-            KNOWN_ENCODINGS = encodings_temp
-            WBS_LOOKUP = lookup_temp
+            GALLERY = gallery_baru
+            GALLERY_STAMP = stamp
 
-        print(f"📦 {len(KNOWN_ENCODINGS)} wajah WBS dimuat untuk absensi.")
-        cursor.close()
-        db.close()
+        jumlah_sampel = len(gallery_baru.samples) if gallery_baru.samples is not None else 0
+        print(f"📦 {len(gallery_baru)} wajah WBS ({jumlah_sampel} sampel) dimuat untuk absensi.")
     except Exception as e:
         print(f"FATAL: {e}")
-        if db:
-            db.close()
 
 
-# Muat saat startup
-load_known_faces()
+def apply_gallery_updates(upserts=(), removals=(), stamp=None, sample_upserts=None):
+    """Terapkan enroll baru/ulang ke galeri aktif tanpa memuat ulang seluruh tabel wbs."""
+    global GALLERY, GALLERY_STAMP
+    with update_lock:
+        with data_lock:
+            gallery = GALLERY
+        gallery_baru = gallery.with_updates(upserts, removals, sample_upserts)
+
+        if len(gallery_baru.pending_rows) > INDEX_REBUILD_PENDING:
+            gallery_baru = gallery_baru.compact()
+            gallery_baru.index = load_or_build_index(
+                INDEX_BACKEND, gallery_baru.matrix, gallery_baru.ids, INDEX_PATH, **INDEX_PARAMS)
+
+        with data_lock:
+            GALLERY = gallery_baru
+            if stamp is not None:
+                GALLERY_STAMP = stamp
+    # Enroll baru bisa menambah anggota roster lokasi (is_registered berubah)
+    GALLERY_SHARDS.invalidate()
+    return gallery_baru
+
+
+def refresh_gallery_if_stale():
+    """Ambil perubahan wbs sejak GALLERY_STAMP (paling sering tiap GALLERY_POLL_SECONDS)."""
+    global _last_gallery_poll, GALLERY_STAMP
+    now = time.monotonic()
+    if GALLERY_STAMP is None or now - _last_gallery_poll < GALLERY_POLL_SECONDS:
+        return
+    _last_gallery_poll = now
+
+    try:
+        with db_connection() as db:
+            cursor = db.cursor(dictionary=True)
+            # '>=' agar baris yang di-commit pada detik yang sama tidak terlewat;
+            # baris yang tidak berubah dilewati di bawah.
+            cursor.execute(
+                "SELECT id_wbs, nama, face_encoding, updated_at FROM wbs WHERE updated_at >= %s",
+                (GALLERY_STAMP,))
+            rows = cursor.fetchall()
+            cursor.close()
+    except DB_ERRORS as e:
+        print(f"⚠️ Gagal cek perubahan galeri: {e}")
+        return
+
+    with data_lock:
+        gallery = GALLERY
+    upserts, removals = [], []
+    stamp = GALLERY_STAMP
+    for row in rows:
+        stamp = max(stamp, row['updated_at'])
+        i = gallery.row_of.get(row['id_wbs'])
+        aktif = i is not None and np.isfinite(gallery.sq_norms[i])
+        if row['face_encoding'] is None:
+            if aktif:
+                removals.append(row['id_wbs'])
+            continue
+        try:
+            enc = decode_encoding(row['face_encoding'], allow_pickle=ALLOW_LEGACY_PICKLE)
+        except Exception as e:
+            print(f"Error decoding WBS {row['id_wbs']}: {e}")
+            continue
+        if aktif and gallery.names[i] == row['nama'] and np.array_equal(gallery.matrix[i], enc.astype(gallery.matrix.dtype)):
+            continue
+        upserts.append((row['id_wbs'], row['nama'], enc))
+
+    sample_upserts = None
+    if upserts and gallery.samples is not None:
+        # Centroid berubah => sampel orang itu juga berubah; ambil ulang hanya untuk id tersebut
+        ids = [u[0] for u in upserts]
+        try:
+            with db_connection() as db:
+                cursor = db.cursor()
+                sample_rows = _fetch_sample_rows(cursor, ids)
+                cursor.close()
+        except DB_ERRORS as e:
+            print(f"⚠️ Gagal cek perubahan galeri: {e}")
+            return
+        if sample_rows is not None:
+            sample_upserts = group_samples(sample_rows, ids, allow_pickle=ALLOW_LEGACY_PICKLE)
+
+    if upserts or removals:
+        gallery_baru = apply_gallery_updates(upserts, removals, stamp=stamp, sample_upserts=sample_upserts)
+        invalidate_wbs_list()
+        invalidate_lokasi()
+        print(f"🔄 Galeri diperbarui: {len(upserts)} enroll, {len(removals)} dihapus "
+              f"({len(gallery_baru)} wajah aktif).")
+    elif stamp != GALLERY_STAMP:
+        # Baris wbs berubah tanpa mengubah wajah (mis. pindah id_lokasi)
+        GALLERY_SHARDS.invalidate()
+        invalidate_lokasi()
+        with data_lock:
+            GALLERY_STAMP = stamp
+
+
+def load_partition_ids(key):
+    """Anggota partisi ``(lokasi_id, kegiatan_id)`` sebagai set id_wbs; None = galeri penuh."""
+    lokasi_id, kegiatan_id = key
+    with db_connection() as db:
+        cursor = db.cursor()
+        if lokasi_id is None:
+            cursor.execute("SELECT id_lokasi FROM kegiatan WHERE id_kegiatan = %s", (kegiatan_id,))
+            row = cursor.fetchone()
+            lokasi_id = row[0] if row else None
+        cursor.execute("SELECT id_wbs FROM kegiatan_peserta WHERE id_kegiatan = %s", (kegiatan_id,))
+        peserta = {int(r[0]) for r in cursor.fetchall()} or None
+        roster = None
+        if lokasi_id is not None:
+            cursor.execute("SELECT id_wbs FROM wbs WHERE id_lokasi = %s AND is_registered = 1", (lokasi_id,))
+            roster = {int(r[0]) for r in cursor.fetchall()}
+        cursor.close()
+    if peserta is not None and roster is not None:
+        return peserta & roster
+    return peserta if peserta is not None else roster
+
+
+def sharding_active():
+    return GALLERY_SHARDING and SCHEMA_VERSION >= 6
+
+
+def known_lokasi():
+    """Set id lokasi yang dipakai di tabel wbs/kegiatan (di-cache LOKASI_CACHE)."""
+    def load():
+        with db_connection() as db:
+            cursor = db.cursor()
+            cursor.execute("SELECT id_lokasi FROM wbs WHERE id_lokasi IS NOT NULL "
+                           "UNION SELECT id_lokasi FROM kegiatan WHERE id_lokasi IS NOT NULL")
+            lokasi = {int(r[0]) for r in cursor.fetchall()}
+            cursor.close()
+        return lokasi
+    return LOKASI_CACHE.get_or_load('all', load)
+
+
+def parse_lokasi_id(lokasi_id):
+    """``lokasi_id`` dari request sebagai int (None jika kosong); ValueError jika tidak dikenal."""
+    if lokasi_id is None or str(lokasi_id).strip() == '':
+        return None
+    try:
+        lokasi = int(str(lokasi_id).strip())
+    except ValueError:
+        raise ValueError("ID lokasi tidak valid.") from None
+    if lokasi not in known_lokasi():
+        raise ValueError("Lokasi tidak dikenal.")
+    return lokasi
+
+
+def gallery_for(kegiatan_id, lokasi_id=None):
+    """Galeri untuk satu scan: partisi lokasi/kegiatan jika aktif, selain itu galeri penuh.
+
+    ValueError jika ``lokasi_id`` tidak dikenal (dibalas 400 oleh route).
+    """
+    with data_lock:
+        gallery = GALLERY
+    if not sharding_active():
+        return gallery
+    key = (parse_lokasi_id(lokasi_id), str(kegiatan_id))
+    with stage('partition'):
+        return GALLERY_SHARDS.get(key, gallery)
+
+
+def empty_gallery_message(gallery):
+    if gallery is not GALLERY:
+        return "Tidak ada WBS terdaftar untuk lokasi/kegiatan ini."
+    return "Database wajah kosong. Jalankan enrollment dulu."
+
+
+def _record_timings(timings):
+    for name, seconds in timings.items():
+        record_stage(name, seconds * 1000)
+
+
+def run_inference(rgb, quality=QUALITY_GATE):
+    """Deteksi + encoding wajah lewat pool proses (atau inline jika pool dimatikan).
+
+    Durasi ``detect``/``encode`` (dan ``pool_wait``) dicatat sebagai tahap request.
+    """
+    timings = {}
+    try:
+        if INFERENCE_POOL is None:
+            return detect_and_encode(rgb, timings=timings, quality=quality, **DETECT_OPTIONS)
+        return INFERENCE_POOL.detect_and_encode(rgb, timings=timings, quality=quality, **DETECT_OPTIONS)
+    finally:
+        _record_timings(timings)
+
+
+def run_group_inference(rgb):
+    """Semua wajah di frame: ``(face_locations, encodings, reasons)``, encoding dalam satu batch."""
+    timings = {}
+    options = dict(GROUP_DETECT_OPTIONS, quality=QUALITY_GATE, max_faces=GROUP_MAX_FACES)
+    try:
+        if INFERENCE_POOL is None:
+            return detect_and_encode_group(rgb, timings=timings, **options)
+        return INFERENCE_POOL.detect_and_encode_group(rgb, timings=timings, **options)
+    finally:
+        _record_timings(timings)
+
+
+def run_detection(rgb):
+    """Deteksi saja (mode kiosk); encoding per track lewat ``run_encoding``."""
+    KIOSK_FRAMES.inc('detect')
+    if INFERENCE_POOL is None:
+        with stage('detect'):
+            return detect_faces(rgb, **DETECT_OPTIONS)
+    timings = {}
+    try:
+        return INFERENCE_POOL.detect_faces(rgb, timings=timings, **DETECT_OPTIONS)
+    finally:
+        _record_timings(timings)
+
+
+def run_encoding(rgb, locations):
+    """Gerbang kualitas + encoding untuk kotak wajah yang sudah diketahui: ``(encodings, reasons)``.
+
+    Cek pose (landmark) berat, jadi ikut dijalankan di worker bersama encoding.
+    """
+    KIOSK_FRAMES.inc('encode')
+    timings = {}
+    try:
+        if INFERENCE_POOL is None:
+            return check_and_encode(rgb, locations, quality=QUALITY_GATE, timings=timings)
+        return INFERENCE_POOL.check_and_encode(rgb, locations, quality=QUALITY_GATE, timings=timings)
+    finally:
+        _record_timings(timings)
+
+
+def read_request_frame():
+    """Ambil ``(fields, bytes gambar)`` dari request.
+
+    Mendukung tiga bentuk: body ``image/jpeg`` mentah (field lain lewat query
+    string), ``multipart/form-data`` dengan file ``image``, dan JSON lama berisi
+    data URL base64. Bytes gambar ``None`` jika base64-nya rusak.
+    """
+    mimetype = request.mimetype
+    if mimetype.startswith('image/') or mimetype == 'application/octet-stream':
+        return request.args, request.get_data(cache=False)
+    if mimetype == 'multipart/form-data':
+        upload = request.files.get('image')
+        return request.form, upload.read() if upload else b''
+
+    data = request.get_json(silent=True) or {}
+    image_data_url = data.get('image')
+    if not image_data_url:
+        return data, b''
+    try:
+        with stage('base64'):
+            return data, base64.b64decode(image_data_url.split(',', 1)[-1], validate=True)
+    except (binascii.Error, ValueError):
+        return data, None
+
+
+def decode_frame(raw):
+    """bytes JPEG/PNG -> gambar RGB, langsung dari buffer request tanpa salinan tambahan."""
+    img = cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def record_stage(name, ms):
+    if 'timings' not in g:
+        g.timings = []
+    g.timings.append((name, ms))
+
+
+@contextmanager
+def stage(name):
+    """Catat durasi satu tahap request; dikirim di header Server-Timing dan /metrics."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, (time.perf_counter() - t0) * 1000)
+
+
+@app.errorhandler(413)
+def frame_too_large(err):
+    return jsonify({"status": "error", "message": "Ukuran gambar terlalu besar."}), 413
+
+
+@app.before_request
+def start_request_timer():
+    g.t_start = time.perf_counter()
+    if PROFILE_REQUESTS and (request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1'):
+        g.profiler = SamplingProfiler(interval=PROFILE_INTERVAL).start()
+
+
+@app.after_request
+def add_server_timing(response):
+    timings = g.get('timings')
+    if timings:
+        response.headers['Server-Timing'] = ', '.join(f"{name};dur={ms:.1f}" for name, ms in timings)
+    return response
+
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.endpoint or 'unknown'
+    if route == 'metrics':
+        return response
+    observe_stages(route, g.get('timings', ()))
+    if 'profiler' in g:
+        profiler = g.profiler.stop()
+        try:
+            response.headers['X-Profile'] = profiler.save(PROFILE_DIR, route)
+        except OSError as e:
+            print(f"⚠️ Gagal menyimpan profil request: {e}")
+    if 't_start' in g:
+        REQUEST_SECONDS.observe(route, str(response.status_code), value=time.perf_counter() - g.t_start)
+    return response
+
+
+@app.teardown_request
+def stop_profiler(exc):
+    # Request yang berakhir dengan exception tidak melewati after_request
+    if 'profiler' in g:
+        g.profiler.stop()
+
+
+def absensi_reply(outcome, body, status=200):
+    """Balasan /api/absensi yang sekaligus dihitung di ``psbr_absensi_outcomes_total``."""
+    ABSENSI_OUTCOMES.inc(outcome)
+    return jsonify(body), status
+
+
+def busy_response(err):
+    response = jsonify({"status": "busy", "message": "Server sedang sibuk, coba lagi sebentar."})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(err.retry_after)
+    return response
+
+
+def get_nama_kegiatan(kegiatan_id):
+    """Nama kegiatan dari cache; query ke database hanya saat cache kosong/kedaluwarsa."""
+    def load():
+        with db_connection() as db:
+            cursor = db.cursor()
+            cursor.execute("SELECT nama_kegiatan FROM kegiatan WHERE id_kegiatan=%s", (kegiatan_id,))
+            kegiatan = cursor.fetchone()
+            cursor.close()
+        return kegiatan[0] if kegiatan else None
+    return KEGIATAN_CACHE.get_or_load(str(kegiatan_id), load)
+
+
+# Muat saat startup (bukan di proses worker inferensi yang meng-import ulang skrip ini)
+if __name__ != '__mp_main__':
+    load_known_faces()
 
 
 # --- ROUTE HALAMAN UTAMA ---
@@ -83,213 +613,673 @@ def home():
 # --- API ABSENSI ---
 @app.route('/api/absensi', methods=['POST'])
 def handle_absensi():
-    data = request.json
-    image_data_url = data.get('image')
+    with stage('read'):
+        data, raw = read_request_frame()
     kegiatan_id = data.get('kegiatan_id')
     pptk_nama = data.get('pptk_nama', 'PPTK Tidak Diketahui')
     narasumber_nama = data.get('narasumber_nama', 'Narasumber Tidak Diketahui')
 
-    if not image_data_url or not kegiatan_id:
-        return jsonify({"status": "error", "message": "Data gambar atau ID kegiatan tidak lengkap."}), 400
+    if raw is None:
+        return absensi_reply('invalid_request', {"status": "error", "message": "Data gambar tidak valid."}, 400)
+    if not raw or not kegiatan_id:
+        return absensi_reply('invalid_request', {"status": "error",
+                                                 "message": "Data gambar atau ID kegiatan tidak lengkap."}, 400)
+    if len(raw) > MAX_FRAME_BYTES:
+        return absensi_reply('invalid_request', {"status": "error", "message": "Ukuran gambar terlalu besar."}, 413)
+
+    refresh_gallery_if_stale()
+    try:
+        gallery = gallery_for(kegiatan_id, data.get('lokasi_id'))
+    except ValueError as e:
+        return absensi_reply('invalid_request', {"status": "error", "message": str(e)}, 400)
+    except DB_ERRORS as e:
+        print("❌ ERROR Database:", e)
+        return absensi_reply('db_error', {"status": "error", "message": "Gagal membaca roster lokasi."}, 500)
 
-    if not KNOWN_ENCODINGS:
-        return jsonify({"status": "error", "message": "Database wajah kosong. Jalankan enrollment dulu."}), 500
+    if not len(gallery):
+        return absensi_reply('empty_gallery', {"status": "error", "message": empty_gallery_message(gallery)}, 500)
 
     try:
-        # Konversi base64 → numpy array
-        encoded_data = image_data_url.split(',')[1]
-        nparr = np.frombuffer(base64.b64decode(encoded_data), np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        if img is None:
-            return jsonify({"status": "error", "message": "Gagal membaca gambar webcam."}), 400
-
-        # Konversi ke RGB
-        rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
-        # Deteksi wajah
-        face_locations = face_recognition.face_locations(rgb_img, model="hog")
-        if not face_locations:
-            return jsonify({"status": "failed", "message": "Tidak ada wajah terdeteksi."}), 200
+        # Decode JPEG → RGB
+        with stage('decode'):
+            rgb_img = decode_frame(raw)
+        if rgb_img is None:
+            return absensi_reply('invalid_image', {"status": "error", "message": "Gagal membaca gambar webcam."}, 400)
 
-        # Proses encoding wajah dengan proteksi error
+        # Deteksi + encoding wajah dengan proteksi error
         try:
-            encodings = face_recognition.face_encodings(rgb_img, known_face_locations=face_locations)
-            if not encodings:
-                return jsonify({"status": "failed", "message": "Wajah tidak bisa di-encode."}), 200
-            face_encoding_baru = encodings[0]
+            with stage('inference'):
+                face_locations, encodings = run_inference(rgb_img)
+        except InferenceBusy as e:
+            ABSENSI_OUTCOMES.inc('busy')
+            return busy_response(e)
+        except LowQualityFace as e:
+            return absensi_reply('low_quality', {"status": "failed", "reason": e.reason, "message": e.message})
         except Exception as e:
             print("❌ Gagal melakukan encoding:", e)
-            return jsonify({"status": "error", "message": f"Gagal memproses wajah: {e}"}), 500
-
-        # Bandingkan dengan database
-        matches = face_recognition.compare_faces(KNOWN_ENCODINGS, face_encoding_baru, tolerance=0.5)
-        match_index = -1
-        if True in matches:
-            distances = face_recognition.face_distance(KNOWN_ENCODINGS, face_encoding_baru)
-            best_match = np.argmin(distances)
-            if matches[best_match]:
-                match_index = best_match
-
-        if match_index != -1:
-            wbs_info = WBS_LOOKUP[match_index]
-            id_wbs = wbs_info['id_wbs']
-            nama_wbs = wbs_info['nama']
-
-            db = connect_db()
-            if not db:
-                return jsonify({"status": "error", "message": "Koneksi database gagal."}), 500
-            cursor = db.cursor()
+            return absensi_reply('error', {"status": "error", "message": f"Gagal memproses wajah: {e}"}, 500)
 
-            cursor.execute("SELECT nama_kegiatan FROM kegiatan WHERE id_kegiatan=%s", (kegiatan_id,))
-            kegiatan = cursor.fetchone()
-            kegiatan_name = kegiatan[0] if kegiatan else "(Tidak diketahui)"
-            now = datetime.now()
+        if not face_locations:
+            return absensi_reply('no_face', {"status": "failed", "message": "Tidak ada wajah terdeteksi."})
+        if not encodings:
+            return absensi_reply('no_encoding', {"status": "failed", "message": "Wajah tidak bisa di-encode."})
+        face_encoding_baru = encodings[0]
+
+        # Bandingkan dengan galeri (satu kali hitung jarak untuk semua WBS)
+        with stage('match'):
+            matches = gallery.match_templates(face_encoding_baru, tolerance=MATCH_TOLERANCE, top_k=1,
+                                              shortlist=MATCH_SHORTLIST, slack=CENTROID_SLACK)
+
+        if matches:
+            id_wbs = matches[0]['id_wbs']
+            nama_wbs = matches[0]['nama']
 
+            try:
+                with stage('db'):
+                    kegiatan_name = get_nama_kegiatan(kegiatan_id) or "(Tidak diketahui)"
+            except DB_ERRORS as err:
+                print("❌ ERROR Database:", err)
+                return absensi_reply('db_error', {"status": "error", "message": "Koneksi database gagal."}, 500)
+
+            # INSERT dikerjakan thread penulis; respon tidak menunggu database
             combined_executor = f"PPTK: {pptk_nama} | Narasumber: {narasumber_nama}"
-            cursor.execute("""
-                INSERT INTO absensi (id_wbs, id_kegiatan, tanggal, waktu_absensi, narasumber)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (id_wbs, kegiatan_id, now.date(), now.time(), combined_executor))
-            db.commit()
-            cursor.close()
-            db.close()
+            with stage('queue'):
+                baru = ATTENDANCE_WRITER.submit(id_wbs, kegiatan_id, combined_executor)
+            if not baru:
+                return absensi_reply('duplicate', {
+                    "status": "success",
+                    "message": f"{nama_wbs} sudah tercatat hadir hari ini.",
+                    "nama": nama_wbs,
+                    "kegiatan": kegiatan_name,
+                    "duplikat": True
+                })
 
-            return jsonify({
+            return absensi_reply('match', {
                 "status": "success",
                 "message": f"Absensi BERHASIL untuk {nama_wbs}.",
                 "nama": nama_wbs,
                 "kegiatan": kegiatan_name
             })
         else:
-            return jsonify({"status": "failed", "message": "Wajah tidak dikenali atau belum terdaftar."}), 200
+            return absensi_reply('unknown', {"status": "failed",
+                                             "message": "Wajah tidak dikenali atau belum terdaftar."})
+
+    except Exception as e:
+        print("ERROR:", e)
+        return absensi_reply('error', {"status": "error", "message": f"Kesalahan server: {e}"}, 500)
+
+@app.route('/api/absensi/grup', methods=['POST'])
+def handle_absensi_grup():
+    """Absensi semua wajah dalam satu frame (rombongan satu asrama/kamar).
+
+    Format request sama dengan ``/api/absensi``. Balasan berisi ``faces``:
+    satu hasil per wajah (kotak, status, nama atau alasan), urut dari wajah
+    terbesar. Semua absensi baru dari frame ini ditulis dalam satu transaksi.
+    """
+    with stage('read'):
+        data, raw = read_request_frame()
+    kegiatan_id = data.get('kegiatan_id')
+    pptk_nama = data.get('pptk_nama', 'PPTK Tidak Diketahui')
+    narasumber_nama = data.get('narasumber_nama', 'Narasumber Tidak Diketahui')
+
+    if raw is None:
+        return absensi_reply('invalid_request', {"status": "error", "message": "Data gambar tidak valid."}, 400)
+    if not raw or not kegiatan_id:
+        return absensi_reply('invalid_request', {"status": "error",
+                                                 "message": "Data gambar atau ID kegiatan tidak lengkap."}, 400)
+    if len(raw) > MAX_FRAME_BYTES:
+        return absensi_reply('invalid_request', {"status": "error", "message": "Ukuran gambar terlalu besar."}, 413)
+
+    refresh_gallery_if_stale()
+    try:
+        gallery = gallery_for(kegiatan_id, data.get('lokasi_id'))
+    except ValueError as e:
+        return absensi_reply('invalid_request', {"status": "error", "message": str(e)}, 400)
+    except DB_ERRORS as e:
+        print("❌ ERROR Database:", e)
+        return absensi_reply('db_error', {"status": "error", "message": "Gagal membaca roster lokasi."}, 500)
+    if not len(gallery):
+        return absensi_reply('empty_gallery', {"status": "error", "message": empty_gallery_message(gallery)}, 500)
+
+    try:
+        with stage('decode'):
+            rgb_img = decode_frame(raw)
+        if rgb_img is None:
+            return absensi_reply('invalid_image', {"status": "error", "message": "Gagal membaca gambar webcam."}, 400)
+
+        try:
+            with stage('inference'):
+                face_locations, encodings, reasons = run_group_inference(rgb_img)
+        except InferenceBusy as e:
+            ABSENSI_OUTCOMES.inc('busy')
+            return busy_response(e)
+        if not face_locations:
+            return absensi_reply('no_face', {"status": "failed", "message": "Tidak ada wajah terdeteksi.",
+                                             "faces": []})
 
+        # Satu perkalian matriks untuk semua wajah; satu WBS paling banyak satu wajah
+        siap = [i for i, enc in enumerate(encodings) if enc is not None]
+        with stage('match'):
+            matches = gallery.match_many([encodings[i] for i in siap], tolerance=MATCH_TOLERANCE,
+                                         shortlist=MATCH_SHORTLIST, slack=CENTROID_SLACK)
+        cocok = {i: m for i, m in zip(siap, matches) if m is not None}
+
+        kegiatan_name = None
+        baru = {}
+        if cocok:
+            try:
+                with stage('db'):
+                    kegiatan_name = get_nama_kegiatan(kegiatan_id) or "(Tidak diketahui)"
+            except DB_ERRORS as err:
+                print("❌ ERROR Database:", err)
+                return absensi_reply('db_error', {"status": "error", "message": "Koneksi database gagal."}, 500)
+            combined_executor = f"PPTK: {pptk_nama} | Narasumber: {narasumber_nama}"
+            urutan = sorted(cocok)
+            with stage('queue'):
+                hasil_submit = ATTENDANCE_WRITER.submit_many(
+                    [(cocok[i]['id_wbs'], kegiatan_id) for i in urutan], combined_executor)
+            baru = dict(zip(urutan, hasil_submit))
+
+        faces = []
+        for i, box in enumerate(face_locations):
+            item = {"box": list(box)}
+            if reasons[i] is not None:
+                outcome = 'low_quality'
+                item.update(status="failed", reason=reasons[i],
+                            message=REASON_MESSAGES.get(reasons[i], "Kualitas wajah kurang baik."))
+            elif encodings[i] is None:
+                outcome = 'no_encoding'
+                item.update(status="failed", message="Wajah tidak bisa di-encode.")
+            elif i not in cocok:
+                outcome = 'unknown'
+                item.update(status="failed", message="Wajah tidak dikenali atau belum terdaftar.")
+            else:
+                nama_wbs = cocok[i]['nama']
+                outcome = 'match' if baru[i] else 'duplicate'
+                item.update(status="success", nama=nama_wbs, duplikat=not baru[i],
+                            message=f"Absensi BERHASIL untuk {nama_wbs}." if baru[i]
+                            else f"{nama_wbs} sudah tercatat hadir hari ini.")
+            ABSENSI_OUTCOMES.inc(outcome)
+            faces.append(item)
+
+        hadir = sum(1 for v in baru.values() if v)
+        return jsonify({
+            "status": "success" if cocok else "failed",
+            "message": f"{len(cocok)} dari {len(faces)} wajah dikenali, {hadir} absensi baru."
+            if cocok else "Tidak ada wajah yang dikenali.",
+            "kegiatan": kegiatan_name,
+            "faces": faces,
+        })
     except Exception as e:
         print("ERROR:", e)
+        return absensi_reply('error', {"status": "error", "message": f"Kesalahan server: {e}"}, 500)
+
+
+# --- API KIOSK KONTINU ---
+# Halaman kiosk membuka sesi, lalu mengirim frame berturut-turut (body image/jpeg)
+# ke /api/kiosk/<sesi>/frame. Tiap wajah diikuti sebagai track dan diputuskan
+# sekali saja; balasan berisi semua track aktif + keputusan baru di frame itu.
+@app.route('/api/kiosk/session', methods=['POST'])
+def kiosk_session_start():
+    data = request.get_json(silent=True) or request.form
+    kegiatan_id = data.get('kegiatan_id')
+    if not kegiatan_id:
+        return jsonify({"status": "error", "message": "ID kegiatan tidak lengkap."}), 400
+    lokasi_id = data.get('lokasi_id')
+    if sharding_active():
+        # Tolak lokasi yang tidak dikenal saat membuka sesi, bukan di setiap frame
+        try:
+            lokasi_id = parse_lokasi_id(lokasi_id)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        except DB_ERRORS as e:
+            print("❌ ERROR Database:", e)
+            return jsonify({"status": "error", "message": "Gagal membaca daftar lokasi."}), 500
+    pptk_nama = data.get('pptk_nama', 'PPTK Tidak Diketahui')
+    narasumber_nama = data.get('narasumber_nama', 'Narasumber Tidak Diketahui')
+    session = KIOSK_SESSIONS.create({
+        'kegiatan_id': kegiatan_id,
+        'lokasi_id': lokasi_id,
+        'executor': f"PPTK: {pptk_nama} | Narasumber: {narasumber_nama}",
+    })
+    return jsonify({"status": "success", "session_id": session.id, "ttl": KIOSK_SESSIONS.ttl})
+
+
+@app.route('/api/kiosk/<session_id>', methods=['DELETE'])
+def kiosk_session_end(session_id):
+    if KIOSK_SESSIONS.close(session_id) is None:
+        return jsonify({"status": "error", "message": "Sesi kiosk tidak ditemukan."}), 404
+    return jsonify({"status": "success"})
+
+
+def decide_track(track, encoding, gallery, session):
+    """Cocokkan encoding satu track; isi ``track.result`` jika keputusan sudah final."""
+    with stage('match'):
+        matches = gallery.match_templates(encoding, tolerance=MATCH_TOLERANCE, top_k=1,
+                                          shortlist=MATCH_SHORTLIST, slack=CENTROID_SLACK)
+    if not matches:
+        # Coba lagi dengan frame yang lebih baik sampai batas encoding per track
+        if track.encodes >= session.tracker.max_encodes:
+            ABSENSI_OUTCOMES.inc('unknown')
+            track.result = {"status": "failed", "message": "Wajah tidak dikenali atau belum terdaftar."}
+        return track.result
+
+    id_wbs, nama_wbs = matches[0]['id_wbs'], matches[0]['nama']
+    fields = session.fields
+    with stage('db'):
+        kegiatan_name = get_nama_kegiatan(fields['kegiatan_id']) or "(Tidak diketahui)"
+    with stage('queue'):
+        baru = ATTENDANCE_WRITER.submit(id_wbs, fields['kegiatan_id'], fields['executor'])
+    ABSENSI_OUTCOMES.inc('match' if baru else 'duplicate')
+    track.result = {
+        "status": "success",
+        "message": f"Absensi BERHASIL untuk {nama_wbs}." if baru else f"{nama_wbs} sudah tercatat hadir hari ini.",
+        "nama": nama_wbs,
+        "kegiatan": kegiatan_name,
+    }
+    if not baru:
+        track.result["duplikat"] = True
+    return track.result
+
+
+@app.route('/api/kiosk/<session_id>/frame', methods=['POST'])
+def kiosk_frame(session_id):
+    session = KIOSK_SESSIONS.get(session_id)
+    if session is None:
+        return jsonify({"status": "error", "message": "Sesi kiosk tidak ditemukan atau kedaluwarsa."}), 404
+    with stage('read'):
+        _, raw = read_request_frame()
+    if not raw:
+        return jsonify({"status": "error", "message": "Data gambar tidak valid."}), 400
+    if len(raw) > MAX_FRAME_BYTES:
+        return jsonify({"status": "error", "message": "Ukuran gambar terlalu besar."}), 413
+
+    refresh_gallery_if_stale()
+    try:
+        gallery = gallery_for(session.fields['kegiatan_id'], session.fields.get('lokasi_id'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except DB_ERRORS as e:
+        print("❌ ERROR Database:", e)
+        return jsonify({"status": "error", "message": "Gagal membaca roster lokasi."}), 500
+    if not len(gallery):
+        return jsonify({"status": "error", "message": empty_gallery_message(gallery)}), 500
+
+    with stage('decode'):
+        rgb_img = decode_frame(raw)
+    if rgb_img is None:
+        return jsonify({"status": "error", "message": "Gagal membaca gambar webcam."}), 400
+
+    # Frame satu sesi diproses berurutan; frame yang datang saat sesi sibuk ditolak
+    if not session.lock.acquire(blocking=False):
+        return jsonify({"status": "busy", "message": "Frame sebelumnya masih diproses."}), 409
+    try:
+        tracker = session.tracker
+        tracked, rejected = tracker.stats['track'], tracker.stats['rejected']
+        with stage('track'):
+            encoded = tracker.update(rgb_img, run_detection, run_encoding)
+        if tracker.stats['track'] > tracked:
+            KIOSK_FRAMES.inc('track')
+        if tracker.stats['rejected'] > rejected:
+            KIOSK_FRAMES.inc('rejected', value=tracker.stats['rejected'] - rejected)
+        decisions = []
+        for track, encoding in encoded:
+            result = decide_track(track, encoding, gallery, session)
+            if result is not None:
+                decisions.append(dict(result, track=track.id))
+        return jsonify({
+            "status": "success",
+            "tracks": [t.to_dict() for t in tracker.tracks],
+            "decisions": decisions,
+        })
+    except InferenceBusy as e:
+        ABSENSI_OUTCOMES.inc('busy')
+        return busy_response(e)
+    except DB_ERRORS as err:
+        print("❌ ERROR Database:", err)
+        ABSENSI_OUTCOMES.inc('db_error')
+        return jsonify({"status": "error", "message": "Koneksi database gagal."}), 500
+    except Exception as e:
+        print("❌ ERROR kiosk:", e)
+        ABSENSI_OUTCOMES.inc('error')
         return jsonify({"status": "error", "message": f"Kesalahan server: {e}"}), 500
+    finally:
+        session.lock.release()
+
 
 # --- API UNTUK MENAMPILKAN DAFTAR WBS (Dropdown di halaman pendaftaran wajah) ---
 @app.route('/api/wbs_list', methods=['GET'])
 def get_wbs_list():
-    db = connect_db()
-    if not db:
-        return jsonify({"status": "error", "message": "Gagal koneksi ke database"}), 500
+    def load():
+        with db_connection() as db:
+            cursor = db.cursor(dictionary=True)
+            if SCHEMA_VERSION >= 3:
+                cursor.execute("SELECT id_wbs, nama, is_registered FROM wbs ORDER BY nama")
+            else:
+                cursor.execute("""
+                    SELECT id_wbs, nama, 
+                           CASE WHEN face_encoding IS NOT NULL THEN 1 ELSE 0 END AS is_registered
+                    FROM wbs
+                    ORDER BY nama
+                """)
+            data = cursor.fetchall()
+            cursor.close()
+        return data
 
     try:
-        cursor = db.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id_wbs, nama, 
-                   CASE WHEN face_encoding IS NOT NULL THEN 1 ELSE 0 END AS is_registered
-            FROM wbs
-            ORDER BY nama
-        """)
-        data = cursor.fetchall()
-        cursor.close()
-        db.close()
+        data = WBS_LIST_CACHE.get_or_load('all', load)
         return jsonify({"status": "success", "data": data})
+    except DB_ERRORS as e:
+        print("Error /api/wbs_list:", e)
+        return jsonify({"status": "error", "message": "Gagal koneksi ke database"}), 500
     except Exception as e:
         print("Error /api/wbs_list:", e)
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
 # --- API LAPORAN ---
+LAPORAN_SELECT = """
+    SELECT a.tanggal, a.waktu_absensi, w.nama AS nama_wbs,
+           k.nama_kegiatan, a.narasumber, a.id_wbs, a.id_kegiatan
+    FROM absensi a
+    JOIN wbs w ON a.id_wbs = w.id_wbs
+    JOIN kegiatan k ON a.id_kegiatan = k.id_kegiatan
+"""
+# Urutan keyset: (tanggal, waktu_absensi) terbaru dulu; id_wbs/id_kegiatan sebagai pemecah seri
+LAPORAN_ORDER = " ORDER BY a.tanggal DESC, a.waktu_absensi DESC, a.id_wbs DESC, a.id_kegiatan DESC"
+LAPORAN_PAGE_SIZE = 500
+LAPORAN_MAX_PAGE_SIZE = 5000
+LAPORAN_STREAM_CHUNK = 1000
+
+
+def _laporan_filters(args):
+    """Kondisi WHERE dari query string: tgl_mulai, tgl_selesai, kegiatan_id.
+
+    ``tgl_mulai`` tanpa ``tgl_selesai`` berarti satu hari itu saja (seperti
+    sebelumnya). Melempar ``ValueError`` jika formatnya salah.
+    """
+    tgl_mulai = args.get('tgl_mulai', '').strip()
+    tgl_selesai = args.get('tgl_selesai', '').strip() or tgl_mulai
+    conds, params = [], []
+    if tgl_mulai:
+        conds.append("a.tanggal >= %s")
+        params.append(datetime.strptime(tgl_mulai, "%Y-%m-%d").date())
+    if tgl_selesai:
+        conds.append("a.tanggal <= %s")
+        params.append(datetime.strptime(tgl_selesai, "%Y-%m-%d").date())
+    kegiatan_id = args.get('kegiatan_id', '').strip()
+    if kegiatan_id:
+        conds.append("a.id_kegiatan = %s")
+        params.append(int(kegiatan_id))
+    return conds, params
+
+
+def _laporan_row(item):
+    # Tanggal & waktu (timedelta) dijadikan string agar bisa dikirim via JSON
+    for key in ('tanggal', 'waktu_absensi'):
+        if item.get(key) is not None:
+            item[key] = str(item[key])
+    return item
+
+
 @app.route('/api/laporan', methods=['GET'])
 def get_laporan():
-    import datetime
-    tgl_mulai = request.args.get('tgl_mulai', '').strip()
-    print("🕓 [DEBUG] Tanggal diterima dari frontend:", repr(tgl_mulai))
+    """Satu halaman laporan; halaman berikutnya lewat ``after=<next>`` (keyset, bukan OFFSET)."""
+    try:
+        conds, params = _laporan_filters(request.args)
+        limit = min(max(1, int(request.args.get('limit', LAPORAN_PAGE_SIZE))), LAPORAN_MAX_PAGE_SIZE)
+        after = request.args.get('after', '').strip()
+        if after:
+            tanggal, waktu, id_wbs, id_kegiatan = after.split('|')
+            tanggal = datetime.strptime(tanggal, "%Y-%m-%d").date()
+            # 'a.tanggal <= ...' memberi range index; perbandingan baris memotong di dalam hari itu
+            conds.append("a.tanggal <= %s AND (a.tanggal, a.waktu_absensi, a.id_wbs, a.id_kegiatan) < (%s, %s, %s, %s)")
+            params += [tanggal, tanggal, waktu, int(id_wbs), int(id_kegiatan)]
+    except ValueError:
+        return jsonify({"status": "error", "message": "Parameter laporan tidak valid"}), 400
 
-    db = connect_db()
-    if not db:
-        print("❌ DB GAGAL TERHUBUNG")
+    query = LAPORAN_SELECT
+    if conds:
+        query += " WHERE " + " AND ".join(conds)
+    query += LAPORAN_ORDER + " LIMIT %s"
+    params.append(limit + 1)
+
+    try:
+        with db_connection() as db:
+            cursor = db.cursor(dictionary=True)
+            cursor.execute(query, params)
+            hasil = cursor.fetchall()
+            cursor.close()
+    except DB_ERRORS as e:
+        print("❌ DB GAGAL TERHUBUNG:", e)
         return jsonify({"status": "error", "message": "Gagal terhubung ke database"}), 500
+    except Exception as e:
+        print("🔥 ERROR LAPORAN:", e)
+        return jsonify({"status": "error", "message": f"Kesalahan server: {e}"}), 500
+
+    next_cursor = None
+    if len(hasil) > limit:
+        hasil = hasil[:limit]
+        last = hasil[-1]
+        next_cursor = f"{last['tanggal']}|{last['waktu_absensi']}|{last['id_wbs']}|{last['id_kegiatan']}"
+    return jsonify({"status": "success", "data": [_laporan_row(item) for item in hasil], "next": next_cursor})
 
+
+@app.route('/api/laporan/export', methods=['GET'])
+def export_laporan():
+    """Export laporan sebagai JSON lines (``format=jsonl``) atau CSV (``format=csv``).
+
+    Baris dibaca bertahap dari cursor unbuffered (``fetchmany``) dan langsung
+    dikirim, sehingga memori tetap datar berapa pun rentang tanggalnya.
+    """
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({"status": "error", "message": "Format harus csv atau jsonl"}), 400
     try:
-        cursor = db.cursor(dictionary=True)
-
-        # --- Jika tidak ada tanggal, ambil semua data absensi ---
-        if not tgl_mulai:
-            print("⚙️ [DEBUG] Tidak ada tanggal, ambil semua data absensi")
-            cursor.execute("""
-                SELECT a.tanggal, a.waktu_absensi, w.nama AS nama_wbs, 
-                       k.nama_kegiatan, a.narasumber 
-                FROM absensi a
-                JOIN wbs w ON a.id_wbs = w.id_wbs
-                JOIN kegiatan k ON a.id_kegiatan = k.id_kegiatan
-                ORDER BY a.tanggal DESC, a.waktu_absensi DESC
-            """)
-        else:
-            try:
-                tanggal_obj = datetime.datetime.strptime(tgl_mulai, "%Y-%m-%d").date()
-            except ValueError:
-                print("⚠️ [DEBUG] Format tanggal tidak valid:", tgl_mulai)
-                return jsonify({"status": "error", "message": "Format tanggal tidak valid"}), 400
-
-            print("✅ [DEBUG] Query dengan tanggal:", tanggal_obj)
-
-            cursor.execute("""
-                SELECT a.tanggal, a.waktu_absensi, w.nama AS nama_wbs, 
-                       k.nama_kegiatan, a.narasumber 
-                FROM absensi a
-                JOIN wbs w ON a.id_wbs = w.id_wbs
-                JOIN kegiatan k ON a.id_kegiatan = k.id_kegiatan
-                WHERE a.tanggal = %s
-                ORDER BY a.waktu_absensi DESC
-            """, (tanggal_obj,))
-
-        hasil = cursor.fetchall()
-
-        # 🔧 FIX: Konversi field waktu & tanggal jadi string agar bisa dikirim via JSON
-        for item in hasil:
-            if "waktu_absensi" in item and item["waktu_absensi"] is not None:
-                item["waktu_absensi"] = str(item["waktu_absensi"])
-            if "tanggal" in item and item["tanggal"] is not None:
-                item["tanggal"] = str(item["tanggal"])
-
-        print("📊 [DEBUG] Jumlah data ditemukan:", len(hasil))
+        conds, params = _laporan_filters(request.args)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Parameter laporan tidak valid"}), 400
+    query = LAPORAN_SELECT + (" WHERE " + " AND ".join(conds) if conds else "") + LAPORAN_ORDER
 
-        cursor.close()
-        db.close()
+    def generate():
+        with db_connection() as db:
+            cursor = db.cursor()
+            cursor.execute(query, params)
+            columns = cursor.column_names
+            if fmt == 'csv':
+                yield _csv_line(columns)
+            while True:
+                rows = cursor.fetchmany(LAPORAN_STREAM_CHUNK)
+                if not rows:
+                    break
+                if fmt == 'csv':
+                    yield ''.join(_csv_line(row) for row in rows)
+                else:
+                    yield ''.join(json.dumps(dict(zip(columns, row)), default=str, ensure_ascii=False) + '\n'
+                                  for row in rows)
+            cursor.close()
 
-        return jsonify({"status": "success", "data": hasil})
+    headers = {'X-Accel-Buffering': 'no'}  # jangan ditahan proxy
+    if fmt == 'csv':
+        headers['Content-Disposition'] = f"attachment; filename=laporan_{datetime.now():%Y%m%d_%H%M%S}.csv"
+        return Response(stream_with_context(generate()), mimetype='text/csv', headers=headers)
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers=headers)
 
-    except Exception as e:
-        print("🔥 ERROR LAPORAN:", e)
-        if db and db.is_connected():
+
+def _csv_line(values):
+    buf = io.StringIO()
+    csv.writer(buf).writerow(values)
+    return buf.getvalue()
+
+
+@app.route('/api/laporan/ringkasan', methods=['GET'])
+def get_ringkasan():
+    """Rekap dari tabel rekap (bukan tabel absensi mentah).
+
+    ``per_kegiatan``: jumlah WBS hadir per kegiatan per hari untuk
+    ``tgl_mulai``..``tgl_selesai`` (default 30 hari terakhir).
+    ``per_wbs``: jumlah absensi dan hari hadir tiap WBS pada ``periode``
+    (``YYYY-MM``, default bulan ``tgl_selesai``).
+    """
+    try:
+        tgl_selesai = request.args.get('tgl_selesai', '').strip()
+        tgl_selesai = datetime.strptime(tgl_selesai, "%Y-%m-%d").date() if tgl_selesai else datetime.now().date()
+        tgl_mulai = request.args.get('tgl_mulai', '').strip()
+        tgl_mulai = datetime.strptime(tgl_mulai, "%Y-%m-%d").date() if tgl_mulai else tgl_selesai - timedelta(days=29)
+        periode = request.args.get('periode', '').strip() or tgl_selesai.strftime("%Y-%m")
+        datetime.strptime(periode, "%Y-%m")
+        kegiatan_id = request.args.get('kegiatan_id', '').strip()
+        kegiatan_id = int(kegiatan_id) if kegiatan_id else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "Parameter ringkasan tidak valid"}), 400
+
+    try:
+        with db_connection() as db:
+            cursor = db.cursor(dictionary=True)
+            per_kegiatan, per_wbs = read_summary(cursor, tgl_mulai, tgl_selesai, periode, kegiatan_id)
             cursor.close()
-            db.close()
-        return jsonify({"status": "error", "message": f"Kesalahan server: {e}"}), 500
+    except DB_ERRORS as e:
+        print("Error /api/laporan/ringkasan:", e)
+        return jsonify({"status": "error", "message": "Gagal membaca rekap absensi"}), 500
+
+    for item in per_kegiatan:
+        item['tanggal'] = str(item['tanggal'])
+    return jsonify({
+        "status": "success",
+        "tgl_mulai": str(tgl_mulai),
+        "tgl_selesai": str(tgl_selesai),
+        "periode": periode,
+        "per_kegiatan": per_kegiatan,
+        "per_wbs": per_wbs,
+    })
 
-   
 
 # --- API DAFTAR WAJAH ---
 @app.route('/api/daftar_wajah', methods=['POST'])
 def daftar_wajah():
-    data = request.json
+    with stage('read'):
+        data, raw = read_request_frame()
     id_wbs = data.get('id_wbs')
-    image_data_url = data.get('image')
-    if not id_wbs or not image_data_url:
+    if not id_wbs or not raw:
         return jsonify({"status": "error", "message": "Data tidak lengkap."}), 400
+    if len(raw) > MAX_FRAME_BYTES:
+        return jsonify({"status": "error", "message": "Ukuran gambar terlalu besar."}), 413
     try:
-        encoded_data = image_data_url.split(',')[1]
-        nparr = np.frombuffer(base64.b64decode(encoded_data), np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        faces = face_recognition.face_locations(rgb)
-        if not faces:
+        with stage('decode'):
+            rgb = decode_frame(raw)
+        if rgb is None:
+            return jsonify({"status": "error", "message": "Gagal membaca gambar."}), 400
+        with stage('inference'):
+            faces, encodings = run_inference(rgb, quality=ENROLL_QUALITY)
+        if not faces or not encodings:
             return jsonify({"status": "failed", "message": "Tidak ada wajah terdeteksi."}), 200
-        enc = face_recognition.face_encodings(rgb, faces)[0]
-        binary = pickle.dumps(enc)
-        db = connect_db()
-        cursor = db.cursor()
-        cursor.execute("UPDATE wbs SET face_encoding=%s WHERE id_wbs=%s", (binary, id_wbs))
-        db.commit()
-        cursor.close()
-        db.close()
-        return jsonify({"status": "success", "message": "Pendaftaran wajah berhasil. Restart server agar aktif."})
+        enc = encodings[0]
+        # Dengan tabel sampel: foto ini menjadi sampel tambahan (replace=1 untuk mengganti semua)
+        with data_lock:
+            pakai_sampel = GALLERY.samples is not None
+        replace = str(data.get('replace', '')).lower() in ('1', 'true', 'ya')
+        samples = None
+        with stage('db'), db_connection() as db:
+            cursor = db.cursor()
+            cursor.execute("SELECT nama FROM wbs WHERE id_wbs=%s", (id_wbs,))
+            row = cursor.fetchone()
+            if row and pakai_sampel:
+                samples, enc = add_sample(cursor, int(id_wbs), enc, replace=replace,
+                                          allow_pickle=ALLOW_LEGACY_PICKLE)
+                if enc is None:
+                    db.rollback()
+                    cursor.close()
+                    return jsonify({"status": "error", "message": "Sampel wajah tidak bisa dibaca."}), 500
+            elif row:
+                cursor.execute("UPDATE wbs SET face_encoding=%s WHERE id_wbs=%s", (encode_encoding(enc), id_wbs))
+            db.commit()
+            cursor.close()
+        if not row:
+            return jsonify({"status": "failed", "message": "WBS tidak ditemukan."}), 404
+
+        # Langsung aktif: masukkan ke galeri yang sedang berjalan
+        if samples is None:
+            apply_gallery_updates([(int(id_wbs), row[0], enc)])
+            message = "Pendaftaran wajah berhasil dan langsung aktif."
+        else:
+            apply_gallery_updates([(int(id_wbs), row[0], enc)], sample_upserts={int(id_wbs): samples})
+            message = f"Pendaftaran wajah berhasil ({len(samples)} sampel) dan langsung aktif."
+        invalidate_wbs_list()  # status is_registered berubah
+        return jsonify({"status": "success", "message": message})
+    except InferenceBusy as e:
+        return busy_response(e)
+    except LowQualityFace as e:
+        return jsonify({"status": "failed", "reason": e.reason, "message": e.message}), 200
     except Exception as e:
         return jsonify({"status": "error", "message": f"Kesalahan: {e}"}), 500
 
 
+# --- API STATUS POOL KONEKSI DATABASE ---
+@app.route('/api/db_pool', methods=['GET'])
+def db_pool_status():
+    return jsonify({
+        "status": "success",
+        "data": get_pool().metrics(),
+        "writer": ATTENDANCE_WRITER.metrics(),
+        "inference": INFERENCE_POOL.metrics() if INFERENCE_POOL else None,
+    })
+
+
+# --- API CACHE TABEL REFERENSI ---
+@app.route('/api/cache', methods=['GET'])
+def cache_status():
+    data = cache_metrics()
+    data[GALLERY_SHARDS.name] = GALLERY_SHARDS.metrics()
+    return jsonify({"status": "success", "data": data})
+
+
+@app.route('/api/cache/invalidate', methods=['POST'])
+def cache_invalidate():
+    """Kosongkan cache setelah tabel kegiatan/wbs diubah langsung di database."""
+    nama = (request.get_json(silent=True) or {}).get('cache')
+    caches = [c for c in ALL_CACHES + (GALLERY_SHARDS,) if nama in (None, c.name)]
+    if not caches:
+        return jsonify({"status": "error", "message": f"Cache '{nama}' tidak dikenal."}), 400
+    for cache in caches:
+        cache.invalidate()
+    return jsonify({"status": "success", "message": f"{len(caches)} cache dikosongkan."})
+
+
+# --- METRIK PROMETHEUS ---
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Metrik proses ini dalam format teks Prometheus (tiap worker di-scrape sendiri)."""
+    with data_lock:
+        gallery = GALLERY
+    lines = STAGE_SECONDS.render() + REQUEST_SECONDS.render() + ABSENSI_OUTCOMES.render()
+    lines += render_gauges('psbr_gallery_faces', "Jumlah WBS di galeri wajah", len(gallery))
+    lines += render_gauges('psbr_gallery_samples', "Jumlah sampel wajah (multi-sampel)",
+                           len(gallery.samples) if gallery.samples is not None else 0)
+    lines += render_gauges('psbr_gallery_pending_rows', "Baris galeri yang belum masuk index",
+                           len(gallery.pending_rows))
+    lines += render_gauges('psbr_gallery_removed_rows', "Baris galeri yang dihapus tapi belum dipadatkan",
+                           gallery.removed)
+    lines += render_stats('psbr_db_pool', get_pool().metrics(), "Pool koneksi MySQL",
+                          counters=('checkouts', 'waits', 'wait_seconds', 'timeouts', 'overflow', 'created',
+                                    'discarded'))
+    lines += render_stats('psbr_writer', ATTENDANCE_WRITER.metrics(), "Penulis absensi (write-behind)",
+                          counters=('submitted', 'duplicates', 'written', 'batches', 'errors', 'dropped',
+                                    'summary_errors'))
+    if INFERENCE_POOL is not None:
+        lines += render_stats('psbr_inference', INFERENCE_POOL.metrics(), "Pool inferensi wajah",
+                              counters=('submitted', 'rejected', 'timeouts'))
+    lines += KIOSK_FRAMES.render()
+    lines += render_stats('psbr_kiosk_sessions', KIOSK_SESSIONS.metrics(), "Sesi kiosk kontinu",
+                          counters=('created', 'expired', 'evicted', 'closed'))
+    lines += render_stats('psbr_gallery_shards', GALLERY_SHARDS.metrics(), "Partisi galeri per lokasi/kegiatan",
+                          counters=('hits', 'loads', 'rebuilds', 'evictions', 'invalidations'))
+    lines += render_stats('psbr_cache', cache_metrics(), "Cache tabel referensi",
+                          counters=('hits', 'misses', 'evictions', 'invalidations'), labelname='cache')
+    for render in EXTRA_METRICS:
+        lines += render()
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
 # --- ROUTE HALAMAN DAFTAR WAJAH ---
 @app.route('/daftar_wajah')
 def daftar_wajah_page():
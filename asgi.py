@@ -0,0 +1,335 @@
+"""Mode server asyncio (ASGI) untuk route yang sama dengan ``app.py``.
+
+Event loop hanya menerima/mengirim bytes; handler Flask dijalankan di thread
+pool per "jalur" (lane), jadi query laporan yang lambat tidak pernah memakai
+thread yang dibutuhkan check-in kiosk:
+
+- ``api``: /api/absensi, /api/kiosk, /api/daftar_wajah, /api/wbs_list, halaman;
+- ``laporan``: /api/laporan* (query berat, thread sedikit, antrean dibatasi).
+
+Inferensi tetap di ``INFERENCE_POOL`` (proses terpisah) dan query MySQL
+memakai pool koneksi ``db_pool`` dari thread lane. Jalankan dengan:
+
+    python asgi.py --port 5000
+    uvicorn asgi:application --port 5000 --timeout-graceful-shutdown 20
+"""
+import argparse
+import asyncio
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Proses worker inferensi (spawn) menjalankan ulang modul utama sebagai
+# __mp_main__; di sana app tidak perlu dimuat.
+if __name__ != '__mp_main__':
+    import app as A
+    from db_pool import get_pool
+    from metrics import render_stats
+
+# --- KONFIGURASI LANE ---
+# (prefix path, nama lane); yang tidak cocok masuk DEFAULT_LANE.
+LANE_ROUTES = [
+    ('/api/laporan', 'laporan'),
+]
+DEFAULT_LANE = 'api'
+# Thread per lane. Thread lane api sebagian besar menunggu pool inferensi (yang
+# punya batas antrean sendiri); lane laporan dibatasi agar koneksi MySQL tetap
+# tersisa untuk kiosk (POOL_SIZE + POOL_MAX_OVERFLOW di db_pool.py).
+LANE_THREADS = {'api': 16, 'laporan': 2}
+# Request yang boleh menunggu di lane (None = tanpa batas); lebih dari ini dibalas 503
+LANE_MAX_QUEUE = {'api': None, 'laporan': 8}
+# Potongan body respon yang boleh menunggu dikirim ke klien (backpressure ekspor)
+STREAM_BUFFER = 8
+
+
+class _ClientGone(Exception):
+    """Klien memutus koneksi saat respon masih dikirim."""
+
+
+class Lane:
+    def __init__(self, name, threads, max_queue=None):
+        self.name = name
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"lane-{name}")
+        self.threads = threads
+        self._lock = threading.Lock()
+        self.active = 0
+        self.stats = {'requests': 0, 'rejected': 0}
+
+    def try_enter(self):
+        with self._lock:
+            if self.max_queue is not None and self.active >= self.threads + self.max_queue:
+                self.stats['rejected'] += 1
+                return False
+            self.active += 1
+            self.stats['requests'] += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.active -= 1
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self.stats)
+            data['active'] = self.active
+        data['threads'] = self.threads
+        return data
+
+
+def build_environ(scope, body):
+    """Environ WSGI (PEP 3333) dari scope HTTP ASGI dan body yang sudah dibaca penuh."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]) if server[1] is not None else '80',
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = name if name == 'CONTENT_TYPE' else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class AsgiApp:
+    """Jembatan ASGI -> aplikasi WSGI dengan thread pool per lane dan lifespan."""
+
+    def __init__(self, wsgi_app, max_body=None):
+        self.wsgi_app = wsgi_app
+        self.max_body = max_body
+        self.lanes = {name: Lane(name, threads, LANE_MAX_QUEUE.get(name))
+                      for name, threads in LANE_THREADS.items()}
+
+    def lane_for(self, path):
+        for prefix, name in LANE_ROUTES:
+            if path.startswith(prefix):
+                return self.lanes[name]
+        return self.lanes[DEFAULT_LANE]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    # --- lifespan: preload saat start, flush + tutup saat shutdown ---
+    async def _lifespan(self, receive, send):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await loop.run_in_executor(None, startup)
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await loop.run_in_executor(None, self.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def shutdown(self):
+        # Server sudah berhenti menerima koneksi dan menunggu request berjalan;
+        # tunggu sisa pekerjaan lane, lalu tulis absensi yang masih di antrean.
+        for lane in self.lanes.values():
+            lane.executor.shutdown(wait=True)
+        A.ATTENDANCE_WRITER.stop()
+        if A.INFERENCE_POOL is not None:
+            A.INFERENCE_POOL.shutdown()
+        get_pool().close()
+        print("👋 Server ASGI berhenti: antrean absensi sudah ditulis.")
+
+    # --- http ---
+    async def _read_body(self, receive):
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise _ClientGone()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if self.max_body is not None and size > self.max_body:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def _http(self, scope, receive, send):
+        try:
+            body = await self._read_body(receive)
+        except _ClientGone:
+            return
+        if body is None:
+            await _simple(send, 413, b'{"status": "error", "message": "Ukuran gambar terlalu besar."}')
+            return
+
+        lane = self.lane_for(scope['path'])
+        if not lane.try_enter():
+            await _simple(send, 503, b'{"status": "busy", "message": "Server sedang sibuk, coba lagi sebentar."}',
+                          [(b'retry-after', b'1')])
+            return
+
+        loop = asyncio.get_running_loop()
+        outbox = asyncio.Queue(maxsize=STREAM_BUFFER)
+        gone = threading.Event()
+
+        def emit(item):
+            # Dipanggil dari thread lane; menunggu jika klien lambat membaca
+            if gone.is_set():
+                raise _ClientGone()
+            asyncio.run_coroutine_threadsafe(outbox.put(item), loop).result()
+
+        def run():
+            try:
+                self._run_wsgi(build_environ(scope, body), emit)
+            except _ClientGone:
+                pass
+            except Exception as e:
+                print(f"❌ ERROR ASGI ({scope['path']}): {e}")
+                if not gone.is_set():
+                    asyncio.run_coroutine_threadsafe(outbox.put(('error', None)), loop).result()
+            finally:
+                lane.leave()
+
+        future = loop.run_in_executor(lane.executor, run)
+        watcher = asyncio.ensure_future(_wait_disconnect(receive))
+        started = False
+        try:
+            while True:
+                getter = asyncio.ensure_future(outbox.get())
+                await asyncio.wait({getter, watcher}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    # Klien pergi (mis. ekspor dibatalkan): hentikan thread lane di emit berikutnya
+                    getter.cancel()
+                    gone.set()
+                    while not outbox.empty():
+                        outbox.get_nowait()
+                    break
+                kind, data = getter.result()
+                if kind == 'start':
+                    status, headers = data
+                    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+                    started = True
+                elif kind == 'body':
+                    await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+                elif kind == 'error' and not started:
+                    await _simple(send, 500, b'{"status": "error", "message": "Kesalahan server."}')
+                    break
+                else:
+                    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+                    break
+        finally:
+            watcher.cancel()
+            if not future.done():
+                gone.set()
+                while not outbox.empty():
+                    outbox.get_nowait()
+            await future
+
+    def _run_wsgi(self, environ, emit):
+        """Jalankan app WSGI di thread lane; header dan body dikirim lewat ``emit``."""
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+            return lambda data: write(data)
+
+        def write(data):
+            if not response.get('sent'):
+                emit(('start', (response['status'], response['headers'])))
+                response['sent'] = True
+            if data:
+                emit(('body', bytes(data)))
+
+        iterable = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in iterable:
+                write(chunk)
+            write(b'')
+        finally:
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                close()
+        emit(('end', None))
+
+    def metrics_lines(self):
+        lines = []
+        for name, lane in self.lanes.items():
+            lines += render_stats(f"psbr_lane_{name}", lane.metrics(), f"Lane ASGI {name}",
+                                  counters=('requests', 'rejected'))
+        return lines
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _simple(send, status, body, headers=()):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'), *headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def startup():
+    """Preload per proses server: worker inferensi dan thread penulis absensi.
+
+    Galeri sudah dimuat saat ``import app`` (dari snapshot jika ada).
+    """
+    if A.INFERENCE_POOL is not None:
+        A.INFERENCE_POOL.start()
+    A.ATTENDANCE_WRITER.start()
+    with A.data_lock:
+        jumlah = len(A.GALLERY)
+    print(f"🚀 Server ASGI siap: {jumlah} wajah di galeri.")
+
+
+if __name__ != '__mp_main__':
+    application = AsgiApp(A.app, max_body=A.app.config['MAX_CONTENT_LENGTH'])
+    A.EXTRA_METRICS.append(application.metrics_lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server ASGI (uvicorn) untuk aplikasi absensi.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--graceful-timeout', type=int, default=20,
+                        help="Detik menunggu request berjalan selesai saat SIGTERM/SIGINT")
+    args = parser.parse_args()
+    try:
+        import uvicorn
+    except ImportError:
+        print("❌ uvicorn belum terpasang: pip install uvicorn")
+        sys.exit(1)
+    # Satu proses saja: inferensi sudah paralel di INFERENCE_POOL dan handler di
+    # thread lane; beberapa proses berarti galeri dan pool inferensi ganda.
+    uvicorn.run(application, host=args.host, port=args.port, lifespan='on',
+                timeout_graceful_shutdown=args.graceful_timeout)
+
+
+if __name__ == '__main__':
+    main()
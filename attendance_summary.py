@@ -0,0 +1,157 @@
+import argparse
+from datetime import date, datetime, timedelta
+
+import mysql.connector
+
+from db_pool import PoolTimeout, db_connection
+
+# Rekap absensi untuk dashboard laporan, diperbarui setiap kali AttendanceWriter
+# menulis batch (hanya kunci yang tersentuh dihitung ulang dari tabel absensi,
+# jadi hasilnya selalu sama dengan hitungan penuh).
+#
+#   CREATE TABLE rekap_kegiatan_harian (
+#       tanggal DATE NOT NULL,
+#       id_kegiatan INT NOT NULL,
+#       jumlah_wbs INT NOT NULL,
+#       PRIMARY KEY (tanggal, id_kegiatan)
+#   );
+#   CREATE TABLE rekap_wbs_bulanan (
+#       periode CHAR(7) NOT NULL,          -- 'YYYY-MM'
+#       id_wbs INT NOT NULL,
+#       jumlah_absensi INT NOT NULL,
+#       hari_hadir INT NOT NULL,
+#       PRIMARY KEY (periode, id_wbs)
+#   );
+
+REFRESH_KEGIATAN = """
+    INSERT INTO rekap_kegiatan_harian (tanggal, id_kegiatan, jumlah_wbs)
+    SELECT tanggal, id_kegiatan, COUNT(DISTINCT id_wbs)
+    FROM absensi WHERE tanggal = %s AND id_kegiatan = %s
+    GROUP BY tanggal, id_kegiatan
+    ON DUPLICATE KEY UPDATE jumlah_wbs = VALUES(jumlah_wbs)
+"""
+REFRESH_WBS = """
+    INSERT INTO rekap_wbs_bulanan (periode, id_wbs, jumlah_absensi, hari_hadir)
+    SELECT %s, id_wbs, COUNT(*), COUNT(DISTINCT tanggal)
+    FROM absensi WHERE id_wbs = %s AND tanggal >= %s AND tanggal < %s
+    GROUP BY id_wbs
+    ON DUPLICATE KEY UPDATE jumlah_absensi = VALUES(jumlah_absensi), hari_hadir = VALUES(hari_hadir)
+"""
+
+
+def month_range(periode):
+    """'2025-10' -> (date(2025, 10, 1), date(2025, 11, 1))."""
+    awal = datetime.strptime(periode, "%Y-%m").date()
+    akhir = (awal.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return awal, akhir
+
+
+def months_between(awal, akhir):
+    """Semua periode 'YYYY-MM' dari bulan ``awal`` sampai bulan ``akhir`` (date atau 'YYYY-MM-DD')."""
+    awal, akhir = (d if isinstance(d, date) else date.fromisoformat(str(d)[:10]) for d in (awal, akhir))
+    bulan = awal.replace(day=1)
+    while bulan <= akhir:
+        periode = bulan.strftime("%Y-%m")
+        yield periode
+        bulan = month_range(periode)[1]
+
+
+def refresh_summary(cursor, rows):
+    """Hitung ulang rekap untuk kunci yang disentuh ``rows`` (baris INSERT absensi)."""
+    kegiatan = {(r[2], r[1]) for r in rows}
+    wbs = {(r[2].strftime("%Y-%m"), r[0]) for r in rows}
+    for tanggal, id_kegiatan in sorted(kegiatan):
+        cursor.execute(REFRESH_KEGIATAN, (tanggal, id_kegiatan))
+    for periode, id_wbs in sorted(wbs):
+        awal, akhir = month_range(periode)
+        cursor.execute(REFRESH_WBS, (periode, id_wbs, awal, akhir))
+
+
+def rebuild_summary(db, tgl_mulai=None, tgl_selesai=None):
+    """Bangun ulang rekap dari seluruh tabel absensi (atau rentang tanggal) untuk backfill."""
+    cursor = db.cursor()
+    cond, params = "", []
+    if tgl_mulai:
+        cond += " AND tanggal >= %s"
+        params.append(tgl_mulai)
+    if tgl_selesai:
+        cond += " AND tanggal <= %s"
+        params.append(tgl_selesai)
+    try:
+        cursor.execute("DELETE FROM rekap_kegiatan_harian WHERE 1=1" + cond, params)
+        cursor.execute(f"""
+            INSERT INTO rekap_kegiatan_harian (tanggal, id_kegiatan, jumlah_wbs)
+            SELECT tanggal, id_kegiatan, COUNT(DISTINCT id_wbs) FROM absensi
+            WHERE 1=1 {cond} GROUP BY tanggal, id_kegiatan
+        """, params)
+        jumlah_kegiatan = cursor.rowcount
+
+        # Rekap bulanan selalu dihitung per bulan penuh. Daftar bulan dibuat di
+        # Python dari MIN/MAX(tanggal): tanpa DATE_FORMAT, jadi tidak ada '%' di
+        # teks query (mysql-connector tidak mengubah '%%' menjadi '%').
+        cursor.execute("SELECT MIN(tanggal), MAX(tanggal) FROM absensi WHERE 1=1" + cond, params)
+        pertama, terakhir = cursor.fetchone()
+        periode = list(months_between(pertama, terakhir)) if pertama is not None else []
+        jumlah_wbs = 0
+        for p in periode:
+            awal, akhir = month_range(p)
+            cursor.execute("DELETE FROM rekap_wbs_bulanan WHERE periode = %s", (p,))
+            cursor.execute("""
+                INSERT INTO rekap_wbs_bulanan (periode, id_wbs, jumlah_absensi, hari_hadir)
+                SELECT %s, id_wbs, COUNT(*), COUNT(DISTINCT tanggal) FROM absensi
+                WHERE tanggal >= %s AND tanggal < %s GROUP BY id_wbs
+            """, (p, awal, akhir))
+            jumlah_wbs += cursor.rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    return jumlah_kegiatan, jumlah_wbs
+
+
+def read_summary(cursor, tgl_mulai, tgl_selesai, periode, kegiatan_id=None):
+    """Isi /api/laporan/ringkasan: rekap harian per kegiatan dan rekap bulanan per WBS."""
+    query = """
+        SELECT r.tanggal, r.id_kegiatan, k.nama_kegiatan, r.jumlah_wbs
+        FROM rekap_kegiatan_harian r
+        JOIN kegiatan k ON r.id_kegiatan = k.id_kegiatan
+        WHERE r.tanggal BETWEEN %s AND %s
+    """
+    params = [tgl_mulai, tgl_selesai]
+    if kegiatan_id:
+        query += " AND r.id_kegiatan = %s"
+        params.append(kegiatan_id)
+    cursor.execute(query + " ORDER BY r.tanggal DESC, k.nama_kegiatan", params)
+    per_kegiatan = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT r.id_wbs, w.nama, r.jumlah_absensi, r.hari_hadir
+        FROM rekap_wbs_bulanan r
+        JOIN wbs w ON r.id_wbs = w.id_wbs
+        WHERE r.periode = %s
+        ORDER BY w.nama
+    """, (periode,))
+    per_wbs = cursor.fetchall()
+    return per_kegiatan, per_wbs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bangun ulang tabel rekap absensi dari tabel absensi.")
+    parser.add_argument('--dari', help="Tanggal awal YYYY-MM-DD (default: semua)")
+    parser.add_argument('--sampai', help="Tanggal akhir YYYY-MM-DD (default: semua)")
+    args = parser.parse_args()
+    tgl_mulai = date.fromisoformat(args.dari) if args.dari else None
+    tgl_selesai = date.fromisoformat(args.sampai) if args.sampai else None
+    try:
+        with db_connection() as db:
+            jumlah_kegiatan, jumlah_wbs = rebuild_summary(db, tgl_mulai, tgl_selesai)
+    except (mysql.connector.Error, PoolTimeout) as err:
+        print(f"❌ Gagal membangun ulang rekap: {err}")
+        return
+    print(f"✅ Rekap dibangun ulang: {jumlah_kegiatan} baris kegiatan harian, {jumlah_wbs} baris WBS bulanan.")
+
+
+if __name__ == '__main__':
+    main()
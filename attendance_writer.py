@@ -0,0 +1,260 @@
+import atexit
+import json
+import os
+import queue
+import time
+from datetime import date, datetime
+from threading import Event, Lock, Thread
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from attendance_summary import refresh_summary
+from db_pool import PoolTimeout, db_connection
+
+INSERT_ABSENSI = """
+    INSERT INTO absensi (id_wbs, id_kegiatan, tanggal, waktu_absensi, narasumber)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+# Error koneksi: batch disimpan dan dicoba lagi. Error data (FK, tipe): baris dicoba satu per satu.
+_RETRY_ERRORS = (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError, PoolTimeout)
+
+
+class AttendanceWriter:
+    """Antrean tulis absensi (write-behind).
+
+    ``submit`` hanya mencatat baris ke antrean dan langsung kembali; thread
+    latar belakang menggabungkan baris menjadi satu ``executemany`` setiap
+    ``batch_size`` baris atau ``flush_interval`` detik. Scan ulang orang yang
+    sama untuk kegiatan yang sama di hari yang sama tidak dicatat dua kali.
+    Saat proses berhenti, sisa antrean di-flush; jika database tidak bisa
+    dihubungi, baris disimpan ke ``spool_path`` dan dikirim ulang saat start.
+    Jika ``summary`` aktif, tabel rekap (``attendance_summary``) ikut
+    diperbarui setelah setiap batch. ``on_flush(detik, jumlah_baris)``
+    dipanggil setelah setiap batch berhasil ditulis (untuk metrik).
+    """
+
+    def __init__(self, batch_size=50, flush_interval=0.5, spool_path=None, summary=True, on_flush=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.summary = summary
+        self.on_flush = on_flush
+        self._queue = queue.Queue()
+        self._lock = Lock()
+        self._seen = set()
+        self._seen_date = None
+        self._thread = None
+        self._ready = Event()
+        self._stopping = False
+        self.stats = {'submitted': 0, 'duplicates': 0, 'written': 0, 'batches': 0, 'errors': 0, 'dropped': 0,
+                      'summary_errors': 0}
+
+    # --- sisi request ---
+    def submit(self, id_wbs, id_kegiatan, narasumber, now=None):
+        """Antrekan satu absensi. ``False`` jika sudah tercatat hari ini untuk kegiatan ini."""
+        return self.submit_many([(id_wbs, id_kegiatan)], narasumber, now)[0]
+
+    def submit_many(self, pairs, narasumber, now=None):
+        """Antrekan beberapa absensi sekaligus; semuanya ditulis dalam satu transaksi."""
+        self._ensure_started()
+        # Tunggu daftar absensi hari ini termuat (sekali saja, setelah start)
+        self._ready.wait(timeout=5.0)
+        now = now or datetime.now()
+        hasil, rows = [], []
+        with self._lock:
+            self._roll_date(now.date())
+            for id_wbs, id_kegiatan in pairs:
+                key = (int(id_wbs), int(id_kegiatan))
+                if key in self._seen:
+                    self.stats['duplicates'] += 1
+                    hasil.append(False)
+                    continue
+                self._seen.add(key)
+                rows.append((key[0], key[1], now.date(), now.time().replace(microsecond=0), narasumber))
+                hasil.append(True)
+            self.stats['submitted'] += len(rows)
+        if rows:
+            self._queue.put(rows)
+        return hasil
+
+    def _roll_date(self, hari):
+        if self._seen_date != hari:
+            self._seen = set()
+            self._seen_date = hari
+
+    # --- thread penulis ---
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='attendance-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def start(self):
+        """Nyalakan thread penulis sekarang (preload dedupe) alih-alih saat absensi pertama."""
+        self._ensure_started()
+
+    def _preload(self):
+        # Isi daftar yang sudah absen hari ini agar dedupe tetap benar setelah restart
+        spooled = self._read_spool()
+        for rows in spooled:
+            self._queue.put(rows)
+        try:
+            with db_connection() as db:
+                cursor = db.cursor()
+                cursor.execute("SELECT id_wbs, id_kegiatan FROM absensi WHERE tanggal = %s", (date.today(),))
+                existing = cursor.fetchall()
+                cursor.close()
+        except Exception as e:
+            print(f"⚠️ Gagal memuat absensi hari ini untuk dedupe: {e}")
+            return
+        with self._lock:
+            self._roll_date(date.today())
+            self._seen.update((int(a), int(b)) for a, b in existing)
+            self._seen.update((r[0], r[1]) for group in spooled for r in group if r[2] == date.today())
+
+    def _run(self):
+        try:
+            self._preload()
+        finally:
+            self._ready.set()
+        pending = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if self._stopping:
+                # Sentinel berhenti bisa sudah terambil saat flush terakhir: jangan menunggu lagi
+                timeout = 0.0
+            try:
+                rows = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                rows = None
+            if rows is None and self._stopping and not pending:
+                return
+            if rows:
+                if not pending:
+                    deadline = time.monotonic() + self.flush_interval
+                pending.append(rows)
+            jumlah = sum(len(r) for r in pending)
+            if pending and (rows is None or jumlah >= self.batch_size or self._stopping):
+                if self._flush(pending):
+                    pending = []
+                    deadline = None
+                elif self._stopping:
+                    self._write_spool(pending)
+                    return
+                else:
+                    deadline = time.monotonic() + min(5.0, self.flush_interval * 4)
+
+    def _flush(self, pending):
+        rows = [row for group in pending for row in group]
+        t0 = time.perf_counter()
+        try:
+            with db_connection() as db:
+                cursor = db.cursor()
+                try:
+                    cursor.executemany(INSERT_ABSENSI, rows)
+                    db.commit()
+                except _RETRY_ERRORS:
+                    raise
+                except mysql.connector.Error as e:
+                    db.rollback()
+                    print(f"⚠️ Batch absensi gagal ({e}), dicoba per kelompok.")
+                    self._flush_groups(db, cursor, pending)
+                finally:
+                    cursor.close()
+        except _RETRY_ERRORS as e:
+            with self._lock:
+                self.stats['errors'] += 1
+            print(f"⚠️ Database tidak tersedia, {len(rows)} absensi ditahan: {e}")
+            return False
+        with self._lock:
+            self.stats['written'] += len(rows)
+            self.stats['batches'] += 1
+        if self.on_flush is not None:
+            self.on_flush(time.perf_counter() - t0, len(rows))
+        if self.summary:
+            self._refresh_summary(rows)
+        return True
+
+    def _refresh_summary(self, rows):
+        # Transaksi terpisah: gagal memperbarui rekap tidak boleh membatalkan absensi
+        try:
+            with db_connection() as db:
+                cursor = db.cursor()
+                try:
+                    refresh_summary(cursor, rows)
+                    db.commit()
+                finally:
+                    cursor.close()
+        except mysql.connector.errors.ProgrammingError as e:
+            print(f"⚠️ Tabel rekap absensi tidak tersedia, rekap otomatis nonaktif: {e}")
+            self.summary = False
+        except (mysql.connector.Error, PoolTimeout) as e:
+            with self._lock:
+                self.stats['summary_errors'] += 1
+            print(f"⚠️ Gagal memperbarui rekap absensi (perbaiki dengan attendance_summary.py): {e}")
+
+    def _flush_groups(self, db, cursor, pending):
+        for group in pending:
+            try:
+                cursor.executemany(INSERT_ABSENSI, group)
+                db.commit()
+            except _RETRY_ERRORS:
+                raise
+            except mysql.connector.Error as e:
+                db.rollback()
+                if len(group) > 1:
+                    # Satu baris bermasalah tidak boleh membuang baris lain di kelompok yang sama
+                    self._flush_groups(db, cursor, [[row] for row in group])
+                    continue
+                with self._lock:
+                    self.stats['written'] -= 1
+                    if e.errno == errorcode.ER_DUP_ENTRY:
+                        # Sudah dicatat worker lain (index unik migrasi 2)
+                        self.stats['duplicates'] += 1
+                        continue
+                    self.stats['dropped'] += 1
+                print(f"❌ Absensi dibuang karena data tidak valid {group}: {e}")
+
+    # --- spool untuk ketahanan saat database mati ---
+    def _write_spool(self, pending):
+        if not self.spool_path:
+            print(f"❌ {sum(len(g) for g in pending)} absensi hilang: database tidak tersedia saat berhenti.")
+            return
+        os.makedirs(os.path.dirname(self.spool_path) or '.', exist_ok=True)
+        with open(self.spool_path, 'a', encoding='utf-8') as f:
+            for group in pending:
+                f.write(json.dumps([[r[0], r[1], r[2].isoformat(), r[3].isoformat(), r[4]] for r in group]) + '\n')
+        print(f"💾 Absensi yang belum tertulis disimpan ke {self.spool_path}")
+
+    def _read_spool(self):
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return []
+        groups = []
+        with open(self.spool_path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    groups.append([(a, b, date.fromisoformat(c), datetime.strptime(d, '%H:%M:%S').time(), e)
+                                   for a, b, c, d, e in json.loads(line)])
+        os.remove(self.spool_path)
+        print(f"📤 {sum(len(g) for g in groups)} absensi dari spool dikirim ulang.")
+        return groups
+
+    def stop(self, timeout=10.0):
+        """Flush sisa antrean lalu hentikan thread penulis (dipanggil otomatis saat exit)."""
+        if self._thread is None or self._stopping:
+            return
+        self._stopping = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self.stats)
+        data['queued'] = self._queue.qsize()
+        return data
@@ -0,0 +1,103 @@
+"""Benchmark resolusi deteksi: latensi HOG dan kecocokan hasil per lebar deteksi.
+
+Referensi adalah deteksi + encoding pada ukuran asli. Untuk tiap lebar,
+dicatat waktu deteksi, waktu encoding, apakah wajah tetap terdeteksi, dan
+apakah encoding-nya masih cocok (jarak <= tolerance) dengan referensi.
+
+    python -m bench.detect_scale --photos wbs_photos_ready --widths 0 960 640 480 320 240
+"""
+import argparse
+import json
+import os
+import time
+
+import cv2
+import face_recognition
+import numpy as np
+
+from face_pipeline import detect_faces
+
+
+def load_photos(folder, max_width=None):
+    photos = []
+    for fn in sorted(os.listdir(folder)):
+        if not fn.lower().endswith(('.jpg', '.jpeg', '.png')):
+            continue
+        img = cv2.imdecode(np.fromfile(os.path.join(folder, fn), dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            continue
+        if max_width and img.shape[1] > max_width:
+            # Simulasi frame webcam kiosk
+            scale = max_width / img.shape[1]
+            img = cv2.resize(img, (max_width, round(img.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+        photos.append((fn, np.ascontiguousarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))))
+    return photos
+
+
+def run(photos, widths, roi, upsample, tolerance):
+    referensi = {}
+    hasil = []
+    for width in widths:
+        detect_ms, encode_ms = [], []
+        terdeteksi = cocok = 0
+        for fn, rgb in photos:
+            t0 = time.perf_counter()
+            locations = detect_faces(rgb, detect_width=width or None, roi=roi, upsample=upsample)
+            detect_ms.append((time.perf_counter() - t0) * 1000)
+            if not locations:
+                continue
+            terdeteksi += 1
+            t0 = time.perf_counter()
+            enc = face_recognition.face_encodings(rgb, known_face_locations=locations[:1])[0]
+            encode_ms.append((time.perf_counter() - t0) * 1000)
+
+            if fn not in referensi:
+                referensi[fn] = enc  # lebar pertama (0 = asli) jadi acuan
+            if np.linalg.norm(referensi[fn] - enc) <= tolerance:
+                cocok += 1
+
+        baris = {
+            'detect_width': width or None,
+            'roi': roi,
+            'photos': len(photos),
+            'detect_mean_ms': round(float(np.mean(detect_ms)), 2),
+            'detect_p95_ms': round(float(np.percentile(detect_ms, 95)), 2),
+            'encode_mean_ms': round(float(np.mean(encode_ms)), 2) if encode_ms else None,
+            'detected': terdeteksi,
+            'match_agreement': round(cocok / len(photos), 3),
+        }
+        hasil.append(baris)
+        print(f"lebar={str(baris['detect_width']):>5}  deteksi={baris['detect_mean_ms']:>8.1f}ms "
+              f"(p95 {baris['detect_p95_ms']:.1f})  encode={baris['encode_mean_ms']}ms  "
+              f"terdeteksi={terdeteksi}/{len(photos)}  cocok={baris['match_agreement']:.0%}")
+    return hasil
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--photos', default='wbs_photos_ready')
+    parser.add_argument('--frame-width', type=int, default=640,
+                        help="Perkecil foto ke lebar ini dulu untuk meniru frame webcam (0 = foto asli)")
+    parser.add_argument('--widths', type=int, nargs='+', default=[0, 480, 320, 240],
+                        help="Lebar deteksi yang diuji; 0 = ukuran asli (harus pertama sebagai acuan)")
+    parser.add_argument('--roi', type=float, default=None)
+    parser.add_argument('--upsample', type=int, default=1)
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--output', help="Simpan hasil dalam format JSON")
+    args = parser.parse_args()
+
+    photos = load_photos(args.photos, args.frame_width or None)
+    if not photos:
+        print(f"❌ Tidak ada foto di '{args.photos}'.")
+        return
+    print(f"📸 {len(photos)} foto, frame {photos[0][1].shape[1]}x{photos[0][1].shape[0]}\n")
+    hasil = run(photos, args.widths, args.roi, args.upsample, args.tolerance)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(hasil, f, indent=2)
+        print(f"\n💾 Hasil disimpan ke {args.output}")
+
+
+if __name__ == '__main__':
+    main()
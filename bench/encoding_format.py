@@ -0,0 +1,79 @@
+"""Benchmark waktu muat galeri: pickle per baris vs format biner v1 (decode_many).
+
+Baris database disimulasikan di memori, jadi yang diukur hanya biaya decode
+dan penyusunan matriks saat startup.
+
+    python -m bench.encoding_format --sizes 10000 100000
+"""
+import argparse
+import json
+import pickle
+import time
+
+import numpy as np
+
+from bench.synthetic import make_gallery
+from face_codec import decode_many, encode_encoding
+from gallery import GalleryMatcher
+
+
+def _best_of(fn, repeat):
+    terbaik = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        terbaik = dt if terbaik is None else min(terbaik, dt)
+    return terbaik
+
+
+def load_pickle(blobs, ids):
+    # Sama seperti load_known_faces versi lama
+    encodings = []
+    for blob in blobs:
+        encodings.append(pickle.loads(blob))
+    return GalleryMatcher(encodings, ids, ids)
+
+
+def load_binary(blobs, ids):
+    matrix, ok = decode_many(blobs)
+    return GalleryMatcher(matrix[ok], ids, ids, dtype=np.float32)
+
+
+def run(size, repeat):
+    matrix = make_gallery(size)
+    ids = list(range(size))
+    pickle_blobs = [pickle.dumps(row) for row in matrix]
+    binary_blobs = [encode_encoding(row) for row in matrix]
+
+    t_pickle = _best_of(lambda: load_pickle(pickle_blobs, ids), repeat)
+    t_binary = _best_of(lambda: load_binary(binary_blobs, ids), repeat)
+    hasil = {
+        'size': size,
+        'pickle_s': round(t_pickle, 4),
+        'binary_s': round(t_binary, 4),
+        'speedup': round(t_pickle / t_binary, 2),
+        'pickle_bytes_per_row': len(pickle_blobs[0]),
+        'binary_bytes_per_row': len(binary_blobs[0]),
+    }
+    print(f"N={size:>7}  pickle={hasil['pickle_s']:.4f}s ({hasil['pickle_bytes_per_row']} B/baris)  "
+          f"biner={hasil['binary_s']:.4f}s ({hasil['binary_bytes_per_row']} B/baris)  {hasil['speedup']}x")
+    return hasil
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="Simpan hasil dalam format JSON")
+    args = parser.parse_args()
+
+    hasil = [run(size, args.repeat) for size in args.sizes]
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(hasil, f, indent=2)
+        print(f"\n💾 Hasil disimpan ke {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+"""Benchmark jalur utama: decode, deteksi, encoding, pencocokan, /api/absensi
+end-to-end (Flask test client), ``load_known_faces`` dan /api/laporan.
+
+Tidak butuh MySQL: database diganti SQLite (bench/sqlite_db.py) di folder
+sementara. Galeri memakai encoding foto ``wbs_photos`` (agar absensi
+end-to-end benar-benar cocok) ditambah encoding sintetis sampai 1k/10k/100k
+WBS. Hasil ditulis sebagai JSON supaya bisa dibandingkan antar-run.
+
+    python -m bench.hot_paths --output bench_lama.json
+    python -m bench.hot_paths --sizes 1000 10000 100000 --laporan-rows 100000 1000000 --output bench_baru.json
+    python -m bench.hot_paths --compare bench_lama.json bench_baru.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import cv2
+import numpy as np
+
+from bench import sqlite_db
+from bench.synthetic import make_gallery, make_queries
+from face_codec import encode_encoding
+from face_pipeline import PHOTO_EXTENSIONS, load_photo_rgb
+
+# Perbedaan median di atas batas ini ditandai saat --compare
+REGRESSION_THRESHOLD = 1.2
+
+
+def summarize(samples_ms):
+    a = np.asarray(samples_ms, dtype=np.float64)
+    if not len(a):
+        return {'n': 0}
+    return {
+        'n': int(len(a)),
+        'mean_ms': round(float(a.mean()), 3),
+        'p50_ms': round(float(np.percentile(a, 50)), 3),
+        'p95_ms': round(float(np.percentile(a, 95)), 3),
+        'p99_ms': round(float(np.percentile(a, 99)), 3),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def load_frames(photo_dir, width):
+    """Foto fixture sebagai JPEG selebar frame webcam kiosk: ``[(nama_file, bytes)]``."""
+    frames = []
+    for fn in sorted(os.listdir(photo_dir)):
+        if not fn.lower().endswith(PHOTO_EXTENSIONS):
+            continue
+        rgb = load_photo_rgb(os.path.join(photo_dir, fn))
+        if rgb is None:
+            continue
+        if width and rgb.shape[1] > width:
+            scale = width / rgb.shape[1]
+            rgb = cv2.resize(rgb, (width, round(rgb.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+        ok, jpg = cv2.imencode('.jpg', cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, 85])
+        if ok:
+            frames.append((fn, jpg.tobytes()))
+    return frames
+
+
+def bench_pipeline(A, frames, repeat):
+    """decode / detect / encode per frame; mengembalikan (hasil, {nama_file: encoding})."""
+    import face_recognition
+    from face_pipeline import detect_faces
+
+    decode_ms, detect_ms, encode_ms = [], [], []
+    encodings = {}
+    for _ in range(repeat):
+        for fn, jpg in frames:
+            rgb, ms = timed(A.decode_frame, jpg)
+            decode_ms.append(ms)
+            locations, ms = timed(detect_faces, rgb, **A.DETECT_OPTIONS)
+            detect_ms.append(ms)
+            if not locations:
+                continue
+            enc, ms = timed(face_recognition.face_encodings, rgb, known_face_locations=locations[:1])
+            encode_ms.append(ms)
+            encodings[fn] = np.asarray(enc[0], dtype=np.float64)
+    hasil = [
+        dict(section='pipeline', name='decode', size=len(frames), **summarize(decode_ms)),
+        dict(section='pipeline', name='detect', size=len(frames), **summarize(detect_ms)),
+        dict(section='pipeline', name='encode', size=len(frames), **summarize(encode_ms)),
+    ]
+    return hasil, encodings
+
+
+def seed_database(path, encodings, names, n_kegiatan=20, absensi_rows=0, days=365, seed=0, batch=50000):
+    sqlite_db.create_schema(path)
+    sqlite_db.install(path)
+    with sqlite_db.db_connection() as db:
+        cursor = db.cursor()
+        cursor.executemany("INSERT INTO wbs (nama, face_encoding) VALUES (%s, %s)",
+                           [(nama, encode_encoding(enc)) for nama, enc in zip(names, encodings)])
+        cursor.executemany("INSERT INTO kegiatan (nama_kegiatan) VALUES (%s)",
+                           [(f"Kegiatan {i + 1}",) for i in range(n_kegiatan)])
+
+        # Satu baris per (id_wbs, id_kegiatan, tanggal), hari terakhir = kemarin
+        rng = np.random.default_rng(seed)
+        n_wbs = len(names)
+        per_hari = min(absensi_rows // days + 1, n_wbs * n_kegiatan)
+        mulai = date.today() - timedelta(days=days)
+        rows, total = [], 0
+        for d in range(days):
+            if total >= absensi_rows:
+                break
+            tanggal = (mulai + timedelta(days=d)).isoformat()
+            n = min(per_hari, absensi_rows - total)
+            pasangan = rng.choice(n_wbs * n_kegiatan, size=n, replace=False)
+            detik = rng.integers(7 * 3600, 17 * 3600, size=n)
+            rows += [(int(p // n_kegiatan) + 1, int(p % n_kegiatan) + 1, tanggal,
+                      f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}", "PPTK: Bench | Narasumber: Bench")
+                     for p, s in zip(pasangan, detik)]
+            total += n
+            if len(rows) >= batch:
+                cursor.executemany("INSERT INTO absensi (id_wbs, id_kegiatan, tanggal, waktu_absensi, narasumber) "
+                                   "VALUES (%s, %s, %s, %s, %s)", rows)
+                rows = []
+        if rows:
+            cursor.executemany("INSERT INTO absensi (id_wbs, id_kegiatan, tanggal, waktu_absensi, narasumber) "
+                               "VALUES (%s, %s, %s, %s, %s)", rows)
+        db.commit()
+        cursor.close()
+
+
+def bench_gallery(A, workdir, size, photo_encodings, frames, repeat, n_queries):
+    """load_known_faces (dingin/snapshot), pencocokan, dan /api/absensi pada galeri ``size`` WBS."""
+    encodings = make_gallery(size, seed=size)
+    names = [f"WBS Sintetis {i + 1}" for i in range(size)]
+    for i, (fn, enc) in enumerate(list(photo_encodings.items())[:size]):
+        encodings[i] = enc
+        names[i] = os.path.splitext(fn)[0]
+    path = os.path.join(workdir, f"galeri_{size}.sqlite")
+    seed_database(path, encodings, names)
+    A.SNAPSHOT_DIR = os.path.join(workdir, f"snapshot_{size}")
+    A.INDEX_PATH = os.path.join(workdir, f"index_{size}.npz")
+
+    cold_ms, warm_ms = [], []
+    for _ in range(repeat):
+        shutil.rmtree(A.SNAPSHOT_DIR, ignore_errors=True)
+        _, ms = timed(A.load_known_faces)
+        cold_ms.append(ms)
+    for _ in range(repeat):
+        _, ms = timed(A.load_known_faces)
+        warm_ms.append(ms)
+    hasil = [
+        dict(section='startup', name='load_known_faces_db', size=size, **summarize(cold_ms)),
+        dict(section='startup', name='load_known_faces_snapshot', size=size, **summarize(warm_ms)),
+    ]
+
+    gallery = A.GALLERY
+    queries, _ = make_queries(np.asarray(gallery.matrix, dtype=np.float64), n_queries)
+    match_ms = []
+    for q in queries:
+        _, ms = timed(gallery.match_templates, q, tolerance=A.MATCH_TOLERANCE, top_k=1,
+                      shortlist=A.MATCH_SHORTLIST, slack=A.CENTROID_SLACK)
+        match_ms.append(ms)
+    hasil.append(dict(section='match', name='match_templates', size=size, **summarize(match_ms)))
+
+    client = A.app.test_client()
+    e2e_ms, outcomes = [], {}
+    for _ in range(repeat):
+        for fn, jpg in frames:
+            response, ms = timed(client.post, '/api/absensi', content_type='multipart/form-data', data={
+                'kegiatan_id': '1',
+                'image': (io.BytesIO(jpg), 'frame.jpg', 'image/jpeg'),
+            })
+            e2e_ms.append(ms)
+            body = response.get_json(silent=True) or {}
+            outcome = 'duplikat' if body.get('duplikat') else body.get('status', str(response.status_code))
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    hasil.append(dict(section='absensi', name='api_absensi_e2e', size=size, outcomes=outcomes,
+                      **summarize(e2e_ms)))
+    return hasil
+
+
+def bench_laporan(A, workdir, rows, pages, repeat):
+    """Halaman pertama, filter satu hari, halaman jauh lewat keyset, dan export JSONL sebulan."""
+    n_wbs = 1000
+    path = os.path.join(workdir, f"laporan_{rows}.sqlite")
+    seed_database(path, make_gallery(n_wbs), [f"WBS {i + 1}" for i in range(n_wbs)], absensi_rows=rows)
+    client = A.app.test_client()
+    kemarin = (date.today() - timedelta(days=1)).isoformat()
+    sebulan = (date.today() - timedelta(days=31)).isoformat()
+
+    first_ms, day_ms, keyset_ms, export_ms = [], [], [], []
+    exported = 0
+    for _ in range(repeat):
+        response, ms = timed(client.get, '/api/laporan')
+        first_ms.append(ms)
+        _, ms = timed(client.get, f'/api/laporan?tgl_mulai={kemarin}')
+        day_ms.append(ms)
+
+        after = response.get_json()['next']
+        for _ in range(pages):
+            if not after:
+                break
+            response, ms = timed(client.get, '/api/laporan', query_string={'after': after})
+            keyset_ms.append(ms)
+            after = response.get_json()['next']
+
+        t0 = time.perf_counter()
+        response = client.get(f'/api/laporan/export?format=jsonl&tgl_mulai={sebulan}&tgl_selesai={kemarin}')
+        exported = response.get_data().count(b'\n')
+        export_ms.append((time.perf_counter() - t0) * 1000)
+    return [
+        dict(section='laporan', name='laporan_halaman_pertama', size=rows, **summarize(first_ms)),
+        dict(section='laporan', name='laporan_satu_hari', size=rows, **summarize(day_ms)),
+        dict(section='laporan', name='laporan_keyset_berikutnya', size=rows, **summarize(keyset_ms)),
+        dict(section='laporan', name='laporan_export_sebulan', size=rows, rows_exported=exported,
+             **summarize(export_ms)),
+    ]
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(old_path, new_path, threshold=REGRESSION_THRESHOLD):
+    """Bandingkan median dua file hasil; exit 1 jika ada yang lebih lambat dari ``threshold``x."""
+    with open(old_path) as f:
+        lama = {(r['name'], r['size']): r for r in json.load(f)['results']}
+    with open(new_path) as f:
+        baru = json.load(f)['results']
+    regresi = 0
+    print(f"{'benchmark':<30} {'ukuran':>8} {'p50 lama':>10} {'p50 baru':>10} {'rasio':>7}")
+    for r in baru:
+        old = lama.get((r['name'], r['size']))
+        if not old or not old.get('p50_ms') or 'p50_ms' not in r:
+            continue
+        rasio = r['p50_ms'] / old['p50_ms']
+        tanda = ''
+        if rasio > threshold:
+            tanda = '  ⚠️ lebih lambat'
+            regresi += 1
+        print(f"{r['name']:<30} {r['size']:>8} {old['p50_ms']:>10.2f} {r['p50_ms']:>10.2f} {rasio:>6.2f}x{tanda}")
+    return regresi
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--photos', default='wbs_photos')
+    parser.add_argument('--frame-width', type=int, default=640, help="Lebar frame webcam yang disimulasikan")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--laporan-rows', type=int, nargs='+', default=[100000])
+    parser.add_argument('--keyset-pages', type=int, default=20)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--inference', choices=['inline', 'pool'], default='inline',
+                        help="inline = deteksi di thread request (hasil stabil); pool = INFERENCE_POOL app")
+    parser.add_argument('--output', help="Simpan hasil dalam format JSON")
+    parser.add_argument('--compare', nargs=2, metavar=('LAMA', 'BARU'), help="Bandingkan dua file hasil")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare) else 0)
+
+    workdir = tempfile.mkdtemp(prefix='bench_hot_paths_')
+    # Database kosong dulu: load_known_faces saat import app tidak menyentuh MySQL
+    sqlite_db.install(os.path.join(workdir, 'kosong.sqlite'))
+    import app as A
+    A.SNAPSHOT_DIR = os.path.join(workdir, 'snapshot')
+    A.INDEX_PATH = os.path.join(workdir, 'face_index.npz')
+    A.ATTENDANCE_WRITER.spool_path = os.path.join(workdir, 'absensi_pending.jsonl')
+    A.ATTENDANCE_WRITER.summary = False
+    if args.inference == 'inline':
+        A.INFERENCE_POOL = None
+
+    hasil = []
+    try:
+        frames = load_frames(args.photos, args.frame_width)
+        print(f"📷 {len(frames)} frame dari {args.photos}")
+        rows, photo_encodings = bench_pipeline(A, frames, args.repeat)
+        hasil += rows
+        for size in args.sizes:
+            print(f"🧪 Galeri {size} WBS")
+            hasil += bench_gallery(A, workdir, size, photo_encodings, frames, args.repeat, args.queries)
+        for rows_count in args.laporan_rows:
+            print(f"🧪 Laporan {rows_count} baris absensi")
+            hasil += bench_laporan(A, workdir, rows_count, args.keyset_pages, args.repeat)
+    finally:
+        A.ATTENDANCE_WRITER.stop()
+        if A.INFERENCE_POOL is not None:
+            A.INFERENCE_POOL.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'benchmark':<30} {'ukuran':>8} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for r in hasil:
+        if r.get('n'):
+            print(f"{r['name']:<30} {r['size']:>8} {r['n']:>6} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} "
+                  f"{r['p99_ms']:>10.2f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'args': vars(args), 'results': hasil}, f, indent=2)
+        print(f"\n💾 Hasil disimpan ke {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark recall vs latensi index wajah terhadap scan persis.
+
+Contoh:
+    python -m bench.index_recall --sizes 1000 10000 50000 --output hasil_index.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from bench.synthetic import make_gallery, make_queries
+from face_index import build_index
+from gallery import GalleryMatcher
+
+KONFIGURASI = [
+    ('brute', {}),
+    ('ivf', {'nprobe': 4}),
+    ('ivf', {'nprobe': 8}),
+    ('ivf', {'nprobe': 16}),
+    ('rptree', {'n_trees': 4, 'leaf_size': 32}),
+    ('rptree', {'n_trees': 8, 'leaf_size': 32}),
+    ('rptree', {'n_trees': 16, 'leaf_size': 64}),
+]
+
+
+def run(size, n_queries, tolerance):
+    matrix = make_gallery(size)
+    queries, truth = make_queries(matrix, n_queries)
+    ids = list(range(size))
+    names = [f"wbs_{i}" for i in ids]
+
+    exact = GalleryMatcher(matrix, ids, names)
+    expected = []
+    for q in queries:
+        m = exact.match(q, tolerance=tolerance)
+        expected.append(m[0]['index'] if m else -1)
+
+    hasil = []
+    for backend, params in KONFIGURASI:
+        t0 = time.perf_counter()
+        index = build_index(backend, matrix, **params)
+        build_s = time.perf_counter() - t0
+
+        gallery = GalleryMatcher(matrix, ids, names, index=index)
+        latencies = []
+        benar = 0
+        for q, exp in zip(queries, expected):
+            t0 = time.perf_counter()
+            m = gallery.match(q, tolerance=tolerance)
+            latencies.append(time.perf_counter() - t0)
+            benar += (m[0]['index'] if m else -1) == exp
+
+        lat_ms = np.array(latencies) * 1000
+        baris = {
+            'size': size,
+            'backend': backend,
+            'params': params,
+            'build_s': round(build_s, 4),
+            'recall_at_1': round(benar / len(queries), 4),
+            'mean_ms': round(float(lat_ms.mean()), 4),
+            'p95_ms': round(float(np.percentile(lat_ms, 95)), 4),
+        }
+        hasil.append(baris)
+        print(f"N={size:>7} {backend:>6} {str(params):<34} build={baris['build_s']:>8.3f}s "
+              f"recall@1={baris['recall_at_1']:.3f} mean={baris['mean_ms']:.3f}ms p95={baris['p95_ms']:.3f}ms")
+    return hasil
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--output', help="Simpan hasil dalam format JSON")
+    args = parser.parse_args()
+
+    hasil = []
+    for size in args.sizes:
+        hasil.extend(run(size, args.queries, args.tolerance))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(hasil, f, indent=2)
+        print(f"\n💾 Hasil disimpan ke {args.output}")
+
+
+if __name__ == '__main__':
+    main()
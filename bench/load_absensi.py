@@ -0,0 +1,388 @@
+"""Load test /api/absensi: simulasi antrean WBS di kiosk saat kegiatan dimulai.
+
+Frame JPEG (rekaman webcam di ``--frames``, foto ``wbs_photos``, dan/atau
+frame sintetis tanpa wajah) dikirim ke server dengan beberapa tingkat
+konkurensi (closed loop: N kiosk yang langsung scan lagi setelah dibalas)
+atau laju kedatangan (open loop Poisson, ``--rates``). Untuk setiap langkah
+dicatat throughput, latensi p50/p95/p99, error, 503 (antrean inferensi
+penuh), dan langkah pertama yang jenuh.
+
+Server bisa dijalankan sendiri oleh skrip ini (``--serve dev|gunicorn|waitress``)
+dengan database SQLite bench (``--sqlite``) atau MySQL dari db_pool, atau
+diarahkan ke server yang sudah jalan (``--url``).
+
+    python -m bench.load_absensi --serve dev --sqlite --concurrency 1 2 4 8 16
+    python -m bench.load_absensi --serve gunicorn --workers 4 --sqlite --concurrency 1 2 4 8 16 32
+    python -m bench.load_absensi --url http://192.168.1.10:5000 --rates 1 2 5 10 --duration 30
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+import cv2
+import numpy as np
+
+from bench.hot_paths import load_frames, seed_database, summarize
+from bench.synthetic import make_gallery
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Batas jenuh per langkah, lihat find_saturation
+MIN_THROUGHPUT_GAIN = 0.05
+MAX_ERROR_RATE = 0.01
+
+
+# --- FRAME ---
+def synthetic_frames(n, width=640, seed=0):
+    """Frame derau tanpa wajah (jalur 'Tidak ada wajah terdeteksi')."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(n):
+        img = rng.integers(0, 255, size=(width * 3 // 4, width, 3), dtype=np.uint8)
+        img = cv2.GaussianBlur(img, (0, 0), 3)
+        ok, jpg = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        frames.append((f"sintetis_{i}.jpg", jpg.tobytes()))
+    return frames
+
+
+# --- SERVER ---
+def prepare_sqlite(workdir, frames, gallery_size, n_kegiatan):
+    """Database bench: WBS dari frame yang wajahnya terdeteksi + encoding sintetis."""
+    from face_pipeline import detect_and_encode
+
+    encodings = make_gallery(gallery_size, seed=gallery_size)
+    names = [f"WBS Sintetis {i + 1}" for i in range(gallery_size)]
+    i = 0
+    for fn, jpg in frames:
+        rgb = cv2.cvtColor(cv2.imdecode(np.frombuffer(jpg, np.uint8), cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+        _, encs = detect_and_encode(rgb)
+        if encs and i < gallery_size:
+            encodings[i] = encs[0]
+            names[i] = os.path.splitext(fn)[0]
+            i += 1
+    path = os.path.join(workdir, 'bench.sqlite')
+    seed_database(path, encodings, names, n_kegiatan=n_kegiatan)
+    print(f"🗄️ Database SQLite bench: {gallery_size} WBS ({i} dari frame), {n_kegiatan} kegiatan")
+    return path
+
+
+def server_command(kind, port, workers, threads):
+    listen = f"127.0.0.1:{port}"
+    if kind == 'dev':
+        return [sys.executable, '-m', 'bench.serve_app', '--port', str(port)]
+    if kind == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', '-w', str(workers), '--threads', str(threads),
+                '-b', listen, '--timeout', '120', 'bench.serve_app:app']
+    return [sys.executable, '-m', 'waitress', f'--threads={threads}', f'--listen={listen}', 'bench.serve_app:app']
+
+
+def start_server(kind, port, workers, threads, sqlite_path=None, log_path=None, timeout=180):
+    """Jalankan server dan tunggu sampai /metrics menjawab; log server ke ``log_path``."""
+    env = dict(os.environ)
+    if sqlite_path:
+        env['BENCH_SQLITE'] = sqlite_path
+    cmd = server_command(kind, port, workers, threads)
+    print(f"🚀 {' '.join(cmd)}")
+    log = open(log_path or os.devnull, 'w')
+    proc = subprocess.Popen(cmd, cwd=REPO_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server berhenti dengan kode {proc.returncode} (lihat --server-log)")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/metrics')
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            pass
+        time.sleep(0.5)
+    stop_server(proc, kind)
+    raise RuntimeError("Server tidak siap dalam batas waktu")
+
+
+def stop_server(proc, kind):
+    if proc.poll() is None:
+        # Ctrl+C untuk dev/waitress agar pool inferensi ikut ditutup; gunicorn berhenti rapi dengan SIGTERM
+        if os.name != 'nt' and kind != 'gunicorn':
+            proc.send_signal(signal.SIGINT)
+        else:
+            proc.terminate()
+        try:
+            proc.wait(30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+# --- CLIENT ---
+class LoadClient:
+    """Satu koneksi keep-alive per thread; frame dikirim sebagai body ``image/jpeg``."""
+
+    def __init__(self, url, frames, kegiatan_ids, timeout=60):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.frames = frames
+        self.kegiatan_ids = kegiatan_ids
+        self.timeout = timeout
+        self._local = threading.local()
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = self._local.conn = cls(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def next_request(self):
+        with self._lock:
+            i = self._counter
+            self._counter += 1
+        _, jpg = self.frames[i % len(self.frames)]
+        kegiatan = self.kegiatan_ids[(i // len(self.frames)) % len(self.kegiatan_ids)]
+        return jpg, kegiatan
+
+    def send(self):
+        """``(jenis_hasil, status_http)``; jenis_hasil dipakai untuk rekap."""
+        jpg, kegiatan = self.next_request()
+        path = '/api/absensi?' + urlencode({'kegiatan_id': kegiatan, 'pptk_nama': 'Load Test',
+                                            'narasumber_nama': 'Load Test'})
+        try:
+            conn = self._connection()
+            conn.request('POST', path, body=jpg, headers={'Content-Type': 'image/jpeg'})
+            response = conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            self._local.conn = None
+            return 'conn_error', None
+        if response.status == 503:
+            return 'busy', 503
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = {}
+        if response.status >= 500:
+            return 'server_error', response.status
+        if data.get('duplikat'):
+            return 'duplikat', response.status
+        if data.get('status') == 'success':
+            return 'match', response.status
+        if data.get('status') == 'failed':
+            return 'no_face' if 'Tidak ada wajah' in data.get('message', '') else 'unknown', response.status
+        return 'client_error', response.status
+
+
+class StepResult:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.outcomes = Counter()
+        self.skipped = 0
+
+    def record(self, outcome, ms):
+        with self._lock:
+            self.latencies.append(ms)
+            self.outcomes[outcome] += 1
+
+
+def run_closed_loop(client, concurrency, duration, warmup):
+    """``concurrency`` kiosk, masing-masing langsung scan lagi setelah dibalas."""
+    result = StepResult()
+    t_start = time.perf_counter()
+    t_measure, t_end = t_start + warmup, t_start + warmup + duration
+
+    def kiosk():
+        while True:
+            t0 = time.perf_counter()
+            if t0 >= t_end:
+                return
+            outcome, _ = client.send()
+            if t0 >= t_measure:
+                result.record(outcome, (time.perf_counter() - t0) * 1000)
+
+    threads = [threading.Thread(target=kiosk, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return result, duration
+
+
+def run_open_loop(client, rate, duration, warmup, max_in_flight, seed=0):
+    """Kedatangan Poisson ``rate`` request/detik, terlepas dari kecepatan server.
+
+    Latensi dihitung dari jadwal kedatangan (bukan saat request benar-benar
+    dikirim), jadi antrean di sisi klien ikut terhitung. Kedatangan saat
+    ``max_in_flight`` request masih berjalan dicatat sebagai ``skipped``.
+    """
+    result = StepResult()
+    rng = np.random.default_rng(seed)
+    slots = threading.BoundedSemaphore(max_in_flight)
+    t_start = time.perf_counter()
+    t_measure, t_end = t_start + warmup, t_start + warmup + duration
+
+    def one(scheduled):
+        try:
+            outcome, _ = client.send()
+            if scheduled >= t_measure:
+                result.record(outcome, (time.perf_counter() - scheduled) * 1000)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        scheduled = t_start
+        while True:
+            scheduled += rng.exponential(1.0 / rate)
+            if scheduled >= t_end:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if not slots.acquire(blocking=False):
+                if scheduled >= t_measure:
+                    result.skipped += 1
+                continue
+            executor.submit(one, scheduled)
+    return result, duration
+
+
+def step_report(label, value, result, duration):
+    total = sum(result.outcomes.values())
+    errors = result.outcomes['conn_error'] + result.outcomes['server_error'] + result.outcomes['client_error']
+    row = {
+        label: value,
+        'requests': total,
+        'throughput_rps': round(total / duration, 2),
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'busy_rate': round(result.outcomes['busy'] / total, 4) if total else 0.0,
+        'skipped': result.skipped,
+        'outcomes': dict(result.outcomes),
+    }
+    row.update(summarize(result.latencies))
+    return row
+
+
+def find_saturation(rows, slo_ms, label):
+    """Indeks langkah pertama yang jenuh (atau None).
+
+    Closed loop: throughput tidak lagi naik minimal MIN_THROUGHPUT_GAIN.
+    Open loop: throughput tertinggal lebih dari MIN_THROUGHPUT_GAIN*2 dari laju
+    kedatangan. Keduanya: p95 di atas ``slo_ms``, error/503 di atas
+    MAX_ERROR_RATE, atau ada kedatangan yang dilewati.
+    """
+    for i, row in enumerate(rows):
+        if row['error_rate'] > MAX_ERROR_RATE or row['busy_rate'] > MAX_ERROR_RATE or row.get('skipped'):
+            return i
+        if row.get('p95_ms', 0) > slo_ms:
+            return i
+        if label == 'rate':
+            if row['throughput_rps'] < row['rate'] * (1 - 2 * MIN_THROUGHPUT_GAIN):
+                return i
+        elif i and row['throughput_rps'] < rows[i - 1]['throughput_rps'] * (1 + MIN_THROUGHPUT_GAIN):
+            return i
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help="Server yang sudah jalan (tanpa --serve)")
+    parser.add_argument('--serve', choices=['dev', 'gunicorn', 'waitress'],
+                        help="Jalankan server sendiri untuk load test ini")
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--workers', type=int, default=4, help="Proses gunicorn")
+    parser.add_argument('--threads', type=int, default=8, help="Thread per proses gunicorn/waitress")
+    parser.add_argument('--sqlite', action='store_true', help="Pakai database SQLite bench, bukan MySQL")
+    parser.add_argument('--server-log', help="Simpan output server (--serve) ke file ini")
+    parser.add_argument('--gallery-size', type=int, default=1000)
+    parser.add_argument('--frames', default='wbs_photos', help="Folder JPEG rekaman webcam / foto WBS")
+    parser.add_argument('--frame-width', type=int, default=640)
+    parser.add_argument('--synthetic', type=int, default=0, help="Tambah N frame sintetis tanpa wajah")
+    parser.add_argument('--kegiatan', type=int, default=1,
+                        help="Putar id_kegiatan 1..N agar scan ulang tidak semuanya duplikat")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--rates', type=float, nargs='+', help="Open loop: request/detik per langkah")
+    parser.add_argument('--max-in-flight', type=int, default=64, help="Batas request berjalan (open loop)")
+    parser.add_argument('--duration', type=float, default=20.0, help="Detik pengukuran per langkah")
+    parser.add_argument('--warmup', type=float, default=3.0)
+    parser.add_argument('--slo-ms', type=float, default=2000.0, help="Batas p95 yang masih diterima")
+    parser.add_argument('--output', help="Simpan hasil dalam format JSON")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.frame_width) if args.frames else []
+    frames += synthetic_frames(args.synthetic, args.frame_width)
+    if not frames:
+        parser.error("Tidak ada frame untuk dikirim")
+    print(f"📷 {len(frames)} frame")
+
+    workdir = proc = None
+    url = args.url
+    try:
+        if args.serve:
+            sqlite_path = None
+            if args.sqlite:
+                workdir = tempfile.mkdtemp(prefix='bench_load_')
+                sqlite_path = prepare_sqlite(workdir, frames, args.gallery_size, args.kegiatan)
+            proc = start_server(args.serve, args.port, args.workers, args.threads, sqlite_path, args.server_log)
+            url = f"http://127.0.0.1:{args.port}"
+
+        client = LoadClient(url, frames, list(range(1, args.kegiatan + 1)))
+        label, steps = ('rate', args.rates) if args.rates else ('concurrency', args.concurrency)
+        rows = []
+        print(f"\n{label:>11} {'req':>6} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+              f"{'error':>6} {'503':>6} {'skip':>5}")
+        for value in steps:
+            if args.rates:
+                result, duration = run_open_loop(client, value, args.duration, args.warmup, args.max_in_flight)
+            else:
+                result, duration = run_closed_loop(client, value, args.duration, args.warmup)
+            row = step_report(label, value, result, duration)
+            rows.append(row)
+            print(f"{value:>11} {row['requests']:>6} {row['throughput_rps']:>7.2f} {row.get('p50_ms', 0):>9.1f} "
+                  f"{row.get('p95_ms', 0):>9.1f} {row.get('p99_ms', 0):>9.1f} {row['error_rate']:>6.1%} "
+                  f"{row['busy_rate']:>6.1%} {row['skipped']:>5}")
+    finally:
+        if proc is not None:
+            stop_server(proc, args.serve)
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    jenuh = find_saturation(rows, args.slo_ms, label)
+    if jenuh is None:
+        print(f"\n✅ Belum jenuh sampai {label} {steps[-1]} (p95 <= {args.slo_ms:.0f} ms).")
+    else:
+        kapasitas = rows[jenuh - 1] if jenuh else None
+        print(f"\n⚠️ Jenuh di {label} {steps[jenuh]}"
+              + (f"; kapasitas aman ~{kapasitas['throughput_rps']} req/detik di {label} {steps[jenuh - 1]}."
+                 if kapasitas else "."))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'server': args.serve or url,
+                'workers': args.workers if args.serve == 'gunicorn' else 1,
+                'threads': args.threads,
+                'args': vars(args),
+                'saturation_index': jenuh,
+                'steps': rows,
+            }, f, indent=2)
+        print(f"💾 Hasil disimpan ke {args.output}")
+
+
+if __name__ == '__main__':
+    main()
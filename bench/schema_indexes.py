@@ -0,0 +1,220 @@
+"""Benchmark index skema: isi database terpisah dengan N baris absensi, lalu ukur
+query laporan dan check-in sebelum dan sesudah ``migrations.py``.
+
+Database bench dibuat sendiri (default ``psbr_bench``), tidak menyentuh
+database aplikasi. Setiap query dicatat waktunya (median) dan index yang
+dipilih MySQL (EXPLAIN).
+
+    python -m bench.schema_indexes --rows 1000000
+    python -m bench.schema_indexes --skip-seed --output schema.json
+"""
+import argparse
+import json
+import time
+from datetime import date, timedelta
+
+import mysql.connector
+import numpy as np
+
+from db_pool import DB_CONFIG
+from face_codec import encode_encoding
+from migrations import current_version, explain_check, migrate
+
+# Skema dasar minimal (kolom yang dipakai aplikasi), tanpa index tambahan
+BASE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS wbs (
+        id_wbs INT AUTO_INCREMENT PRIMARY KEY,
+        nama VARCHAR(100) NOT NULL,
+        face_encoding BLOB NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS kegiatan (
+        id_kegiatan INT AUTO_INCREMENT PRIMARY KEY,
+        nama_kegiatan VARCHAR(200) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS absensi (
+        id_absensi INT AUTO_INCREMENT PRIMARY KEY,
+        id_wbs INT NOT NULL,
+        id_kegiatan INT NOT NULL,
+        tanggal DATE NOT NULL,
+        waktu_absensi TIME NOT NULL,
+        narasumber VARCHAR(255) NULL
+    )
+    """,
+]
+
+LAPORAN = """
+    SELECT a.tanggal, a.waktu_absensi, w.nama AS nama_wbs, k.nama_kegiatan, a.narasumber, a.id_wbs, a.id_kegiatan
+    FROM absensi a JOIN wbs w ON a.id_wbs = w.id_wbs JOIN kegiatan k ON a.id_kegiatan = k.id_kegiatan
+"""
+ORDER = " ORDER BY a.tanggal DESC, a.waktu_absensi DESC, a.id_wbs DESC, a.id_kegiatan DESC LIMIT 500"
+
+
+def queries(akhir, deep_cursor):
+    """(nama, query sebelum migrasi, query sesudah migrasi, params, alias tabel utama)."""
+    laporan_hari = LAPORAN + " WHERE a.tanggal >= %s AND a.tanggal <= %s" + ORDER
+    keyset = (LAPORAN + " WHERE a.tanggal <= %s AND (a.tanggal, a.waktu_absensi, a.id_wbs, a.id_kegiatan)"
+              " < (%s, %s, %s, %s)" + ORDER)
+    kegiatan_bulan = LAPORAN + " WHERE a.id_kegiatan = %s AND a.tanggal >= %s AND a.tanggal <= %s" + ORDER
+    dedupe = "SELECT 1 FROM absensi WHERE id_wbs = %s AND id_kegiatan = %s AND tanggal = %s"
+    preload = "SELECT id_wbs, id_kegiatan FROM absensi WHERE tanggal = %s"
+    tanpa_filter = LAPORAN + ORDER
+    return [
+        ('laporan_hari_ini', laporan_hari, laporan_hari, (akhir, akhir), 'a'),
+        ('laporan_tanpa_filter', tanpa_filter, tanpa_filter, (), 'a'),
+        ('laporan_keyset_jauh', keyset, keyset, (deep_cursor[0],) + deep_cursor, 'a'),
+        ('laporan_kegiatan_sebulan', kegiatan_bulan, kegiatan_bulan, (1, akhir - timedelta(days=30), akhir), 'a'),
+        ('checkin_dedupe', dedupe, dedupe, (1, 1, akhir), 'absensi'),
+        ('preload_absensi_hari_ini', preload, preload, (akhir,), 'absensi'),
+        ('versi_galeri',
+         "SELECT MAX(updated_at), COUNT(face_encoding) FROM wbs",
+         "SELECT MAX(updated_at), COALESCE(SUM(is_registered), 0) FROM wbs", (), 'wbs'),
+        ('daftar_wbs',
+         "SELECT id_wbs, nama, CASE WHEN face_encoding IS NOT NULL THEN 1 ELSE 0 END FROM wbs ORDER BY nama",
+         "SELECT id_wbs, nama, is_registered FROM wbs ORDER BY nama", (), 'wbs'),
+    ]
+
+
+def connect(database):
+    config = dict(DB_CONFIG)
+    config.pop('database', None)
+    db = mysql.connector.connect(**config)
+    cursor = db.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database}`")
+    cursor.execute(f"USE `{database}`")
+    cursor.close()
+    return db
+
+
+def seed(db, rows, n_wbs, n_kegiatan, days, seed_value=0, batch=10000):
+    rng = np.random.default_rng(seed_value)
+    cursor = db.cursor()
+    for ddl in BASE_SCHEMA:
+        cursor.execute(ddl)
+    cursor.execute("SELECT COUNT(*) FROM absensi")
+    if cursor.fetchone()[0]:
+        print("ℹ️ Database bench sudah berisi data, seed dilewati.")
+        cursor.close()
+        return
+
+    print(f"🌱 Seed {n_wbs} WBS, {n_kegiatan} kegiatan, {rows} absensi dalam {days} hari...")
+    wbs_rows = []
+    for i in range(n_wbs):
+        enc = encode_encoding(rng.normal(0, 0.065, 128)) if rng.random() < 0.9 else None
+        wbs_rows.append((f"WBS {i + 1:06d}", enc))
+    cursor.executemany("INSERT INTO wbs (nama, face_encoding) VALUES (%s, %s)", wbs_rows)
+    cursor.executemany("INSERT INTO kegiatan (nama_kegiatan) VALUES (%s)",
+                       [(f"Kegiatan {i + 1}",) for i in range(n_kegiatan)])
+    db.commit()
+
+    # Satu baris per (id_wbs, id_kegiatan, tanggal), tersebar rata per hari
+    per_hari = min(rows // days + 1, n_wbs * n_kegiatan)
+    mulai = date.today() - timedelta(days=days)
+    buffer, total, t0 = [], 0, time.perf_counter()
+    for d in range(days):
+        if total >= rows:
+            break
+        tanggal = mulai + timedelta(days=d + 1)
+        n = min(per_hari, rows - total)
+        pasangan = rng.choice(n_wbs * n_kegiatan, size=n, replace=False)
+        detik = np.sort(rng.integers(7 * 3600, 17 * 3600, size=n))
+        for p, s in zip(pasangan, detik):
+            buffer.append((int(p // n_kegiatan) + 1, int(p % n_kegiatan) + 1, tanggal,
+                           f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}", "PPTK: Bench | Narasumber: Bench"))
+        total += n
+        if len(buffer) >= batch:
+            cursor.executemany("INSERT INTO absensi (id_wbs, id_kegiatan, tanggal, waktu_absensi, narasumber) "
+                               "VALUES (%s, %s, %s, %s, %s)", buffer)
+            db.commit()
+            buffer = []
+            print(f"   … {total} baris ({total / (time.perf_counter() - t0):.0f} baris/detik)")
+    if buffer:
+        cursor.executemany("INSERT INTO absensi (id_wbs, id_kegiatan, tanggal, waktu_absensi, narasumber) "
+                           "VALUES (%s, %s, %s, %s, %s)", buffer)
+        db.commit()
+    cursor.execute("ANALYZE TABLE absensi, wbs")
+    cursor.fetchall()
+    cursor.close()
+
+
+def measure(db, daftar, fase, repeat):
+    cursor = db.cursor(dictionary=True)
+    hasil = []
+    for nama, sebelum, sesudah, params, alias in daftar:
+        query = sebelum if fase == 'sebelum' else sesudah
+        cursor.execute("EXPLAIN " + query, params)
+        plan = cursor.fetchall()
+        row = next((r for r in plan if r['table'] == alias), plan[0])
+        waktu = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            cursor.execute(query, params)
+            cursor.fetchall()
+            waktu.append((time.perf_counter() - t0) * 1000)
+        baris = {
+            'fase': fase,
+            'query': nama,
+            'median_ms': round(float(np.median(waktu)), 2),
+            'type': row.get('type'),
+            'key': row.get('key'),
+            'rows_examined_est': row.get('rows'),
+        }
+        hasil.append(baris)
+        print(f"{fase:<8} {nama:<26} {baris['median_ms']:>9.2f} ms  type={str(baris['type']):<6} "
+              f"key={baris['key']}  rows≈{baris['rows_examined_est']}")
+    cursor.close()
+    return hasil
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default='psbr_bench')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--wbs', type=int, default=2000)
+    parser.add_argument('--kegiatan', type=int, default=20)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skip-seed', action='store_true')
+    parser.add_argument('--output', help="Simpan hasil dalam format JSON")
+    args = parser.parse_args()
+
+    db = connect(args.database)
+    if not args.skip_seed:
+        seed(db, args.rows, args.wbs, args.kegiatan, args.days)
+
+    cursor = db.cursor()
+    cursor.execute("SELECT MAX(tanggal) FROM absensi")
+    akhir = cursor.fetchone()[0]
+    # Cursor keyset kira-kira di tengah data: halaman "jauh" yang lambat dengan OFFSET
+    cursor.execute("SELECT tanggal, waktu_absensi, id_wbs, id_kegiatan FROM absensi "
+                   "WHERE tanggal = %s LIMIT 1", (akhir - timedelta(days=args.days // 2),))
+    row = cursor.fetchone() or (akhir, '12:00:00', 1, 1)
+    deep_cursor = (row[0], str(row[1]), row[2], row[3])
+    versi = current_version(cursor)
+    cursor.close()
+
+    daftar = queries(akhir, deep_cursor)
+    hasil = []
+    if versi == 0:
+        hasil += measure(db, daftar, 'sebelum', args.repeat)
+        print()
+        migrate(db)
+        print()
+    hasil += measure(db, daftar, 'sesudah', args.repeat)
+    print()
+    explain_check(db)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'rows': args.rows, 'database': args.database, 'results': hasil}, f, indent=2, default=str)
+        print(f"\n💾 Hasil disimpan ke {args.output}")
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Entry point server untuk load test (bench/load_absensi.py).
+
+Tanpa ``BENCH_SQLITE`` sama seperti ``app:app`` (MySQL dari db_pool). Dengan
+``BENCH_SQLITE=<file>``, database diganti SQLite bench dan snapshot/spool
+ditulis di folder file tersebut, bukan di ``data/`` aplikasi.
+
+    BENCH_SQLITE=/tmp/load/bench.sqlite python -m bench.serve_app --port 5001
+    BENCH_SQLITE=/tmp/load/bench.sqlite gunicorn -w 4 -b 127.0.0.1:5001 bench.serve_app:app
+    waitress-serve --threads 16 --listen 127.0.0.1:5001 bench.serve_app:app
+"""
+import argparse
+import os
+
+# Proses worker inferensi (spawn) menjalankan ulang modul utama sebagai
+# __mp_main__; di sana app tidak perlu dimuat.
+if __name__ != '__mp_main__':
+    from bench import sqlite_db
+
+    SQLITE_PATH = os.environ.get('BENCH_SQLITE')
+    if SQLITE_PATH:
+        workdir = os.path.dirname(os.path.abspath(SQLITE_PATH))
+        # Import app memuat galeri; arahkan dulu ke database kosong supaya
+        # snapshot tidak ditulis ke data/ aplikasi, lalu muat ulang dari bench.
+        sqlite_db.install(os.path.join(workdir, f"kosong_{os.getpid()}.sqlite"))
+        import app as A
+        A.SNAPSHOT_DIR = os.path.join(workdir, 'snapshot')
+        A.INDEX_PATH = os.path.join(workdir, 'face_index.npz')
+        A.ATTENDANCE_WRITER.spool_path = os.path.join(workdir, f"absensi_pending_{os.getpid()}.jsonl")
+        A.ATTENDANCE_WRITER.summary = False
+        sqlite_db.install(SQLITE_PATH)
+        A.load_known_faces()
+    else:
+        import app as A
+    app = A.app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Flask dev server untuk load test.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    args = parser.parse_args()
+    app.run(host=args.host, port=args.port, threaded=True, debug=False)
@@ -0,0 +1,183 @@
+"""Pengganti MySQL berbasis SQLite untuk benchmark (tanpa server database).
+
+``install(path)`` mengganti ``db_pool.db_connection`` sehingga modul yang
+meng-import-nya sesudahnya (app, attendance_writer) memakai file SQLite ini.
+Panggil sebelum ``import app``. Hanya subset API mysql-connector yang dipakai
+aplikasi yang didukung: ``cursor(dictionary=...)``, placeholder ``%s``,
+``fetchone/fetchall/fetchmany``, ``commit/rollback``. Error SQLite diubah
+menjadi error mysql.connector yang setara, jadi jalur "tabel/kolom belum ada"
+di aplikasi tetap berjalan.
+"""
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+
+import mysql.connector
+from mysql.connector import errorcode
+
+import db_pool
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS wbs (
+        id_wbs INTEGER PRIMARY KEY AUTOINCREMENT,
+        nama TEXT NOT NULL,
+        face_encoding BLOB NULL,
+        updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS kegiatan (
+        id_kegiatan INTEGER PRIMARY KEY AUTOINCREMENT,
+        nama_kegiatan TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS absensi (
+        id_absensi INTEGER PRIMARY KEY AUTOINCREMENT,
+        id_wbs INTEGER NOT NULL,
+        id_kegiatan INTEGER NOT NULL,
+        tanggal TEXT NOT NULL,
+        waktu_absensi TEXT NOT NULL,
+        narasumber TEXT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_absensi_tanggal_waktu ON absensi (tanggal, waktu_absensi, id_wbs, id_kegiatan)",
+    "CREATE INDEX IF NOT EXISTS idx_absensi_kegiatan_tanggal ON absensi (id_kegiatan, tanggal)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_absensi_wbs_kegiatan_tanggal ON absensi (id_wbs, id_kegiatan, tanggal)",
+    """
+    CREATE TABLE IF NOT EXISTS wbs_face_sample (
+        id_sample INTEGER PRIMARY KEY AUTOINCREMENT,
+        id_wbs INTEGER NOT NULL,
+        encoding BLOB NOT NULL,
+        created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(sep=' '))
+sqlite3.register_adapter(time, time.isoformat)
+sqlite3.register_adapter(timedelta, lambda d: str(d).zfill(8))
+
+
+def _translate(err):
+    if isinstance(err, sqlite3.IntegrityError):
+        return mysql.connector.errors.IntegrityError(msg=str(err), errno=errorcode.ER_DUP_ENTRY)
+    if isinstance(err, (sqlite3.OperationalError, sqlite3.ProgrammingError)):
+        return mysql.connector.errors.ProgrammingError(msg=str(err), errno=errorcode.ER_NO_SUCH_TABLE)
+    return mysql.connector.errors.DatabaseError(msg=str(err))
+
+
+def _sql(query):
+    # Sama dengan mysql-connector: hanya '%s' yang diganti, '%%' tidak diubah
+    return query.replace('%s', '?')
+
+
+class Cursor:
+    def __init__(self, conn, dictionary=False):
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip((d[0] for d in self._cursor.description), row))
+
+    def execute(self, query, params=()):
+        try:
+            self._cursor.execute(_sql(query), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise _translate(e) from e
+
+    def executemany(self, query, seq_params):
+        try:
+            self._cursor.executemany(_sql(query), [tuple(p) for p in seq_params])
+        except sqlite3.Error as e:
+            raise _translate(e) from e
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cursor.fetchall()]
+
+    def fetchmany(self, size=1):
+        return [self._row(r) for r in self._cursor.fetchmany(size)]
+
+    @property
+    def column_names(self):
+        return tuple(d[0] for d in self._cursor.description or ())
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    unread_result = False
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+
+    def cursor(self, dictionary=False, **kwargs):
+        return Cursor(self._conn, dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self._conn.close()
+
+
+_local = threading.local()
+_path = None
+
+
+@contextmanager
+def db_connection():
+    """Satu koneksi SQLite per thread, seperti koneksi pool yang dipinjam."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != _path:
+        if conn is not None:
+            conn.close()
+        conn = _local.conn = Connection(_path)
+        _local.path = _path
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+
+
+def install(path):
+    """Arahkan ``db_pool.db_connection`` (dan modul yang sudah meng-import-nya) ke ``path``."""
+    global _path
+    _path = str(path)
+    db_pool.db_connection = db_connection
+    for name in ('app', 'attendance_writer', 'migrations', 'attendance_summary'):
+        module = sys.modules.get(name)
+        if module is not None and hasattr(module, 'db_connection'):
+            module.db_connection = db_connection
+
+
+def create_schema(path):
+    conn = sqlite3.connect(path)
+    for ddl in SCHEMA:
+        conn.execute(ddl)
+    conn.commit()
+    conn.close()
@@ -0,0 +1,22 @@
+import numpy as np
+
+from gallery import ENCODING_DIM
+
+
+def make_gallery(n, seed=0):
+    """Encoding sintetis mirip keluaran face_recognition.
+
+    Tiap orang punya pusat acak (jarak antar-orang ~0.8-1.0); nilainya kecil
+    seperti encoding dlib asli.
+    """
+    rng = np.random.default_rng(seed)
+    return rng.normal(scale=0.065, size=(n, ENCODING_DIM))
+
+
+def make_queries(gallery, n_queries, noise=0.3, seed=1):
+    """Scan 'webcam' sintetis: encoding orang terdaftar ditambah derau sejauh ``noise``."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(gallery.shape[0], n_queries, replace=gallery.shape[0] < n_queries)
+    derau = rng.normal(size=(n_queries, ENCODING_DIM))
+    derau *= noise / np.linalg.norm(derau, axis=1, keepdims=True)
+    return gallery[rows] + derau, rows
@@ -0,0 +1,233 @@
+import queue
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+import mysql.connector
+
+# --- KONFIGURASI DATABASE ---
+DB_CONFIG = {
+    'user': 'root',
+    'password': '',  # sesuaikan jika kamu pakai password MySQL
+    'host': 'localhost',
+    'database': 'psbr_tarunajaya2'
+}
+
+# --- KONFIGURASI POOL ---
+POOL_SIZE = 5            # koneksi yang dijaga tetap terbuka
+POOL_MAX_OVERFLOW = 5    # koneksi tambahan saat lonjakan, ditutup lagi setelah dipakai
+POOL_TIMEOUT = 5.0       # detik menunggu koneksi bebas sebelum menyerah
+POOL_PING_AFTER = 30.0   # koneksi yang menganggur lebih lama dari ini dicek dulu
+
+
+class PoolTimeout(Exception):
+    """Semua koneksi sedang dipakai dan tidak ada yang kembali dalam batas waktu."""
+
+
+class ConnectionPool:
+    """Pool koneksi MySQL terbatas dengan health check dan metrik sederhana.
+
+    Pakai lewat ``with pool.connection() as db:``; koneksi selalu kembali ke
+    pool (transaksi yang belum di-commit di-rollback), termasuk saat error.
+    """
+
+    def __init__(self, config, size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW,
+                 timeout=POOL_TIMEOUT, ping_after=POOL_PING_AFTER):
+        self.config = config
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._idle = queue.LifoQueue()
+        self._lock = Lock()
+        self._open = 0
+        self._waiting = 0
+        self._tokens = 0   # tanda "slot kosong" di _idle (bukan koneksi)
+        self.stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'timeouts': 0,
+            'overflow': 0,
+            'created': 0,
+            'discarded': 0,
+        }
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    def _reserve(self):
+        """Ambil satu slot koneksi baru; False jika pool sudah penuh."""
+        with self._lock:
+            if self._open >= self.size + self.max_overflow:
+                return False
+            if self._open >= self.size:
+                self.stats['overflow'] += 1
+            self._open += 1
+            return True
+
+    def _release_slot(self, rusak=False):
+        with self._lock:
+            self._open -= 1
+            if rusak:
+                self.stats['discarded'] += 1
+            menunggu = self._waiting > 0
+            if menunggu:
+                self._tokens += 1
+        if menunggu:
+            # Bangunkan satu request yang menunggu: slot kosong, dia boleh membuka koneksi baru
+            self._idle.put((None, 0.0))
+
+    def _get_idle(self, timeout=None):
+        """Ambil isi _idle: ``(conn, idle_since)`` atau tanda slot kosong ``(None, 0.0)``."""
+        if timeout is None:
+            item = self._idle.get_nowait()
+        else:
+            item = self._idle.get(timeout=timeout)
+        if item[0] is None:
+            with self._lock:
+                self._tokens -= 1
+        return item
+
+    def _create(self):
+        try:
+            conn = mysql.connector.connect(**self.config)
+        except Exception:
+            self._release_slot()
+            raise
+        self._count('created')
+        return conn
+
+    def _discard(self, conn, rusak=True):
+        self._release_slot(rusak)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn, idle_since):
+        if time.monotonic() - idle_since < self.ping_after:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, idle_since = self._get_idle()
+            except queue.Empty:
+                break
+            if conn is None:
+                continue  # tanda slot kosong; dipakai lewat _reserve di bawah
+            if self._healthy(conn, idle_since):
+                self._count('checkouts')
+                return conn
+            self._discard(conn)
+
+        if self._reserve():
+            conn = self._create()
+            self._count('checkouts')
+            return conn
+
+        # Pool penuh: tunggu koneksi yang dikembalikan, atau slot yang dibebaskan
+        # karena koneksi rusak dibuang
+        t0 = time.monotonic()
+        deadline = t0 + self.timeout
+        with self._lock:
+            self.stats['waits'] += 1
+            self._waiting += 1
+        try:
+            while True:
+                conn, idle_since = self._get_idle(timeout=max(0.0, deadline - time.monotonic()))
+                if conn is None:
+                    if self._reserve():
+                        break
+                    continue
+                if self._healthy(conn, idle_since):
+                    break
+                # Koneksi rusak: buang, lalu ikut berebut slot yang dibebaskan
+                # lewat tanda slot kosong seperti request lain yang menunggu
+                self._discard(conn)
+        except queue.Empty:
+            self._count('timeouts')
+            raise PoolTimeout(f"Tidak ada koneksi database bebas dalam {self.timeout} detik")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                self.stats['wait_seconds'] += time.monotonic() - t0
+        if conn is None:
+            conn = self._create()
+        self._count('checkouts')
+        return conn
+
+    def _checkin(self, conn):
+        try:
+            if not conn.is_connected() or conn.unread_result:
+                # Hasil query yang tidak habis dibaca (mis. export dihentikan di tengah)
+                # membuat koneksi tidak bisa dipakai lagi; tutup saja
+                self._discard(conn)
+                return
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        with self._lock:
+            # Koneksi overflow ditutup, kecuali ada request yang sedang menunggu
+            kelebihan = self._open > self.size and self._waiting == 0
+        if kelebihan:
+            self._discard(conn, rusak=False)
+        else:
+            self._idle.put((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self.stats)
+            data['open'] = self._open
+            data['waiting'] = self._waiting
+            tokens = self._tokens
+        data['idle'] = max(0, self._idle.qsize() - tokens)
+        data['in_use'] = data['open'] - data['idle']
+        data['size'] = self.size
+        data['max_overflow'] = self.max_overflow
+        return data
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._get_idle()
+            except queue.Empty:
+                return
+            if conn is not None:
+                self._discard(conn)
+
+
+_pool = None
+_pool_lock = Lock()
+
+
+def get_pool():
+    """Pool bersama untuk seluruh proses (dibuat saat pertama kali dipakai)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_CONFIG)
+    return _pool
+
+
+def db_connection():
+    """Shortcut: ``with db_connection() as db:``"""
+    return get_pool().connection()
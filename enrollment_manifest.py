@@ -0,0 +1,66 @@
+import base64
+import hashlib
+import json
+import os
+
+# Manifest enrollment: satu entri per file foto berisi hash isi, (id_wbs, nama)
+# dari nama file, status terakhir, dan encoding yang disimpan ke database.
+# Foto yang hash-nya sama dengan run sebelumnya tidak di-encode ulang.
+MANIFEST_FORMAT = 1
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 isi file (hex)."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(path, model_version):
+    """Entri manifest ``{nama_file: entri}``; kosong jika belum ada atau versi model berbeda."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get('format') != MANIFEST_FORMAT or data.get('model_version') != model_version:
+        print(f"ℹ️ Manifest dibuat dengan model '{data.get('model_version')}', semua foto di-encode ulang.")
+        return {}
+    return data.get('photos', {})
+
+
+def save_manifest(path, entries, model_version):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    data = {'format': MANIFEST_FORMAT, 'model_version': model_version, 'photos': entries}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def make_entry(stat, digest, id_wbs, nama, status, encoding=None, message=''):
+    return {
+        'sha256': digest,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'id_wbs': id_wbs,
+        'nama': nama,
+        'status': status,
+        'encoding': base64.b64encode(encoding).decode('ascii') if encoding else None,
+        'message': message,
+    }
+
+
+def entry_encoding(entry):
+    """Encoding biner yang tersimpan di entri, atau None."""
+    return base64.b64decode(entry['encoding']) if entry.get('encoding') else None
+
+
+def is_unchanged(entry, path, stat):
+    """``(sama, digest)``: hash hanya dihitung jika ukuran/mtime berubah."""
+    if entry and entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+        return True, entry['sha256']
+    digest = file_digest(path)
+    return bool(entry) and entry.get('sha256') == digest, digest
@@ -1,112 +1,356 @@
-import face_recognition
-import numpy as np
+import argparse
+import json
+import multiprocessing
 import os
-import pickle
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
 import mysql.connector
-import cv2
-
-# --- KONFIGURASI DATABASE ---
-DB_CONFIG = {
-    'user': 'root',
-    'password': '',
-    'host': 'localhost',
-    'database': 'psbr_tarunajaya2'
+
+from face_codec import VERSION as CODEC_VERSION, encode_encoding
+from face_pipeline import DETECTION_MODEL, PHOTO_EXTENSIONS, detect_and_encode, load_photo_rgb
+from face_quality import LowQualityFace, thresholds_version
+from db_pool import PoolTimeout, db_connection
+from migrations import current_version
+from enrollment_manifest import entry_encoding, is_unchanged, load_manifest, make_entry, save_manifest
+
+# Konfigurasi database ada di db_pool.py; semua foto memakai pool koneksi yang sama
+
+# Foto enrollment bisa sangat besar (mis. 3072x4096); deteksi cukup di lebar ini,
+# encoding tetap dari foto asli
+DETECT_WIDTH = 640
+
+# Gerbang kualitas (face_quality.py) untuk foto template: lebih ketat dari kiosk
+# karena satu template buruk menurunkan akurasi setiap absensi orang itu.
+# None = matikan.
+ENROLL_QUALITY = {
+    'min_face': 120,
+    'min_sharpness': 40.0,
+    'max_yaw': 0.25,
+    'max_roll': 15.0,
 }
 
-# --- FUNGSI KONEKSI DATABASE ---
-def connect_db():
-    try:
-        return mysql.connector.connect(**DB_CONFIG)
-    except mysql.connector.Error as err:
-        print(f"❌ Gagal konek ke database: {err}")
-        return None
+# Foto asli langsung dinormalisasi di memori; convert_photos.py / fix_photos_*.py /
+# reconvert_rgb.py tidak perlu dijalankan lagi
+PHOTO_DIR = "wbs_photos"
+BATCH_SIZE = 200  # baris per executemany
 
-# --- FUNGSI ENROLL ---
-def enroll_wbs_face(photo_path):
+# Manifest hash foto -> encoding; hanya foto baru/berubah yang di-encode ulang.
+# MODEL_VERSION berubah => manifest lama diabaikan (semua foto di-encode ulang),
+# termasuk jika ambang ENROLL_QUALITY diubah.
+MANIFEST_PATH = os.path.join("data", "enrollment_manifest.json")
+MODEL_VERSION = f"dlib-{DETECTION_MODEL}-w{DETECT_WIDTH}-fe{CODEC_VERSION}" + (
+    f"-{thresholds_version(ENROLL_QUALITY)}" if ENROLL_QUALITY else "")
+
+UPDATE_QUERY = "UPDATE wbs SET face_encoding = %s WHERE id_wbs = %s AND nama = %s"
+# Hapus encoding foto yang sudah dihapus, kecuali sudah diganti lewat /api/daftar_wajah
+CLEAR_QUERY = "UPDATE wbs SET face_encoding = NULL WHERE id_wbs = %s AND face_encoding = %s"
+
+# Sampel wajah (face_samples.py, migrasi 4) ikut diperbarui dalam transaksi yang
+# sama: foto dari script menggantikan semua sampel WBS itu (seperti replace=1 di
+# /api/daftar_wajah), dan encoding yang dikosongkan ikut menghapus sampelnya.
+# Hanya WBS yang benar-benar ter-update (nama cocok / encoding sama) yang disentuh.
+RESEED_SAMPLE_QUERIES = (
+    "DELETE FROM wbs_face_sample WHERE id_wbs IN (SELECT id_wbs FROM wbs WHERE id_wbs = %s AND face_encoding = %s)",
+    "INSERT INTO wbs_face_sample (id_wbs, encoding) SELECT id_wbs, face_encoding FROM wbs "
+    "WHERE id_wbs = %s AND face_encoding = %s",
+)
+CLEAR_SAMPLE_QUERY = ("DELETE FROM wbs_face_sample WHERE id_wbs IN "
+                      "(SELECT id_wbs FROM wbs WHERE id_wbs = %s AND face_encoding IS NULL)")
+
+
+def parse_filename(filename):
+    """'nama-lengkap_012.jpg' -> (12, 'nama lengkap')."""
+    name_part, id_part = os.path.splitext(filename)[0].split('_')
+    return int(id_part), name_part.replace('-', ' ')
+
+
+def encode_photo(photo_path):
+    """Baca, normalisasi, deteksi, dan encode satu foto (dijalankan di worker).
+
+    Mengembalikan dict ``{file, id_wbs, nama, status, encoding, message}``;
+    ``encoding`` sudah dalam format biner ``face_codec`` jika status ``ok``.
+    """
     filename = os.path.basename(photo_path)
+    hasil = {'file': filename, 'id_wbs': None, 'nama': None, 'status': 'ok', 'encoding': None, 'message': ''}
     try:
-        name_part, id_part = filename.split('_')
-        wbs_id = int(id_part.split('.')[0])
-        wbs_name = name_part.replace('-', ' ')
+        hasil['id_wbs'], hasil['nama'] = parse_filename(filename)
     except Exception as e:
-        print(f"⚠️ Format salah pada {filename}: {e}")
-        return
-
-    print(f"Memproses WBS ID: {wbs_id} ({wbs_name})...")
+        hasil.update(status='bad_name', message=f"Format nama file salah: {e}")
+        return hasil
 
     try:
-        img = cv2.imread(photo_path, cv2.IMREAD_UNCHANGED)
+        img_rgb = load_photo_rgb(photo_path)
+        if img_rgb is None:
+            hasil.update(status='unreadable', message="Tidak bisa membaca gambar")
+            return hasil
 
-        if img is None:
-            print(f"   ❌ Tidak bisa membaca gambar {photo_path}")
-            return
+        # Deteksi wajah (pada salinan yang diperkecil) + encoding
+        face_locations, encodings = detect_and_encode(img_rgb, detect_width=DETECT_WIDTH, quality=ENROLL_QUALITY)
+        if not face_locations:
+            hasil.update(status='no_face', message="Tidak ada wajah")
+            return hasil
+        if not encodings:
+            hasil.update(status='no_encoding', message="Gagal membuat encoding")
+            return hasil
+        if len(face_locations) > 1:
+            hasil['message'] = f"{len(face_locations)} wajah, dipakai yang pertama"
+        hasil['encoding'] = encode_encoding(encodings[0])
+    except LowQualityFace as e:
+        hasil.update(status='low_quality', message=f"Kualitas foto kurang ({e.reason}): {e.message}")
+    except Exception as e:
+        hasil.update(status='error', message=str(e))
+    return hasil
 
-        # Pastikan gambar hanya 3 channel (hapus alpha channel)
-        if img.shape[-1] == 4:
-            img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
 
-        # Konversi ke RGB 8-bit
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img_rgb = np.ascontiguousarray(img_rgb, dtype=np.uint8)
+def load_roster():
+    """{id_wbs: (nama, face_encoding)} dari tabel wbs, untuk mencocokkan nama file sebelum UPDATE."""
+    with db_connection() as db:
+        cursor = db.cursor()
+        cursor.execute("SELECT id_wbs, nama, face_encoding FROM wbs")
+        roster = {int(id_wbs): (nama, blob) for id_wbs, nama, blob in cursor.fetchall()}
+        cursor.close()
+    return roster
 
-        # Verifikasi dimensi
-        if len(img_rgb.shape) != 3 or img_rgb.shape[2] != 3:
-            print(f"   ❌ Format gambar tidak valid (bukan RGB 3 channel).")
-            return
 
-        # Deteksi wajah
-        face_locations = face_recognition.face_locations(img_rgb)
-        if not face_locations:
-            print(f"   ⚠️ Tidak ada wajah di {photo_path}")
-            return
+def save_encodings(rows, clear=False):
+    """Simpan ``[(encoding_biner, id_wbs, nama), ...]`` dalam satu transaksi.
 
-        encodings = face_recognition.face_encodings(img_rgb, face_locations)
-        if not encodings:
-            print(f"   ⚠️ Gagal membuat encoding {photo_path}")
-            return
+    ``clear=True``: ``rows`` berisi ``[(id_wbs, encoding_biner), ...]`` yang
+    encoding-nya dikosongkan (foto sudah dihapus).
+    """
+    if not rows:
+        return
+    if clear:
+        query, sample_queries, sample_rows = CLEAR_QUERY, (CLEAR_SAMPLE_QUERY,), [(i,) for i, _ in rows]
+    else:
+        query, sample_queries, sample_rows = UPDATE_QUERY, RESEED_SAMPLE_QUERIES, [(i, enc) for enc, i, _ in rows]
+    with db_connection() as db:
+        cursor = db.cursor()
+        try:
+            cursor.executemany(query, rows)
+            if current_version(cursor) >= 4:
+                for sample_query in sample_queries:
+                    cursor.executemany(sample_query, sample_rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            cursor.close()
 
-        face_encoding = encodings[0]
 
-    except Exception as e:
-        print(f"   ❌ Error memproses {photo_path}: {e}")
+# --- FUNGSI ENROLL ---
+def enroll_wbs_face(photo_path):
+    """Enroll satu foto langsung (tanpa pool); dipakai untuk perbaikan satu orang."""
+    hasil = encode_photo(photo_path)
+    print(f"Memproses WBS ID: {hasil['id_wbs']} ({hasil['nama']})...")
+    if hasil['status'] != 'ok':
+        print(f"   ⚠️ {hasil['file']}: {hasil['message']}")
         return
+    try:
+        save_encodings([(hasil['encoding'], hasil['id_wbs'], hasil['nama'])])
+        print(f"   ✅ {hasil['nama']} (ID {hasil['id_wbs']}) berhasil disimpan.")
+    except (mysql.connector.Error, PoolTimeout) as err:
+        print(f"   ❌ Gagal simpan ke DB: {err}")
 
-    # Simpan ke DB
-    db = connect_db()
-    if not db:
-        print("   ❌ Tidak bisa konek ke DB.")
+
+def _iter_results(paths, workers):
+    if workers == 0:
+        for path in paths:
+            yield encode_photo(path)
         return
+    # 'spawn' seperti inference_pool: sama di Windows dan Linux
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        # Hasil diproses bertahap (urut file), tidak menunggu semua foto selesai
+        yield from executor.map(encode_photo, paths, chunksize=max(1, min(16, len(paths) // (workers * 4))))
 
-    cursor = db.cursor()
-    query = "UPDATE wbs SET face_encoding = %s WHERE id_wbs = %s AND nama = %s"
-    try:
-        cursor.execute(query, (pickle.dumps(face_encoding), wbs_id, wbs_name))
-        db.commit()
-        print(f"   ✅ {wbs_name} (ID {wbs_id}) berhasil disimpan.")
-    except Exception as e:
-        print(f"   ❌ Gagal simpan ke DB: {e}")
-        db.rollback()
-    finally:
-        cursor.close()
-        db.close()
 
-# --- LOOP SEMUA FOTO ---
-def run_enrollment():
-    photo_dir = "wbs_photos_ready"
+def _from_entry(fn, entry, sumber):
+    """Bentuk hasil ``encode_photo`` dari entri manifest (tanpa encode ulang)."""
+    hasil = {'file': fn, 'id_wbs': entry['id_wbs'], 'nama': entry['nama'], 'status': entry['status'],
+             'encoding': entry_encoding(entry), 'message': entry.get('message', ''), 'sumber': sumber}
+    if hasil['encoding'] is not None:
+        # not_in_db / duplicate dicek ulang terhadap tabel wbs saat ini
+        hasil['status'] = 'ok'
+    return hasil
+
+
+def _clear_deleted(manifest, files, roster):
+    """Kosongkan encoding milik foto yang sudah dihapus dari folder."""
+    ids_aktif = set()
+    for fn in files:
+        try:
+            ids_aktif.add(parse_filename(fn)[0])
+        except Exception:
+            pass
+    rows = []
+    for fn, entry in manifest.items():
+        if fn in files or entry.get('status') != 'saved' or entry['id_wbs'] in ids_aktif:
+            continue
+        blob = entry_encoding(entry)
+        db = roster.get(entry['id_wbs'])
+        if db and db[1] is not None and bytes(db[1]) == blob:
+            rows.append((entry['id_wbs'], blob))
+            print(f"   🗑️ {fn} dihapus, encoding WBS {entry['id_wbs']} dikosongkan.")
+    save_encodings(rows, clear=True)
+    return len(rows)
 
+
+# --- LOOP SEMUA FOTO ---
+def run_enrollment(photo_dir=PHOTO_DIR, workers=None, batch_size=BATCH_SIZE, report_path=None,
+                   force=False, manifest_path=MANIFEST_PATH):
+    """Enroll foto baru/berubah di ``photo_dir``; ``force=True`` meng-encode ulang semuanya."""
     if not os.path.exists(photo_dir):
         print(f"❌ Folder '{photo_dir}' tidak ditemukan.")
         return
 
-    files = [f for f in os.listdir(photo_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+    files = sorted(f for f in os.listdir(photo_dir) if f.lower().endswith(PHOTO_EXTENSIONS))
     if not files:
         print(f"⚠️ Tidak ada file di folder '{photo_dir}'.")
         return
 
-    print(f"📸 Ditemukan {len(files)} file wajah. Mulai proses...\n")
-    for f in files:
-        enroll_wbs_face(os.path.join(photo_dir, f))
+    try:
+        roster = load_roster()
+    except (mysql.connector.Error, PoolTimeout) as err:
+        print(f"❌ Tidak bisa konek ke DB: {err}")
+        return
+
+    t0 = time.perf_counter()
+    status = Counter()
+    gagal = []
+    batch = []
+    ids_dipakai = {}
+    manifest = load_manifest(manifest_path, MODEL_VERSION)
+    entries = {}
+    info = {}  # nama file -> (stat, sha256)
+
+    try:
+        status['deleted'] = _clear_deleted(manifest, set(files), roster)
+    except (mysql.connector.Error, PoolTimeout) as err:
+        print(f"   ❌ Gagal mengosongkan encoding foto yang dihapus: {err}")
+
+    # Pisahkan foto yang sama dengan run sebelumnya dari yang perlu di-encode
+    tersimpan, todo = [], []
+    per_hash = {} if force else {e['sha256']: e for e in manifest.values() if e.get('encoding')}
+    for fn in files:
+        path = os.path.join(photo_dir, fn)
+        stat = os.stat(path)
+        lama = manifest.get(fn)
+        sama, digest = is_unchanged(lama, path, stat)
+        info[fn] = (stat, digest)
+        if sama and not force:
+            tersimpan.append(_from_entry(fn, lama, 'manifest'))
+        elif digest in per_hash:
+            # Isi sama dengan foto lain di manifest (mis. file di-rename): pakai encoding-nya
+            hasil = _from_entry(fn, per_hash[digest], 'reuse')
+            try:
+                hasil['id_wbs'], hasil['nama'] = parse_filename(fn)
+            except Exception as e:
+                hasil.update(status='bad_name', encoding=None, message=f"Format nama file salah: {e}")
+            tersimpan.append(hasil)
+        else:
+            todo.append(path)
+
+    workers = max(1, os.cpu_count() or 1) if workers is None else workers
+    print(f"📸 Ditemukan {len(files)} file wajah: {len(todo)} baru/berubah, "
+          f"{len(tersimpan)} dari manifest. Mulai proses dengan {workers or 'tanpa'} worker...\n")
+
+    def flush():
+        try:
+            save_encodings([row for row, _ in batch])
+            for _, hasil in batch:
+                status[{'encoded': 'saved', 'reuse': 'reused', 'manifest': 'restored'}[hasil['sumber']]] += 1
+                catat_manifest(hasil, 'saved')
+        except (mysql.connector.Error, PoolTimeout) as err:
+            print(f"   ❌ Gagal simpan {len(batch)} baris ke DB: {err}")
+            status['db_error'] += len(batch)
+            gagal.extend({'file': hasil['file'], 'status': 'db_error', 'message': str(err)} for _, hasil in batch)
+        batch.clear()
+
+    def catat_manifest(hasil, hasil_status):
+        stat, digest = info[hasil['file']]
+        entries[hasil['file']] = make_entry(stat, digest, hasil['id_wbs'], hasil['nama'], hasil_status,
+                                            hasil['encoding'], hasil['message'])
+
+    def terima(hasil):
+        if hasil['status'] == 'ok':
+            db = roster.get(hasil['id_wbs'])
+            # Collation MySQL tidak peka huruf besar/kecil; samakan di sini
+            if db is None or db[0].strip().lower() != hasil['nama'].strip().lower():
+                hasil.update(status='not_in_db', message=f"WBS {hasil['id_wbs']} '{hasil['nama']}' tidak ada di tabel wbs")
+            elif hasil['id_wbs'] in ids_dipakai:
+                hasil.update(status='duplicate', message=f"ID sama dengan {ids_dipakai[hasil['id_wbs']]}")
+
+        if hasil['status'] != 'ok':
+            catat_manifest(hasil, hasil['status'])
+            status[hasil['status']] += 1
+            gagal.append({k: hasil[k] for k in ('file', 'status', 'message')})
+            print(f"   ⚠️ {hasil['file']}: {hasil['message']}")
+            return
+
+        ids_dipakai[hasil['id_wbs']] = hasil['file']
+        if hasil['sumber'] == 'manifest' and db[1] is not None:
+            # Sudah ada di database (dari run ini sebelumnya, atau diganti lewat web): biarkan
+            catat_manifest(hasil, 'saved')
+            status['unchanged'] += 1
+            return
+        # Foto baru, encoding hasil reuse, atau baris wbs yang encoding-nya hilang ('manifest')
+        batch.append(((hasil['encoding'], hasil['id_wbs'], db[0]), hasil))
+        if len(batch) >= batch_size:
+            flush()
+
+    try:
+        for hasil in tersimpan:
+            terima(hasil)
+        for i, hasil in enumerate(_iter_results(todo, workers) if todo else (), 1):
+            hasil['sumber'] = 'encoded'
+            status['encoded'] += 1
+            terima(hasil)
+            if i % 100 == 0:
+                elapsed = time.perf_counter() - t0
+                print(f"   … {i}/{len(todo)} foto di-encode ({i / elapsed:.1f} foto/detik)")
+        flush()
+    finally:
+        # Simpan juga saat dihentikan di tengah jalan; foto yang belum selesai diproses lagi nanti
+        save_manifest(manifest_path, entries, MODEL_VERSION)
+
+    elapsed = time.perf_counter() - t0
+    ringkasan = {
+        'photos': len(files),
+        'encoded': len(todo),
+        'workers': workers,
+        'force': force,
+        'model_version': MODEL_VERSION,
+        'seconds': round(elapsed, 2),
+        'photos_per_second': round(len(todo) / elapsed, 2) if elapsed and todo else None,
+        'status': {k: v for k, v in status.items() if v},
+        'failures': gagal,
+    }
+    print("\n📊 Ringkasan enrollment")
+    print(f"   Foto      : {len(files)} ({len(todo)} di-encode) dalam {elapsed:.1f} detik")
+    for key, jumlah in sorted(ringkasan['status'].items()):
+        print(f"   {key:<10}: {jumlah}")
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(ringkasan, f, indent=2, ensure_ascii=False)
+        print(f"💾 Laporan disimpan ke {report_path}")
     print("\n✅ Enrollment selesai!")
+    return ringkasan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enrollment wajah WBS dari folder foto.")
+    parser.add_argument('--photos', default=PHOTO_DIR, help="Folder foto 'nama_id.jpg'")
+    parser.add_argument('--workers', type=int, default=None, help="Jumlah proses (default: jumlah core, 0 = tanpa pool)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--report', help="Simpan ringkasan dalam format JSON")
+    parser.add_argument('--force', action='store_true', help="Encode ulang semua foto, abaikan manifest")
+    parser.add_argument('--manifest', default=MANIFEST_PATH)
+    args = parser.parse_args()
+    run_enrollment(args.photos, args.workers, args.batch_size, args.report, args.force, args.manifest)
+
 
 if __name__ == "__main__":
-    run_enrollment()
+    main()
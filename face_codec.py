@@ -0,0 +1,72 @@
+import pickle
+import struct
+
+import numpy as np
+
+from gallery import ENCODING_DIM
+
+# Format biner encoding wajah di kolom wbs.face_encoding:
+#   header 8 byte : magic b'FE', versi (uint8), kode dtype (uint8), dimensi (uint16 LE), cadangan (2 byte)
+#   isi           : dimensi x float32 little-endian
+MAGIC = b'FE'
+VERSION = 1
+DTYPE_F32LE = 1
+HEADER = struct.Struct('<2sBBHxx')
+HEADER_SIZE = HEADER.size
+RECORD_SIZE = HEADER_SIZE + ENCODING_DIM * 4
+
+_HEADER_BYTES = HEADER.pack(MAGIC, VERSION, DTYPE_F32LE, ENCODING_DIM)
+_HEADER_U64 = int.from_bytes(_HEADER_BYTES, 'little')
+_RECORD_DTYPE = np.dtype([('header', '<u8'), ('vec', '<f4', (ENCODING_DIM,))])
+
+
+def encode_encoding(enc):
+    """Encoding 128-d -> bytes format biner versi 1."""
+    vec = np.asarray(enc, dtype='<f4').reshape(ENCODING_DIM)
+    return _HEADER_BYTES + vec.tobytes()
+
+
+def is_encoded(blob):
+    return blob is not None and len(blob) == RECORD_SIZE and bytes(blob[:HEADER_SIZE]) == _HEADER_BYTES
+
+
+def decode_encoding(blob, allow_pickle=False):
+    """bytes -> np.ndarray float32 (128,). Pickle lama hanya dibaca jika ``allow_pickle``."""
+    if is_encoded(blob):
+        return np.frombuffer(blob, dtype='<f4', offset=HEADER_SIZE).astype(np.float32)
+    if allow_pickle:
+        return np.asarray(pickle.loads(blob), dtype=np.float32).reshape(ENCODING_DIM)
+    raise ValueError("Encoding bukan format biner v1 (jalankan migrate_encodings.py).")
+
+
+def decode_many(blobs, allow_pickle=False):
+    """Decode banyak blob sekaligus ke satu matriks (N x 128) float32.
+
+    Jalur cepat: semua blob format v1 digabung lalu dibaca dengan satu
+    ``np.frombuffer``. Blob lain (pickle lama, rusak) diproses satu per satu.
+    Mengembalikan ``(matrix, ok)``; ``ok`` adalah mask baris yang berhasil.
+    """
+    n = len(blobs)
+    matrix = np.empty((n, ENCODING_DIM), dtype=np.float32)
+    ok = np.zeros(n, dtype=bool)
+    if n == 0:
+        return matrix, ok
+
+    fast = np.fromiter((b is not None and len(b) == RECORD_SIZE for b in blobs), dtype=bool, count=n)
+    rows = np.flatnonzero(fast)
+    if len(rows):
+        records = np.frombuffer(b''.join(blobs[i] for i in rows), dtype=_RECORD_DTYPE)
+        valid = records['header'] == _HEADER_U64
+        matrix[rows[valid]] = records['vec'][valid]
+        ok[rows[valid]] = True
+
+    for i in np.flatnonzero(~ok):
+        blob = blobs[i]
+        if blob is None:
+            continue
+        try:
+            matrix[i] = decode_encoding(blob, allow_pickle=allow_pickle)
+            ok[i] = True
+        except Exception:
+            pass
+    return matrix, ok
@@ -0,0 +1,337 @@
+import hashlib
+import heapq
+import os
+
+import numpy as np
+
+# Backend index untuk GalleryMatcher. Semua backend hanya mengembalikan
+# kandidat baris; jarak akhir tetap dihitung persis oleh GalleryMatcher.
+
+
+def gallery_fingerprint(matrix, ids, backend=None, params=None):
+    """Sidik jari galeri (dan backend + parameter build index), dipakai untuk
+    memastikan index di disk masih cocok."""
+    h = hashlib.sha1()
+    matrix = np.ascontiguousarray(matrix)  # tanpa salinan untuk matriks/memmap yang sudah kontigu
+    h.update(matrix.dtype.str.encode('ascii'))
+    h.update(matrix.view(np.uint8))
+    h.update(repr(list(ids)).encode('utf-8'))
+    if backend is not None:
+        h.update(repr((backend, sorted((params or {}).items()))).encode('utf-8'))
+    return h.hexdigest()
+
+
+def _sq_dist(matrix, q):
+    d2 = np.einsum('ij,ij->i', matrix, matrix) - 2.0 * (matrix @ q) + float(q @ q)
+    return np.maximum(d2, 0.0, out=d2)
+
+
+class BruteForceIndex:
+    """Scan linear penuh; hasilnya persis sama dengan tanpa index."""
+
+    backend = 'brute'
+    build_params = ()
+    query_params = ()
+
+    def __init__(self):
+        self.size = 0
+
+    def build(self, matrix):
+        self.size = matrix.shape[0]
+        return self
+
+    def candidates(self, query, k):
+        return np.arange(self.size)
+
+    def to_arrays(self):
+        return {'size': np.array(self.size)}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        index = cls()
+        index.size = int(arrays['size'])
+        return index
+
+
+class IVFIndex:
+    """Index terpartisi (IVF): k-means kasar, lalu hanya scan ``nprobe`` partisi terdekat."""
+
+    backend = 'ivf'
+    build_params = ('nlist', 'iterations', 'seed')
+    query_params = ('nprobe',)
+
+    def __init__(self, nlist=None, nprobe=8, iterations=10, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids = np.empty((0, 0))
+        self.order = np.empty(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+
+    def build(self, matrix):
+        n = matrix.shape[0]
+        if n == 0:
+            self.centroids = np.empty((0, matrix.shape[1]))
+            self.order = np.empty(0, dtype=np.int64)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            return self
+
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(self.seed)
+        centroids = matrix[rng.choice(n, nlist, replace=False)].copy()
+        sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+
+        for _ in range(self.iterations):
+            assign = self._assign(matrix, sq_norms, centroids)
+            counts = np.bincount(assign, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, matrix)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+
+        assign = self._assign(matrix, sq_norms, centroids)
+        self.centroids = centroids
+        self.order = np.argsort(assign, kind='stable')
+        counts = np.bincount(assign, minlength=nlist)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        return self
+
+    @staticmethod
+    def _assign(matrix, sq_norms, centroids):
+        c_norms = np.einsum('ij,ij->i', centroids, centroids)
+        d2 = sq_norms[:, None] - 2.0 * (matrix @ centroids.T) + c_norms[None, :]
+        return np.argmin(d2, axis=1)
+
+    def candidates(self, query, k):
+        nlist = self.centroids.shape[0]
+        if nlist == 0:
+            return self.order
+        nprobe = min(self.nprobe, nlist)
+        d2 = _sq_dist(self.centroids, query)
+        probe = np.argpartition(d2, nprobe - 1)[:nprobe]
+        parts = [self.order[self.offsets[p]:self.offsets[p + 1]] for p in probe]
+        return np.concatenate(parts)
+
+    def to_arrays(self):
+        return {
+            'centroids': self.centroids,
+            'order': self.order,
+            'offsets': self.offsets,
+            'nprobe': np.array(self.nprobe),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        index = cls(nlist=arrays['centroids'].shape[0], nprobe=int(arrays['nprobe']))
+        index.centroids = arrays['centroids']
+        index.order = arrays['order']
+        index.offsets = arrays['offsets']
+        return index
+
+
+class RPForestIndex:
+    """Hutan pohon proyeksi acak (gaya Annoy).
+
+    Tiap simpul membelah titik dengan hyperplane di tengah dua titik acak.
+    Pencarian menelusuri semua pohon dengan antrean prioritas sampai
+    terkumpul ``search_k`` kandidat.
+    """
+
+    backend = 'rptree'
+    build_params = ('n_trees', 'leaf_size', 'seed')
+    query_params = ('search_k',)
+
+    def __init__(self, n_trees=8, leaf_size=32, search_k=None, seed=0):
+        self.n_trees = n_trees
+        self.leaf_size = leaf_size
+        self.search_k = search_k
+        self.seed = seed
+        self._reset(0)
+
+    def _reset(self, dim):
+        self.normals = []
+        self.offsets_split = []
+        self.children = []
+        self.leaf_start = []
+        self.leaf_end = []
+        self.leaf_items = []
+        self.roots = []
+        self.dim = dim
+
+    def build(self, matrix):
+        n, dim = matrix.shape
+        self._reset(dim)
+        rng = np.random.default_rng(self.seed)
+        items = []
+        for _ in range(self.n_trees):
+            self.roots.append(self._build_node(matrix, np.arange(n), rng, items))
+        self.leaf_items = np.array(items, dtype=np.int64)
+        self.normals = np.array(self.normals, dtype=np.float64).reshape(-1, dim)
+        self.offsets_split = np.array(self.offsets_split, dtype=np.float64)
+        self.children = np.array(self.children, dtype=np.int64).reshape(-1, 2)
+        self.leaf_start = np.array(self.leaf_start, dtype=np.int64)
+        self.leaf_end = np.array(self.leaf_end, dtype=np.int64)
+        self.roots = np.array(self.roots, dtype=np.int64)
+        return self
+
+    def _new_node(self, dim):
+        self.normals.append(np.zeros(dim))
+        self.offsets_split.append(0.0)
+        self.children.append([-1, -1])
+        self.leaf_start.append(-1)
+        self.leaf_end.append(-1)
+        return len(self.children) - 1
+
+    def _build_node(self, matrix, idx, rng, items):
+        node = self._new_node(matrix.shape[1])
+        if len(idx) <= self.leaf_size:
+            self.leaf_start[node] = len(items)
+            items.extend(idx.tolist())
+            self.leaf_end[node] = len(items)
+            return node
+
+        a, b = matrix[rng.choice(idx, 2, replace=False)]
+        normal = a - b
+        if not np.any(normal):
+            normal = rng.normal(size=matrix.shape[1])
+        offset = float(normal @ (a + b) / 2.0)
+        side = matrix[idx] @ normal > offset
+        left, right = idx[~side], idx[side]
+        if len(left) == 0 or len(right) == 0:
+            # Titik kembar: bagi dua saja agar pohon tetap berakhir
+            perm = rng.permutation(idx)
+            left, right = perm[:len(perm) // 2], perm[len(perm) // 2:]
+
+        self.normals[node] = normal
+        self.offsets_split[node] = offset
+        self.children[node] = [self._build_node(matrix, left, rng, items),
+                               self._build_node(matrix, right, rng, items)]
+        return node
+
+    def candidates(self, query, k):
+        if len(self.roots) == 0:
+            return np.empty(0, dtype=np.int64)
+        search_k = self.search_k or max(k, 1) * self.n_trees * self.leaf_size
+        heap = [(0.0, int(root)) for root in self.roots]
+        heapq.heapify(heap)
+        found = []
+        jumlah = 0
+        while heap and jumlah < search_k:
+            margin, node = heapq.heappop(heap)
+            start = self.leaf_start[node]
+            if start >= 0:
+                leaf = self.leaf_items[start:self.leaf_end[node]]
+                found.append(leaf)
+                jumlah += len(leaf)
+                continue
+            side = float(self.normals[node] @ query) - self.offsets_split[node]
+            left, right = self.children[node]
+            # Sisi yang sama dengan query dulu; sisi lain diberi prioritas menurut jarak ke hyperplane
+            near, far = (right, left) if side > 0 else (left, right)
+            heapq.heappush(heap, (margin, int(near)))
+            heapq.heappush(heap, (max(margin, abs(side)), int(far)))
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def to_arrays(self):
+        return {
+            'normals': self.normals,
+            'offsets_split': self.offsets_split,
+            'children': self.children,
+            'leaf_start': self.leaf_start,
+            'leaf_end': self.leaf_end,
+            'leaf_items': self.leaf_items,
+            'roots': self.roots,
+            'params': np.array([self.n_trees, self.leaf_size, self.search_k or 0]),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        n_trees, leaf_size, search_k = (int(v) for v in arrays['params'])
+        index = cls(n_trees=n_trees, leaf_size=leaf_size, search_k=search_k or None)
+        for key in ('normals', 'offsets_split', 'children', 'leaf_start',
+                    'leaf_end', 'leaf_items', 'roots'):
+            setattr(index, key, arrays[key])
+        index.dim = index.normals.shape[1]
+        return index
+
+
+BACKENDS = {
+    BruteForceIndex.backend: BruteForceIndex,
+    IVFIndex.backend: IVFIndex,
+    RPForestIndex.backend: RPForestIndex,
+}
+
+
+def split_params(backend, params):
+    """Pisahkan ``params`` menjadi (parameter build, parameter query) untuk ``backend``.
+
+    Keduanya diisi nilai default backend, jadi menulis nilai default secara
+    eksplisit sama dengan tidak menulisnya.
+    """
+    cls = BACKENDS[backend]
+    index = cls(**params)
+    build = {k: getattr(index, k) for k in cls.build_params}
+    query = {k: getattr(index, k) for k in cls.query_params}
+    return build, query
+
+
+def build_index(backend, matrix, **params):
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend index tidak dikenal: {backend}")
+    return BACKENDS[backend](**params).build(np.asarray(matrix, dtype=np.float64))
+
+
+def save_index(index, path, fingerprint):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, backend=np.array(index.backend),
+             fingerprint=np.array(fingerprint), **index.to_arrays())
+    os.replace(tmp_path, path)
+
+
+def load_index(path, fingerprint, backend=None):
+    """Muat index dari disk; ``None`` jika tidak ada, rusak, atau galeri sudah berubah."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as arrays:
+            if str(arrays['fingerprint']) != fingerprint:
+                return None
+            saved_backend = str(arrays['backend'])
+            if backend and saved_backend != backend:
+                return None
+            return BACKENDS[saved_backend].from_arrays({k: arrays[k] for k in arrays.files})
+    except Exception as e:
+        print(f"⚠️ Index {path} tidak bisa dibaca: {e}")
+        return None
+
+
+def load_or_build_index(backend, matrix, ids, path, **params):
+    """Pakai index tersimpan jika galeri dan parameter build belum berubah; jika
+    tidak, bangun dan simpan ulang. Parameter query (``nprobe``, ``search_k``)
+    selalu diambil dari ``params``, bukan dari file."""
+    if backend == BruteForceIndex.backend:
+        return BruteForceIndex().build(matrix)
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend index tidak dikenal: {backend}")
+    build_params, query_params = split_params(backend, params)
+    fingerprint = gallery_fingerprint(matrix, ids, backend, build_params)
+    index = load_index(path, fingerprint, backend)
+    if index is not None:
+        for key, value in query_params.items():
+            setattr(index, key, value)
+        print(f"🗂️ Index '{backend}' dimuat dari {path}")
+        return index
+    index = build_index(backend, matrix, **params)
+    try:
+        save_index(index, path, fingerprint)
+        print(f"🗂️ Index '{backend}' dibangun dan disimpan ke {path}")
+    except OSError as e:
+        print(f"⚠️ Gagal menyimpan index ke {path}: {e}")
+    return index
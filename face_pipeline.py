@@ -0,0 +1,178 @@
+import time
+
+import cv2
+import face_recognition
+import numpy as np
+
+from face_quality import LowQualityFace, check_face
+
+# Langkah deteksi + encoding wajah yang sama untuk request inline,
+# worker inference_pool, dan skrip enrollment.
+
+DETECTION_MODEL = "hog"
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def normalize_image(img):
+    """Ubah hasil ``cv2.imdecode(..., IMREAD_UNCHANGED)`` menjadi BGR 8-bit 3 channel.
+
+    Sama seperti ``auto_fix_and_debug.opencv_fix_all``, tetapi di memori:
+    grayscale -> BGR, alpha dibuang, 16-bit diskalakan ke 8-bit.
+    """
+    if img.dtype == np.uint16:
+        img = (img >> 8).astype(np.uint8)
+    elif img.dtype != np.uint8:
+        img = np.clip(img, 0, 255).astype(np.uint8)
+    if img.ndim == 2:
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    elif img.shape[2] == 4:
+        img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+    elif img.shape[2] > 3:
+        img = img[:, :, :3]
+    return img
+
+
+def load_photo_rgb(path):
+    """Baca foto (path unicode aman) langsung menjadi RGB 8-bit contiguous, atau None."""
+    img = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if img is None:
+        # File yang ditolak OpenCV (mis. JPEG terpotong) masih bisa dibaca PIL
+        try:
+            from PIL import Image, ImageFile
+            ImageFile.LOAD_TRUNCATED_IMAGES = True
+            with Image.open(path) as im:
+                return np.ascontiguousarray(im.convert('RGB'), dtype=np.uint8)
+        except Exception:
+            return None
+    return np.ascontiguousarray(cv2.cvtColor(normalize_image(img), cv2.COLOR_BGR2RGB))
+
+
+def crop_roi(rgb, roi):
+    """Potong bagian tengah gambar (``roi`` = fraksi lebar/tinggi, mis. 0.6).
+
+    Mengembalikan ``(crop, (offset_y, offset_x))``.
+    """
+    if not roi or roi >= 1.0:
+        return rgb, (0, 0)
+    h, w = rgb.shape[:2]
+    ch, cw = max(1, int(h * roi)), max(1, int(w * roi))
+    y0, x0 = (h - ch) // 2, (w - cw) // 2
+    return rgb[y0:y0 + ch, x0:x0 + cw], (y0, x0)
+
+
+def detect_faces(rgb, detect_width=None, roi=None, upsample=1, model=DETECTION_MODEL):
+    """Deteksi wajah pada salinan gambar yang diperkecil, lalu kembalikan kotak
+    dalam koordinat gambar asli.
+
+    ``detect_width``: lebar maksimum gambar untuk deteksi (None = ukuran asli).
+    ``roi``: hanya cari wajah di tengah gambar (sesuai panduan wajah di kiosk).
+    """
+    view, (y0, x0) = crop_roi(rgb, roi)
+    h, w = view.shape[:2]
+    scale = 1.0
+    if detect_width and w > detect_width:
+        scale = detect_width / w
+        view = cv2.resize(view, (detect_width, max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    else:
+        view = np.ascontiguousarray(view)
+
+    locations = face_recognition.face_locations(view, number_of_times_to_upsample=upsample, model=model)
+    if scale == 1.0 and not y0 and not x0:
+        return locations
+
+    full_h, full_w = rgb.shape[:2]
+    hasil = []
+    for top, right, bottom, left in locations:
+        hasil.append((
+            min(full_h, max(0, int(round(top / scale)) + y0)),
+            min(full_w, max(0, int(round(right / scale)) + x0)),
+            min(full_h, max(0, int(round(bottom / scale)) + y0)),
+            min(full_w, max(0, int(round(left / scale)) + x0)),
+        ))
+    return hasil
+
+
+def encode_faces(rgb, locations):
+    """Encoding 128-d (float64) untuk kotak wajah yang sudah diketahui, sekali panggil untuk semua kotak."""
+    if not locations:
+        return []
+    encodings = face_recognition.face_encodings(rgb, known_face_locations=list(locations))
+    return [np.asarray(e, dtype=np.float64) for e in encodings]
+
+
+def check_and_encode(rgb, locations, quality=None, timings=None):
+    """Gerbang kualitas lalu encoding untuk kotak wajah yang sudah diketahui.
+
+    Mengembalikan ``(encodings, reasons)`` sepanjang ``locations``; kotak yang
+    ditolak punya encoding ``None`` dan kode alasan ``face_quality``. Kotak yang
+    lolos di-encode dalam satu panggilan ``face_encodings``.
+    """
+    t0 = time.perf_counter()
+    reasons = [None] * len(locations)
+    if quality is not None:
+        for i, box in enumerate(locations):
+            try:
+                check_face(rgb, box, quality)
+            except LowQualityFace as e:
+                reasons[i] = e.reason
+        if timings is not None:
+            timings['quality'] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+    lolos = [box for box, reason in zip(locations, reasons) if reason is None]
+    encoded = iter(encode_faces(rgb, lolos))
+    encodings = [next(encoded, None) if reason is None else None for reason in reasons]
+    if timings is not None and lolos:
+        timings['encode'] = time.perf_counter() - t0
+    return encodings, reasons
+
+
+def detect_and_encode(rgb, detect_width=None, roi=None, upsample=1, model=DETECTION_MODEL, timings=None,
+                      quality=None):
+    """Deteksi semua wajah di gambar RGB lalu buat encoding 128-d dari gambar asli.
+
+    Mengembalikan ``(face_locations, encodings)``; keduanya list kosong jika
+    tidak ada wajah. Jika ``timings`` (dict) diberikan, durasi tahap
+    ``detect``, ``quality`` dan ``encode`` (detik) dicatat di sana.
+
+    ``quality``: ambang ``face_quality.check_face`` (dict, ``{}`` = default)
+    untuk wajah pertama; jika tidak lolos, ``LowQualityFace`` dilempar sebelum
+    encoding. None = tanpa gerbang kualitas.
+    """
+    t0 = time.perf_counter()
+    face_locations = detect_faces(rgb, detect_width=detect_width, roi=roi, upsample=upsample, model=model)
+    t1 = time.perf_counter()
+    if timings is not None:
+        timings['detect'] = t1 - t0
+    if not face_locations:
+        return [], []
+    if quality is not None:
+        try:
+            check_face(rgb, face_locations[0], quality)
+        finally:
+            if timings is not None:
+                timings['quality'] = time.perf_counter() - t1
+        t1 = time.perf_counter()
+    encodings = face_recognition.face_encodings(rgb, known_face_locations=face_locations)
+    if timings is not None:
+        timings['encode'] = time.perf_counter() - t1
+    return face_locations, encodings
+
+
+def detect_and_encode_group(rgb, detect_width=None, roi=None, upsample=1, model=DETECTION_MODEL, timings=None,
+                            quality=None, max_faces=None):
+    """Versi grup ``detect_and_encode``: setiap wajah diperiksa kualitasnya, lalu
+    semua wajah yang lolos di-encode dalam satu panggilan ``face_encodings``.
+
+    Mengembalikan ``(face_locations, encodings, reasons)`` sepanjang jumlah
+    wajah (terbesar dulu, paling banyak ``max_faces``); wajah yang ditolak
+    gerbang kualitas punya encoding ``None`` dan kode alasan di ``reasons``.
+    """
+    t0 = time.perf_counter()
+    face_locations = detect_faces(rgb, detect_width=detect_width, roi=roi, upsample=upsample, model=model)
+    face_locations.sort(key=lambda b: (b[2] - b[0]) * (b[1] - b[3]), reverse=True)
+    if max_faces:
+        face_locations = face_locations[:max_faces]
+    if timings is not None:
+        timings['detect'] = time.perf_counter() - t0
+    encodings, reasons = check_and_encode(rgb, face_locations, quality=quality, timings=timings)
+    return face_locations, encodings, reasons
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import math
+
+import cv2
+import face_recognition
+import numpy as np
+
+# Gerbang kualitas sebelum encoding: wajah yang terlalu kecil, gelap/terang,
+# buram, atau menoleh ditolak tanpa memanggil face_encodings. Alasannya
+# dikirim ke kiosk sebagai kode singkat supaya UI bisa memberi petunjuk.
+
+# Ketajaman diukur pada potongan wajah yang diskalakan ke lebar ini, supaya
+# ambangnya sama untuk foto enrollment besar dan frame webcam kecil.
+SHARPNESS_WIDTH = 128
+
+DEFAULT_THRESHOLDS = {
+    'min_face': 80,          # sisi pendek kotak wajah (piksel gambar asli)
+    'min_brightness': 50,    # rata-rata grayscale kotak wajah (0-255)
+    'max_brightness': 210,
+    'min_sharpness': 30.0,   # varian Laplacian pada lebar SHARPNESS_WIDTH
+    'max_yaw': 0.35,         # geser hidung dari tengah mata / jarak mata; None = tanpa cek pose
+    'max_roll': 25.0,        # kemiringan garis mata (derajat)
+}
+
+REASON_MESSAGES = {
+    'closer': "Wajah terlalu kecil, silakan mendekat ke kamera.",
+    'too_dark': "Cahaya terlalu gelap, cari tempat yang lebih terang.",
+    'too_bright': "Cahaya terlalu terang, hindari lampu/jendela di belakang kamera.",
+    'hold_still': "Gambar buram, tahan posisi sebentar.",
+    'face_camera': "Hadapkan wajah lurus ke kamera.",
+}
+
+
+class LowQualityFace(Exception):
+    """Wajah terdeteksi tetapi tidak layak di-encode; ``reason`` adalah kunci ``REASON_MESSAGES``."""
+
+    def __init__(self, reason, scores=None):
+        super().__init__(reason, scores)
+        self.reason = reason
+        self.scores = scores or {}
+
+    @property
+    def message(self):
+        return REASON_MESSAGES.get(self.reason, "Kualitas wajah kurang baik, coba lagi.")
+
+
+def thresholds_version(thresholds):
+    """Kode pendek ambang efektif (digabung dengan default), mis. ``q-3f9a1c2e``.
+
+    Dipakai di versi manifest enrollment agar foto dicek ulang jika ambang berubah.
+    """
+    t = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    return 'q-' + hashlib.sha1(json.dumps(t, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+
+
+def face_patch(gray, box):
+    top, right, bottom, left = box
+    return gray[max(0, top):bottom, max(0, left):right]
+
+
+def sharpness(patch):
+    """Varian Laplacian potongan wajah setelah diskalakan ke ``SHARPNESS_WIDTH``."""
+    if patch.size == 0:
+        return 0.0
+    h, w = patch.shape[:2]
+    if w != SHARPNESS_WIDTH:
+        patch = cv2.resize(patch, (SHARPNESS_WIDTH, max(1, round(h * SHARPNESS_WIDTH / w))),
+                           interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(patch, cv2.CV_64F).var())
+
+
+def pose(rgb, box):
+    """``(yaw, roll_derajat)`` dari 5 titik landmark, atau None jika landmark tidak ada."""
+    landmarks = face_recognition.face_landmarks(rgb, face_locations=[box], model='small')
+    if not landmarks:
+        return None
+    points = landmarks[0]
+    if not all(points.get(k) for k in ('left_eye', 'right_eye', 'nose_tip')):
+        return None
+    left_eye = np.mean(points['left_eye'], axis=0)
+    right_eye = np.mean(points['right_eye'], axis=0)
+    nose = np.mean(points['nose_tip'], axis=0)
+    dx, dy = right_eye - left_eye
+    eye_dist = math.hypot(dx, dy)
+    if not eye_dist:
+        return None
+    mid = (left_eye + right_eye) / 2
+    # Proyeksikan hidung ke garis mata: ~0 saat menghadap lurus, membesar saat menoleh
+    yaw = ((nose - mid) @ np.array([dx, dy])) / (eye_dist * eye_dist)
+    roll = math.degrees(math.atan2(dy, dx))
+    if roll > 90:
+        roll -= 180
+    elif roll < -90:
+        roll += 180
+    return float(yaw), float(roll)
+
+
+def check_face(rgb, box, thresholds=None):
+    """Periksa satu kotak wajah. Mengembalikan skor (dict) atau melempar ``LowQualityFace``.
+
+    Urutan cek dari yang paling murah; cek pose (landmark) hanya jika lolos semua.
+    """
+    t = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    top, right, bottom, left = box
+    scores = {'size': min(bottom - top, right - left)}
+    if scores['size'] < t['min_face']:
+        raise LowQualityFace('closer', scores)
+
+    patch = face_patch(rgb, box)
+    gray = cv2.cvtColor(np.ascontiguousarray(patch), cv2.COLOR_RGB2GRAY) if patch.size else patch
+    scores['brightness'] = float(gray.mean()) if gray.size else 0.0
+    if scores['brightness'] < t['min_brightness']:
+        raise LowQualityFace('too_dark', scores)
+    if scores['brightness'] > t['max_brightness']:
+        raise LowQualityFace('too_bright', scores)
+
+    scores['sharpness'] = sharpness(gray)
+    if scores['sharpness'] < t['min_sharpness']:
+        raise LowQualityFace('hold_still', scores)
+
+    if t.get('max_yaw') is not None:
+        estimate = pose(rgb, box)
+        if estimate is not None:
+            scores['yaw'], scores['roll'] = estimate
+            if abs(scores['yaw']) > t['max_yaw'] or abs(scores['roll']) > t['max_roll']:
+                raise LowQualityFace('face_camera', scores)
+    return scores
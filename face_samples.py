@@ -0,0 +1,91 @@
+from face_codec import decode_encoding, decode_many, encode_encoding
+from gallery import ENCODING_DIM, SampleStore
+
+# Sampel wajah per WBS (beberapa foto dari /api/daftar_wajah). Kolom
+# wbs.face_encoding berisi centroid (rata-rata) sampel tersebut, sehingga
+# galeri utama, poll updated_at, dan snapshot tetap satu baris per WBS.
+#
+#   CREATE TABLE wbs_face_sample (
+#       id_sample INT AUTO_INCREMENT PRIMARY KEY,
+#       id_wbs INT NOT NULL,
+#       encoding BLOB NOT NULL,
+#       created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+#       KEY idx_sample_wbs (id_wbs, id_sample),
+#       FOREIGN KEY (id_wbs) REFERENCES wbs (id_wbs) ON DELETE CASCADE
+#   );
+MAX_SAMPLES_PER_WBS = 5
+
+
+def fetch_samples(cursor, ids=None):
+    """``[(id_wbs, blob), ...]`` semua sampel, atau hanya milik ``ids``."""
+    if ids is None:
+        cursor.execute("SELECT id_wbs, encoding FROM wbs_face_sample ORDER BY id_wbs, id_sample")
+    else:
+        ids = list(ids)
+        if not ids:
+            return []
+        placeholders = ', '.join(['%s'] * len(ids))
+        cursor.execute(f"SELECT id_wbs, encoding FROM wbs_face_sample WHERE id_wbs IN ({placeholders}) "
+                       "ORDER BY id_wbs, id_sample", ids)
+    return [(row['id_wbs'], row['encoding']) if isinstance(row, dict) else tuple(row) for row in cursor.fetchall()]
+
+
+def build_store(rows, allow_pickle=False):
+    """SampleStore dari hasil ``fetch_samples`` (di-decode sekaligus)."""
+    if not rows:
+        return SampleStore.empty()
+    matrix, ok = decode_many([blob for _, blob in rows], allow_pickle=allow_pickle)
+    ids = [id_wbs for (id_wbs, _), valid in zip(rows, ok) if valid]
+    return SampleStore(matrix[ok], ids)
+
+
+def group_samples(rows, ids, allow_pickle=False):
+    """``{id_wbs: matriks sampel}`` untuk setiap id di ``ids`` (kosong jika tidak punya sampel)."""
+    store = build_store(rows, allow_pickle)
+    return {id_wbs: store.of(id_wbs).copy() for id_wbs in ids}
+
+
+def add_sample(cursor, id_wbs, encoding, replace=False, max_samples=MAX_SAMPLES_PER_WBS, allow_pickle=False):
+    """Tambah satu sampel lalu perbarui centroid di ``wbs.face_encoding``.
+
+    ``replace=True`` menghapus sampel lama lebih dulu. Jika WBS belum punya
+    sampel, encoding lama di ``wbs`` (mis. dari enrollment_script) ikut
+    disimpan sebagai sampel pertama. Hanya ``max_samples`` sampel terbaru
+    yang dipertahankan; sampel yang tidak bisa di-decode tidak ikut dirata-rata.
+    Mengembalikan ``(matriks sampel, centroid)``, centroid None (dan
+    ``wbs.face_encoding`` tidak diubah) jika tidak ada sampel yang valid;
+    commit dilakukan pemanggil.
+    """
+    if replace:
+        cursor.execute("DELETE FROM wbs_face_sample WHERE id_wbs = %s", (id_wbs,))
+    else:
+        cursor.execute("SELECT COUNT(*) FROM wbs_face_sample WHERE id_wbs = %s", (id_wbs,))
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("SELECT face_encoding FROM wbs WHERE id_wbs = %s", (id_wbs,))
+            row = cursor.fetchone()
+            if row and row[0] is not None:
+                try:
+                    lama = encode_encoding(decode_encoding(row[0], allow_pickle=allow_pickle))
+                except Exception as e:
+                    print(f"⚠️ Encoding lama WBS {id_wbs} tidak dipakai sebagai sampel: {e}")
+                else:
+                    cursor.execute("INSERT INTO wbs_face_sample (id_wbs, encoding) VALUES (%s, %s)",
+                                   (id_wbs, lama))
+
+    cursor.execute("INSERT INTO wbs_face_sample (id_wbs, encoding) VALUES (%s, %s)",
+                   (id_wbs, encode_encoding(encoding)))
+
+    cursor.execute("SELECT id_sample, encoding FROM wbs_face_sample WHERE id_wbs = %s ORDER BY id_sample DESC",
+                   (id_wbs,))
+    rows = cursor.fetchall()
+    lama = [row[0] for row in rows[max_samples:]]
+    if lama:
+        cursor.executemany("DELETE FROM wbs_face_sample WHERE id_sample = %s", [(i,) for i in lama])
+
+    samples, ok = decode_many([row[1] for row in rows[:max_samples]], allow_pickle=allow_pickle)
+    samples = samples[ok].reshape(-1, ENCODING_DIM)
+    if not len(samples):
+        return samples, None
+    centroid = samples.mean(axis=0)
+    cursor.execute("UPDATE wbs SET face_encoding = %s WHERE id_wbs = %s", (encode_encoding(centroid), id_wbs))
+    return samples, centroid
@@ -0,0 +1,246 @@
+import secrets
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import cv2
+import numpy as np
+
+from face_quality import face_patch, sharpness
+
+# Tracking wajah antar-frame untuk mode kiosk kontinu. Deteksi HOG penuh hanya
+# tiap ``detect_every`` frame; di antaranya kotak wajah diikuti dengan
+# template matching (grayscale, di jendela kecil sekitar posisi terakhir).
+# Encoding 128-d hanya untuk track baru, atau jika kualitas track naik cukup
+# jauh dari encoding sebelumnya. Satu track = satu keputusan absensi.
+
+
+def iou(a, b):
+    """Intersection-over-union dua kotak ``(top, right, bottom, left)``."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    if not inter:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return inter / float(area_a + area_b - inter)
+
+
+def box_quality(gray, box):
+    """Skor kualitas wajah: sisi pendek kotak dikali ketajaman (``face_quality.sharpness``, jenuh di 100)."""
+    top, right, bottom, left = box
+    patch = face_patch(gray, box)
+    if patch.size == 0:
+        return 0.0
+    return min(bottom - top, right - left) * min(1.0, sharpness(patch) / 100.0)
+
+
+class Track:
+    def __init__(self, track_id, box, gray):
+        self.id = track_id
+        self.box = box
+        self.template = None
+        self.missed = 0
+        self.frames = 0
+        self.encodes = 0
+        self.best_quality = 0.0   # kualitas saat encoding terakhir
+        self.quality = 0.0
+        self.result = None        # keputusan absensi (dict), None = belum diputuskan
+        self.hint = None          # kode alasan face_quality jika encoding ditunda
+        self.refresh(box, gray)
+
+    def refresh(self, box, gray):
+        top, right, bottom, left = box
+        self.box = box
+        self.template = gray[top:bottom, left:right].copy()
+        self.quality = box_quality(gray, box)
+
+    def to_dict(self):
+        top, right, bottom, left = self.box
+        data = {'id': self.id, 'box': [top, right, bottom, left], 'missed': self.missed,
+                'encodes': self.encodes}
+        if self.result is not None:
+            data['result'] = self.result
+        elif self.hint is not None:
+            data['hint'] = self.hint
+        return data
+
+
+class FaceTracker:
+    """Status tracking satu kiosk. Tidak thread-safe; ``KioskSession`` memegang lock-nya."""
+
+    def __init__(self, detect_every=5, iou_threshold=0.3, max_missed=5, search_margin=0.5,
+                 min_track_score=0.5, quality_gain=1.25, max_encodes=3):
+        self.detect_every = detect_every
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.search_margin = search_margin
+        self.min_track_score = min_track_score
+        self.quality_gain = quality_gain
+        self.max_encodes = max_encodes
+        self.tracks = []
+        self._next_id = 1
+        self._since_detect = 0
+        self.stats = {'frames': 0, 'detect': 0, 'track': 0, 'encode': 0, 'tracks': 0, 'rejected': 0}
+
+    def _new_track(self, box, gray):
+        track = Track(self._next_id, box, gray)
+        self._next_id += 1
+        self.stats['tracks'] += 1
+        return track
+
+    def _associate(self, boxes, gray):
+        """Pasangkan hasil deteksi dengan track lama secara greedy berdasarkan IoU."""
+        pairs = sorted(((iou(t.box, b), ti, bi) for ti, t in enumerate(self.tracks) for bi, b in enumerate(boxes)),
+                       reverse=True)
+        used_tracks, used_boxes = set(), set()
+        for score, ti, bi in pairs:
+            if score < self.iou_threshold:
+                break
+            if ti in used_tracks or bi in used_boxes:
+                continue
+            used_tracks.add(ti)
+            used_boxes.add(bi)
+            self.tracks[ti].refresh(tuple(boxes[bi]), gray)
+            self.tracks[ti].missed = 0
+        for ti, track in enumerate(self.tracks):
+            if ti not in used_tracks:
+                track.missed += 1
+        for bi, box in enumerate(boxes):
+            if bi not in used_boxes:
+                self.tracks.append(self._new_track(tuple(box), gray))
+
+    def _follow(self, gray):
+        """Geser tiap track ke posisi template paling cocok di sekitar kotak lamanya."""
+        h, w = gray.shape[:2]
+        for track in self.tracks:
+            top, right, bottom, left = track.box
+            th, tw = track.template.shape[:2]
+            if th < 8 or tw < 8:
+                track.missed += 1
+                continue
+            my, mx = int(th * self.search_margin), int(tw * self.search_margin)
+            y0, x0 = max(0, top - my), max(0, left - mx)
+            y1, x1 = min(h, bottom + my), min(w, right + mx)
+            window = gray[y0:y1, x0:x1]
+            if window.shape[0] < th or window.shape[1] < tw:
+                track.missed += 1
+                continue
+            scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+            if score < self.min_track_score:
+                track.missed += 1
+                continue
+            track.refresh((y0 + dy, x0 + dx + tw, y0 + dy + th, x0 + dx), gray)
+            track.missed = 0
+
+    def _wants_encoding(self, track):
+        if track.result is not None or track.missed or track.encodes >= self.max_encodes:
+            return False
+        return track.encodes == 0 or track.quality >= track.best_quality * self.quality_gain
+
+    def update(self, rgb, detect, encode):
+        """Proses satu frame RGB.
+
+        ``detect(rgb)`` mengembalikan kotak wajah, ``encode(rgb, boxes)``
+        ``(encodings, reasons)`` untuk kotak-kotak itu (sekali panggil, termasuk
+        gerbang kualitas; encoding None + kode alasan = ditolak). Mengembalikan
+        ``[(track, encoding), ...]`` untuk track yang di-encode di frame ini;
+        keputusan (cocok/tidak dikenal) diisi pemanggil ke ``track.result``.
+        """
+        gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        self.stats['frames'] += 1
+        if not self.tracks or self._since_detect + 1 >= self.detect_every:
+            self._associate(detect(rgb), gray)
+            self._since_detect = 0
+            self.stats['detect'] += 1
+        else:
+            self._follow(gray)
+            self._since_detect += 1
+            self.stats['track'] += 1
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+        for track in self.tracks:
+            track.frames += 1
+
+        pending = [t for t in self.tracks if self._wants_encoding(t)]
+        if not pending:
+            return []
+        encodings, reasons = encode(rgb, [t.box for t in pending])
+        self.stats['encode'] += 1
+        hasil = []
+        for track, encoding, reason in zip(pending, encodings, reasons):
+            # Ditolak gerbang kualitas: tidak dihitung sebagai percobaan encoding
+            track.hint = reason
+            if encoding is None:
+                self.stats['rejected'] += 1
+                continue
+            track.encodes += 1
+            track.best_quality = track.quality
+            hasil.append((track, np.asarray(encoding, dtype=np.float64)))
+        return hasil
+
+
+class KioskSession:
+    def __init__(self, session_id, fields, tracker):
+        self.id = session_id
+        self.fields = fields
+        self.tracker = tracker
+        self.lock = Lock()
+        self.last_seen = time.monotonic()
+
+
+class KioskSessions:
+    """Sesi kiosk aktif di proses ini. Sesi yang tidak mengirim frame selama
+    ``ttl`` detik dibuang; jika melebihi ``maxsize``, sesi paling lama diam dibuang.
+    """
+
+    def __init__(self, ttl=60.0, maxsize=64, **tracker_options):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.tracker_options = tracker_options
+        self._sessions = OrderedDict()
+        self._lock = Lock()
+        self.stats = {'created': 0, 'expired': 0, 'evicted': 0, 'closed': 0}
+
+    def _expire(self, now):
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_seen <= self.ttl:
+                break
+            del self._sessions[session.id]
+            self.stats['expired'] += 1
+
+    def create(self, fields):
+        session = KioskSession(secrets.token_urlsafe(12), fields, FaceTracker(**self.tracker_options))
+        with self._lock:
+            self._expire(session.last_seen)
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.maxsize:
+                self._sessions.popitem(last=False)
+                self.stats['evicted'] += 1
+            self.stats['created'] += 1
+        return session
+
+    def get(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_seen = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def close(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self.stats['closed'] += 1
+            return session
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self.stats)
+            data['active'] = len(self._sessions)
+        return data
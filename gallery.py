@@ -0,0 +1,338 @@
+import numpy as np
+
+ENCODING_DIM = 128
+
+
+class GalleryMatcher:
+    """Galeri wajah WBS dalam satu matriks (N x 128) untuk pencocokan vektor.
+
+    Objek ini tidak pernah diubah setelah dibuat; pemuatan ulang membuat
+    objek baru lalu ditukar di bawah ``data_lock``. Jika ``index`` diberikan
+    (lihat ``face_index``), hanya kandidat dari index yang dihitung jaraknya.
+
+    Perubahan kecil (enroll ulang, hapus) lewat ``with_updates`` tanpa
+    membangun ulang index: baris yang berubah sejak index dibangun disimpan
+    di ``pending_rows`` dan selalu ikut dihitung, baris yang dihapus diberi
+    norma tak hingga sehingga tidak pernah cocok.
+    """
+
+    def __init__(self, encodings, ids, names, dtype=np.float64, index=None, samples=None):
+        matrix = np.ascontiguousarray(encodings, dtype=dtype)
+        if matrix.size == 0:
+            matrix = matrix.reshape(0, ENCODING_DIM)
+        if matrix.ndim != 2 or matrix.shape[1] != ENCODING_DIM:
+            raise ValueError(f"Bentuk matriks encoding tidak valid: {matrix.shape}")
+        if not (len(ids) == len(names) == matrix.shape[0]):
+            raise ValueError("Jumlah encoding, id_wbs, dan nama tidak sama.")
+
+        self.matrix = matrix
+        self.sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+        self.ids = list(ids)
+        self.names = list(names)
+        self.index = index
+        self.samples = samples
+        self.row_of = {id_wbs: i for i, id_wbs in enumerate(self.ids)}
+        self.pending_rows = np.empty(0, dtype=np.int64)
+        self.removed = 0
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty((0, ENCODING_DIM)), [], [])
+
+    def __len__(self):
+        return self.matrix.shape[0] - self.removed
+
+    def with_updates(self, upserts=(), removals=(), sample_upserts=None):
+        """Salinan galeri dengan perubahan diterapkan (copy-on-write).
+
+        ``upserts`` berisi tuple ``(id_wbs, nama, encoding)``; ``removals``
+        berisi ``id_wbs`` yang encoding-nya sudah dihapus. ``sample_upserts``
+        (``{id_wbs: matriks sampel}``) mengganti sampel orang tersebut di
+        ``samples``. Objek lama tidak berubah sehingga request yang sedang
+        berjalan tetap aman.
+        """
+        # Satu baris per id_wbs; jika id yang sama muncul lagi, yang terakhir menang
+        upserts = list({u[0]: u for u in upserts}.values())
+        baru = [u for u in upserts if u[0] not in self.row_of]
+        n_lama = self.matrix.shape[0]
+
+        matrix = np.empty((n_lama + len(baru), ENCODING_DIM), dtype=self.matrix.dtype)
+        matrix[:n_lama] = self.matrix
+        sq_norms = np.empty(matrix.shape[0])
+        sq_norms[:n_lama] = self.sq_norms
+        ids = self.ids + [u[0] for u in baru]
+        names = list(self.names) + [u[1] for u in baru]
+        row_of = dict(self.row_of)
+        removed = self.removed
+        changed = []
+
+        for id_wbs, nama, enc in upserts:
+            if id_wbs in row_of:
+                i = row_of[id_wbs]
+                if not np.isfinite(sq_norms[i]):
+                    removed -= 1
+            else:
+                i = len(row_of)
+                row_of[id_wbs] = i
+            matrix[i] = enc
+            sq_norms[i] = float(matrix[i] @ matrix[i])
+            names[i] = nama
+            changed.append(i)
+
+        for id_wbs in removals:
+            i = row_of.get(id_wbs)
+            if i is not None and np.isfinite(sq_norms[i]):
+                sq_norms[i] = np.inf
+                removed += 1
+
+        hasil = GalleryMatcher.__new__(GalleryMatcher)
+        hasil.matrix = matrix
+        hasil.sq_norms = sq_norms
+        hasil.ids = ids
+        hasil.names = names
+        hasil.index = self.index
+        hasil.samples = self.samples
+        if sample_upserts or (self.samples is not None and removals):
+            hasil.samples = (self.samples or SampleStore.empty()).with_updates(sample_upserts, removals)
+        hasil.row_of = row_of
+        hasil.pending_rows = np.union1d(self.pending_rows, np.array(changed, dtype=np.int64))
+        hasil.removed = removed
+        return hasil
+
+    def compact(self, index=None):
+        """Galeri baru tanpa baris terhapus, dengan ``index`` yang dibangun ulang."""
+        keep = np.flatnonzero(np.isfinite(self.sq_norms))
+        return GalleryMatcher(self.matrix[keep], [self.ids[i] for i in keep],
+                              [self.names[i] for i in keep], dtype=self.matrix.dtype, index=index,
+                              samples=self.samples)
+
+    def subset(self, ids, index=None):
+        """Galeri baru berisi hanya WBS ``ids`` yang aktif (partisi lokasi/kegiatan).
+
+        Baris disalin ke matriks sendiri sehingga pencocokan hanya sebanding
+        dengan jumlah anggota partisi; sampel ikut disaring.
+        """
+        rows = sorted(self.row_of[i] for i in set(ids) if i in self.row_of)
+        rows = np.array([r for r in rows if np.isfinite(self.sq_norms[r])], dtype=np.int64)
+        samples = None
+        if self.samples is not None:
+            samples = self.samples.subset([self.ids[r] for r in rows])
+        return GalleryMatcher(self.matrix[rows], [self.ids[r] for r in rows], [self.names[r] for r in rows],
+                              dtype=self.matrix.dtype, index=index, samples=samples)
+
+    @property
+    def nbytes(self):
+        total = self.matrix.nbytes + self.sq_norms.nbytes
+        if self.samples is not None:
+            total += self.samples.matrix.nbytes + self.samples.sq_norms.nbytes
+        return total
+
+    def info(self, index):
+        return {'id_wbs': self.ids[index], 'nama': self.names[index]}
+
+    def _sq_distances(self, q, rows=None):
+        # |g - q|^2 = |g|^2 - 2 g.q + |q|^2, satu kali lewat seluruh galeri
+        if rows is None:
+            d2 = self.sq_norms - 2.0 * (self.matrix @ q) + float(q @ q)
+        else:
+            d2 = self.sq_norms[rows] - 2.0 * (self.matrix[rows] @ q) + float(q @ q)
+        np.maximum(d2, 0.0, out=d2)
+        return d2
+
+    def match(self, query, tolerance=0.5, top_k=1):
+        """Cari ``top_k`` WBS terdekat dalam batas ``tolerance`` (jarak euclid).
+
+        Hasil berupa list dict ``{'index', 'id_wbs', 'nama', 'distance'}``
+        terurut dari jarak terkecil; list kosong jika tidak ada yang cocok.
+        """
+        if len(self) == 0:
+            return []
+        q = np.asarray(query, dtype=self.matrix.dtype).reshape(ENCODING_DIM)
+
+        rows = None
+        if self.index is not None and self.index.backend != 'brute':
+            rows = self.index.candidates(q, top_k)
+            if len(self.pending_rows):
+                rows = np.union1d(rows, self.pending_rows)
+            if len(rows) == 0:
+                return []
+        d2 = self._sq_distances(q, rows)
+        if rows is None:
+            rows = np.arange(len(d2))
+
+        n = len(d2)
+        k = min(top_k, n)
+        if k < n:
+            best = np.argpartition(d2, k - 1)[:k]
+        else:
+            best = np.arange(n)
+        best = best[np.argsort(d2[best])]
+
+        limit = tolerance * tolerance
+        hasil = []
+        for j in best:
+            if d2[j] > limit:
+                break
+            i = int(rows[j])
+            hasil.append({
+                'index': i,
+                'id_wbs': self.ids[i],
+                'nama': self.names[i],
+                'distance': float(np.sqrt(d2[j])),
+            })
+        return hasil
+
+    def match_templates(self, query, tolerance=0.5, top_k=1, shortlist=5, slack=0.1):
+        """Pencocokan dua tahap untuk WBS dengan beberapa sampel wajah.
+
+        Tahap 1: ``shortlist`` centroid terdekat (baris galeri) dalam batas
+        ``tolerance + slack``. Tahap 2: tiap kandidat dinilai ulang dengan
+        jarak terkecil ke sampelnya sendiri (best-of-k), termasuk centroid.
+        Tanpa ``samples`` hasilnya sama dengan ``match``.
+        """
+        if self.samples is None or not len(self.samples):
+            return self.match(query, tolerance=tolerance, top_k=top_k)
+        kandidat = self.match(query, tolerance=tolerance + slack, top_k=max(top_k, shortlist))
+        if not kandidat:
+            return []
+        q = np.asarray(query, dtype=self.samples.matrix.dtype).reshape(ENCODING_DIM)
+        best = np.sqrt(self.samples.best_sq_distances(q, [k['id_wbs'] for k in kandidat]))
+        hasil = []
+        for k, d in zip(kandidat, best):
+            k['centroid_distance'] = k['distance']
+            k['distance'] = float(min(d, k['distance']))
+            if k['distance'] <= tolerance:
+                hasil.append(k)
+        hasil.sort(key=lambda k: k['distance'])
+        return hasil[:top_k]
+
+    def match_many(self, queries, tolerance=0.5, shortlist=5, slack=0.1):
+        """Cocokkan beberapa wajah satu frame sekaligus; tiap WBS paling banyak satu wajah.
+
+        Jarak semua wajah ke galeri dihitung dalam satu perkalian matriks
+        (F x N). ``shortlist`` baris terdekat per wajah menjadi kandidat; jika
+        ada ``samples`` kandidat dalam ``tolerance + slack`` dinilai ulang
+        best-of-k seperti ``match_templates``. Pasangan wajah-WBS lalu dipilih
+        dari jarak terkecil, jadi wajah yang kandidat pertamanya sudah dipakai
+        wajah lain yang lebih mirip beralih ke kandidat berikutnya.
+
+        Mengembalikan list sepanjang ``queries``: dict seperti ``match`` atau None.
+        """
+        Q = np.asarray(queries, dtype=self.matrix.dtype).reshape(-1, ENCODING_DIM)
+        hasil = [None] * Q.shape[0]
+        if len(self) == 0 or not len(Q):
+            return hasil
+
+        rows = None
+        if self.index is not None and self.index.backend != 'brute':
+            parts = [self.index.candidates(q, shortlist) for q in Q] + [self.pending_rows]
+            rows = np.unique(np.concatenate(parts).astype(np.int64))
+            if len(rows) == 0:
+                return hasil
+        qq = np.einsum('ij,ij->i', Q, Q)[:, None]
+        if rows is None:
+            d2 = self.sq_norms[None, :] - 2.0 * (Q @ self.matrix.T) + qq
+            rows = np.arange(self.matrix.shape[0])
+        else:
+            d2 = self.sq_norms[rows][None, :] - 2.0 * (Q @ self.matrix[rows].T) + qq
+        np.maximum(d2, 0.0, out=d2)
+
+        pakai_sampel = self.samples is not None and len(self.samples) > 0
+        limit = tolerance + slack if pakai_sampel else tolerance
+        k = min(shortlist, d2.shape[1])
+        pairs = []
+        for f in range(len(Q)):
+            best = np.argpartition(d2[f], k - 1)[:k] if k < d2.shape[1] else np.arange(d2.shape[1])
+            best = best[d2[f, best] <= limit * limit]
+            if not len(best):
+                continue
+            centroid = np.sqrt(d2[f, best])
+            kandidat = rows[best]
+            jarak = centroid
+            if pakai_sampel:
+                q = Q[f].astype(self.samples.matrix.dtype)
+                sampel = np.sqrt(self.samples.best_sq_distances(q, [self.ids[i] for i in kandidat]))
+                jarak = np.minimum(sampel, centroid)
+            for i, d, c in zip(kandidat, jarak, centroid):
+                if d <= tolerance:
+                    pairs.append((float(d), f, int(i), float(c)))
+
+        pairs.sort()
+        dipakai = set()
+        for d, f, i, c in pairs:
+            if hasil[f] is not None or i in dipakai:
+                continue
+            dipakai.add(i)
+            hasil[f] = {'index': i, 'id_wbs': self.ids[i], 'nama': self.names[i], 'distance': d}
+            if pakai_sampel:
+                hasil[f]['centroid_distance'] = c
+        return hasil
+
+
+class SampleStore:
+    """Beberapa sampel encoding per WBS, untuk re-rank best-of-k.
+
+    Semua sampel ada dalam satu matriks yang dikelompokkan per ``id_wbs``
+    (sampel satu orang bersebelahan di memori), jadi re-rank beberapa
+    kandidat hanya membaca beberapa blok kecil yang berurutan. Seperti
+    ``GalleryMatcher``, objek ini tidak diubah setelah dibuat.
+    """
+
+    def __init__(self, encodings, ids, dtype=np.float32):
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        matrix = np.asarray(encodings, dtype=dtype).reshape(-1, ENCODING_DIM)
+        if len(ids) != matrix.shape[0]:
+            raise ValueError("Jumlah sampel dan id_wbs tidak sama.")
+        if len(ids) > 1 and np.any(ids[1:] < ids[:-1]):
+            order = np.argsort(ids, kind='stable')
+            ids, matrix = ids[order], matrix[order]
+        # Sudah terurut (mis. dari snapshot memmap): dipakai tanpa salinan
+        self.ids = ids
+        self.matrix = np.ascontiguousarray(matrix)
+        self.sq_norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+        uniq, starts, counts = np.unique(self.ids, return_index=True, return_counts=True)
+        self.span = {int(u): (int(a), int(a + c)) for u, a, c in zip(uniq, starts, counts)}
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty((0, ENCODING_DIM)), [])
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def count(self, id_wbs):
+        a, b = self.span.get(id_wbs, (0, 0))
+        return b - a
+
+    def of(self, id_wbs):
+        a, b = self.span.get(id_wbs, (0, 0))
+        return self.matrix[a:b]
+
+    def subset(self, ids):
+        """Salinan berisi sampel ``ids`` saja (tetap terurut per id_wbs)."""
+        keep = np.isin(self.ids, np.asarray(list(ids), dtype=np.int64))
+        return SampleStore(self.matrix[keep], self.ids[keep], dtype=self.matrix.dtype)
+
+    def with_updates(self, upserts=None, removals=()):
+        """Salinan dengan sampel ``upserts`` (``{id_wbs: matriks}``) menggantikan sampel lama."""
+        upserts = upserts or {}
+        ganti = np.array(list(set(upserts) | set(removals)), dtype=np.int64)
+        keep = np.isin(self.ids, ganti, invert=True)
+        parts = [self.matrix[keep]]
+        ids = [self.ids[keep]]
+        for id_wbs, samples in upserts.items():
+            samples = np.asarray(samples, dtype=self.matrix.dtype).reshape(-1, ENCODING_DIM)
+            parts.append(samples)
+            ids.append(np.full(len(samples), id_wbs, dtype=np.int64))
+        return SampleStore(np.concatenate(parts), np.concatenate(ids), dtype=self.matrix.dtype)
+
+    def best_sq_distances(self, q, ids):
+        """Jarak kuadrat terkecil dari ``q`` ke sampel tiap id (inf jika tidak punya sampel)."""
+        qq = float(q @ q)
+        out = np.full(len(ids), np.inf)
+        for j, id_wbs in enumerate(ids):
+            a, b = self.span.get(id_wbs, (0, 0))
+            if b > a:
+                d2 = self.sq_norms[a:b] - 2.0 * (self.matrix[a:b] @ q) + qq
+                out[j] = max(float(d2.min()), 0.0)
+        return out
@@ -0,0 +1,123 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from face_index import build_index
+
+# Partisi galeri per lokasi (dan daftar peserta kegiatan). Sumber tetap satu
+# galeri penuh (snapshot, poll, enroll tidak berubah); partisi adalah salinan
+# baris anggota roster yang dibuat saat pertama dipakai, jadi setiap scan
+# hanya dihitung terhadap roster lokasinya. Partisi yang lama tidak dipakai
+# dibuang jika total ukurannya melebihi ``max_bytes`` atau jumlahnya melebihi
+# ``max_partitions`` (partisi galeri penuh/roster kosong berukuran 0 byte).
+
+
+class _Partition:
+    __slots__ = ('ids', 'source', 'matcher', 'loaded')
+
+    def __init__(self, ids, source, matcher, loaded):
+        self.ids = ids          # anggota partisi (set id_wbs), None = tanpa batasan (galeri penuh)
+        self.source = source    # galeri penuh yang dipakai saat partisi dibuat
+        self.matcher = matcher
+        self.loaded = loaded    # waktu daftar anggota dibaca dari database
+
+    @property
+    def nbytes(self):
+        return 0 if self.ids is None else self.matcher.nbytes
+
+
+class GalleryShards:
+    """Cache LRU partisi galeri.
+
+    ``load_ids(key)`` membaca anggota partisi dari database dan mengembalikan
+    set ``id_wbs``, atau None jika key tersebut tidak punya batasan (galeri
+    penuh dipakai). Anggota dibaca ulang setelah ``ttl`` detik; jika galeri
+    penuh berganti (enroll/poll), matriks partisi dibangun ulang dari anggota
+    yang sudah ada tanpa query.
+    """
+
+    name = 'gallery_shards'
+
+    def __init__(self, load_ids, ttl=300.0, max_bytes=256 * 1024 * 1024, max_partitions=256, index_min=20000,
+                 index_backend='brute', index_params=None):
+        self.load_ids = load_ids
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_partitions = max_partitions
+        self.index_min = index_min
+        self.index_backend = index_backend
+        self.index_params = index_params or {}
+        self._parts = OrderedDict()
+        self._key_locks = {}
+        self._lock = Lock()
+        self.stats = {'hits': 0, 'loads': 0, 'rebuilds': 0, 'evictions': 0, 'invalidations': 0}
+
+    def _build(self, ids, gallery):
+        if ids is None:
+            return gallery
+        matcher = gallery.subset(ids)
+        # Roster kecil cukup dihitung penuh; index hanya untuk partisi besar
+        if self.index_backend != 'brute' and len(matcher) >= self.index_min:
+            matcher.index = build_index(self.index_backend, matcher.matrix, **self.index_params)
+        return matcher
+
+    def _fresh(self, part, gallery, now):
+        return part is not None and part.source is gallery and now - part.loaded < self.ttl
+
+    def get(self, key, gallery):
+        """Galeri untuk ``key``, dibuat dari ``gallery`` (galeri penuh saat ini) jika perlu."""
+        now = time.monotonic()
+        with self._lock:
+            part = self._parts.get(key)
+            if part is not None:
+                self._parts.move_to_end(key)
+            if self._fresh(part, gallery, now):
+                self.stats['hits'] += 1
+                return part.matcher
+            key_lock = self._key_locks.setdefault(key, Lock())
+
+        # Satu thread saja yang memuat partisi yang sama; yang lain menunggu hasilnya
+        with key_lock:
+            with self._lock:
+                part = self._parts.get(key)
+            if self._fresh(part, gallery, now):
+                with self._lock:
+                    self.stats['hits'] += 1
+                return part.matcher
+            if part is None or now - part.loaded >= self.ttl:
+                ids, loaded, stat = self.load_ids(key), time.monotonic(), 'loads'
+            else:
+                ids, loaded, stat = part.ids, part.loaded, 'rebuilds'
+            part = _Partition(ids, gallery, self._build(ids, gallery), loaded)
+            with self._lock:
+                self.stats[stat] += 1
+                self._parts[key] = part
+                self._parts.move_to_end(key)
+                self._evict()
+        return part.matcher
+
+    def _evict(self):
+        total = sum(p.nbytes for p in self._parts.values())
+        while (total > self.max_bytes or len(self._parts) > self.max_partitions) and len(self._parts) > 1:
+            key, part = self._parts.popitem(last=False)
+            self._key_locks.pop(key, None)
+            total -= part.nbytes
+            self.stats['evictions'] += 1
+
+    def invalidate(self, key=None):
+        """Buang satu partisi, atau semuanya (mis. setelah roster lokasi/peserta berubah)."""
+        with self._lock:
+            if key is None:
+                self._parts.clear()
+                self._key_locks.clear()
+            else:
+                self._parts.pop(key, None)
+            self.stats['invalidations'] += 1
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self.stats)
+            data['size'] = len(self._parts)
+            data['bytes'] = sum(p.nbytes for p in self._parts.values())
+            data['rows'] = sum(len(p.matcher) for p in self._parts.values() if p.ids is not None)
+        return data
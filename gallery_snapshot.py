@@ -0,0 +1,104 @@
+import glob
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from gallery import GalleryMatcher, SampleStore
+
+# Snapshot galeri di disk: matriks encoding (.npy, dibuka dengan memmap)
+# plus metadata JSON (versi format, stempel database, id_wbs, nama), dan
+# sampel per WBS (face_samples) jika ada.
+# File matriks diberi nomor urut dan tidak pernah ditimpa, sehingga worker
+# yang masih me-memmap versi lama tidak terganggu (aman juga di Windows).
+SNAPSHOT_FORMAT = 1
+META_NAME = 'gallery_snapshot.json'
+
+
+def _stamp_str(stamp):
+    return stamp.isoformat() if isinstance(stamp, datetime) else str(stamp)
+
+
+def write_snapshot(folder, gallery, stamp, jumlah):
+    """Tulis snapshot galeri; ``stamp``/``jumlah`` adalah versi database saat dimuat."""
+    os.makedirs(folder, exist_ok=True)
+    meta_path = os.path.join(folder, META_NAME)
+    seq = 1
+    lama = _read_meta(meta_path)
+    if lama:
+        seq = lama.get('seq', 0) + 1
+
+    matrix_name = f"gallery_{seq:06d}_{os.getpid()}.npy"
+    np.save(os.path.join(folder, matrix_name), np.ascontiguousarray(gallery.matrix, dtype=np.float32))
+
+    samples_name = None
+    if gallery.samples is not None:
+        samples_name = f"samples_{seq:06d}_{os.getpid()}.npy"
+        np.save(os.path.join(folder, samples_name), np.ascontiguousarray(gallery.samples.matrix, dtype=np.float32))
+
+    meta = {
+        'format': SNAPSHOT_FORMAT,
+        'seq': seq,
+        'stamp': _stamp_str(stamp),
+        'jumlah': int(jumlah),
+        'matrix': matrix_name,
+        'ids': list(gallery.ids),
+        'names': list(gallery.names),
+        'samples': samples_name,
+        'sample_ids': gallery.samples.ids.tolist() if samples_name else None,
+    }
+    tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, meta_path)
+    _cleanup(folder)
+
+
+def _file_seq(path):
+    try:
+        return int(os.path.basename(path).split('_')[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _cleanup(folder):
+    # Hapus matriks yang lebih lama dari snapshot aktif saat ini. File dengan seq
+    # yang sama atau lebih baru bisa milik worker lain yang sedang menulis, jadi
+    # dibiarkan. Gagal menghapus (masih dibuka worker lain di Windows) tidak masalah.
+    meta = _read_meta(os.path.join(folder, META_NAME))
+    if not meta:
+        return
+    for path in glob.glob(os.path.join(folder, 'gallery_*.npy')) + glob.glob(os.path.join(folder, 'samples_*.npy')):
+        seq = _file_seq(path)
+        if seq is not None and seq < meta.get('seq', 0):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_snapshot(folder, stamp, jumlah):
+    """Buka snapshot via memmap jika versinya sama dengan database; selain itu ``None``."""
+    meta = _read_meta(os.path.join(folder, META_NAME))
+    if not meta or meta.get('format') != SNAPSHOT_FORMAT:
+        return None
+    if meta['stamp'] != _stamp_str(stamp) or meta['jumlah'] != int(jumlah):
+        return None
+    try:
+        matrix = np.load(os.path.join(folder, meta['matrix']), mmap_mode='r')
+        samples = None
+        if meta.get('samples'):
+            samples = SampleStore(np.load(os.path.join(folder, meta['samples']), mmap_mode='r'), meta['sample_ids'])
+        return GalleryMatcher(matrix, meta['ids'], meta['names'], dtype=np.float32, samples=samples)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Snapshot galeri tidak bisa dibuka: {e}")
+        return None
@@ -0,0 +1,160 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from multiprocessing import shared_memory
+from threading import BoundedSemaphore, Lock
+
+import numpy as np
+
+
+class InferenceBusy(Exception):
+    """Antrean inferensi penuh; klien diminta mencoba lagi setelah ``retry_after`` detik."""
+
+    def __init__(self, retry_after=1):
+        super().__init__("Server sedang sibuk memproses wajah lain.")
+        self.retry_after = retry_after
+
+
+# --- SISI WORKER ---
+def _init_worker():
+    # Muat model dlib sekali per worker, lalu pemanasan kecil agar request pertama tidak lambat
+    from face_pipeline import detect_and_encode
+    detect_and_encode(np.zeros((64, 64, 3), dtype=np.uint8))
+
+
+def _worker_call(op, shm_name, shape, kwargs):
+    import face_pipeline
+    # Worker berbagi resource tracker dengan server, jadi attach biasa aman;
+    # blok memori tetap di-unlink oleh server setelah hasil diterima.
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        rgb = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        timings = {}
+        t0 = time.perf_counter()
+        if op == 'detect_and_encode':
+            face_locations, encodings = face_pipeline.detect_and_encode(rgb, timings=timings, **kwargs)
+            result = face_locations, [np.asarray(e, dtype=np.float64) for e in encodings]
+        elif op == 'group':
+            result = face_pipeline.detect_and_encode_group(rgb, timings=timings, **kwargs)
+        elif op == 'detect':
+            result = face_pipeline.detect_faces(rgb, **kwargs)
+            timings['detect'] = time.perf_counter() - t0
+        else:
+            result = face_pipeline.check_and_encode(rgb, timings=timings, **kwargs)
+        del rgb
+        return result, timings
+    finally:
+        shm.close()
+
+
+# --- SISI SERVER ---
+class InferencePool:
+    """Pool proses untuk deteksi + encoding wajah.
+
+    Gambar dikirim lewat shared memory (bukan di-pickle). Jumlah request
+    yang boleh antre dibatasi ``max_pending``; jika penuh, ``detect_and_encode``
+    langsung melempar ``InferenceBusy`` supaya route bisa membalas 503.
+    """
+
+    def __init__(self, workers=None, max_pending=None, timeout=30.0, retry_after=1):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_pending = max_pending or self.workers * 2
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._slots = BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = Lock()
+        self.stats = {'submitted': 0, 'rejected': 0, 'timeouts': 0}
+
+    def _ensure_started(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # 'spawn' sama di Windows dan Linux, dan aman dipakai dari proses yang punya thread
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                    )
+        return self._executor
+
+    def start(self):
+        """Nyalakan worker sekarang (preload model) alih-alih saat request pertama."""
+        self._ensure_started()
+
+    def _call(self, op, rgb, timings, kwargs):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats['rejected'] += 1
+            raise InferenceBusy(self.retry_after)
+        shm = None
+        future = None
+        try:
+            t0 = time.perf_counter()
+            executor = self._ensure_started()
+            rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+            shm = shared_memory.SharedMemory(create=True, size=rgb.nbytes)
+            np.ndarray(rgb.shape, dtype=np.uint8, buffer=shm.buf)[:] = rgb
+            future = executor.submit(_worker_call, op, shm.name, rgb.shape, kwargs)
+            # Slot dan shared memory baru dilepas saat worker benar-benar selesai:
+            # future yang timeout tetap berjalan di worker (cancel tidak menghentikannya),
+            # jadi max_pending tetap membatasi pekerjaan yang sedang jalan
+            future.add_done_callback(lambda _: self._release(shm))
+        except BaseException:
+            if future is None:
+                self._release(shm)
+            raise
+        with self._lock:
+            self.stats['submitted'] += 1
+        try:
+            result, worker_timings = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self.stats['timeouts'] += 1
+            future.cancel()
+            raise
+        if timings is not None:
+            timings.update(worker_timings)
+            timings['pool_wait'] = max(0.0, time.perf_counter() - t0 - sum(worker_timings.values()))
+        return result
+
+    def _release(self, shm):
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+        self._slots.release()
+
+    def detect_and_encode(self, rgb, timings=None, **options):
+        """Sama seperti ``face_pipeline.detect_and_encode``, dijalankan di worker.
+
+        ``timings`` (dict) diisi ``detect``/``encode`` dari worker, ditambah
+        ``pool_wait``: sisa waktu antre + transfer shared memory.
+        """
+        return self._call('detect_and_encode', rgb, timings, options)
+
+    def detect_and_encode_group(self, rgb, timings=None, **options):
+        """``face_pipeline.detect_and_encode_group`` (semua wajah, satu encoding batch) di worker."""
+        return self._call('group', rgb, timings, options)
+
+    def detect_faces(self, rgb, timings=None, **options):
+        """``face_pipeline.detect_faces`` di worker (tanpa encoding)."""
+        return self._call('detect', rgb, timings, options)
+
+    def check_and_encode(self, rgb, locations, quality=None, timings=None):
+        """``face_pipeline.check_and_encode`` (gerbang kualitas + encoding) di worker."""
+        return self._call('encode', rgb, timings, {'locations': locations, 'quality': quality})
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self.stats)
+        data['workers'] = self.workers
+        data['max_pending'] = self.max_pending
+        data['in_flight'] = self.max_pending - self._slots._value
+        return data
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
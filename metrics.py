@@ -0,0 +1,176 @@
+import bisect
+import math
+from collections import deque
+from threading import Lock
+
+# Metrik dalam proses untuk /metrics (format teks Prometheus), tanpa dependensi
+# tambahan. Histogram memakai bucket tetap (p50/p95/p99 lintas worker dihitung
+# Prometheus dengan histogram_quantile); selain itu setiap seri menyimpan
+# jendela observasi terakhir sehingga /metrics juga menampilkan kuantil
+# langsung per proses.
+
+# Detik; deteksi HOG di CPU lambat biasanya 50 ms - 2 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+WINDOW_SIZE = 1024
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and math.isnan(value):
+        return 'NaN'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def quantile(sorted_values, q):
+    """Kuantil (nearest-rank) dari list yang sudah terurut; NaN jika kosong."""
+    if not sorted_values:
+        return math.nan
+    idx = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = Lock()
+
+    def inc(self, *labels, value=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def value(self, *labels):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Histogram berlabel + jendela ``window`` observasi terakhir per seri."""
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, window=WINDOW_SIZE):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.window = window
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, *labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {
+                    'counts': [0] * len(self.buckets),
+                    'sum': 0.0,
+                    'count': 0,
+                    'recent': deque(maxlen=self.window),
+                }
+            series['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+            series['recent'].append(value)
+
+    def quantiles(self, *labels):
+        """``{q: detik}`` dari jendela observasi terakhir seri ``labels``."""
+        with self._lock:
+            series = self._series.get(labels)
+            recent = sorted(series['recent']) if series else []
+        return {q: quantile(recent, q) for q in QUANTILES}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        recent_lines = [f"# HELP {self.name}_recent {self.help} ({self.window} observasi terakhir)",
+                        f"# TYPE {self.name}_recent summary"]
+        with self._lock:
+            items = sorted((labels, dict(s, counts=list(s['counts']), recent=sorted(s['recent'])))
+                           for labels, s in self._series.items())
+        for labels, s in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, s['counts']):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [le])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(s['sum'])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {s['count']}")
+
+            for q in QUANTILES:
+                qlabel = f'quantile="{q}"'
+                recent_lines.append(f"{self.name}_recent{_labels(self.labelnames, labels, [qlabel])} "
+                                    f"{_number(float(quantile(s['recent'], q)))}")
+            recent_lines.append(f"{self.name}_recent_sum{_labels(self.labelnames, labels)} "
+                                f"{_number(float(sum(s['recent'])))}")
+            recent_lines.append(f"{self.name}_recent_count{_labels(self.labelnames, labels)} {len(s['recent'])}")
+        return lines + recent_lines
+
+
+def render_gauges(name, help, values, labelname=None, kind='gauge'):
+    """Baris Prometheus untuk nilai yang dibaca saat scrape.
+
+    ``values``: angka tunggal, atau ``{label: angka}`` jika ``labelname`` diisi.
+    """
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    if labelname is None:
+        lines.append(f"{name} {_number(values)}")
+    else:
+        for label, value in sorted(values.items()):
+            lines.append(f"{name}{_labels((labelname,), (label,))} {_number(value)}")
+    return lines
+
+
+def render_stats(prefix, stats, help, counters=(), labelname=None):
+    """Ubah dict ``metrics()`` (pool, writer, cache, ...) menjadi satu metrik per kunci.
+
+    Kunci di ``counters`` diberi tipe counter dan akhiran ``_total``; sisanya gauge.
+    Nilai non-angka (None) dilewati. Jika ``labelname`` diisi, ``stats`` berbentuk
+    ``{label: dict metrics()}`` (mis. ``cache_metrics()``).
+    """
+    per_key = {}
+    for label, data in (stats.items() if labelname else [(None, stats)]):
+        for key, value in data.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            per_key.setdefault(key, {})[label] = value
+    lines = []
+    for key, values in sorted(per_key.items()):
+        name, kind = (f"{prefix}_{key}_total", 'counter') if key in counters else (f"{prefix}_{key}", 'gauge')
+        lines += render_gauges(name, f"{help}: {key}", values if labelname else values[None], labelname, kind)
+    return lines
+
+
+# --- METRIK APLIKASI ---
+STAGE_SECONDS = Histogram(
+    'psbr_stage_seconds', "Durasi tiap tahap request dalam detik", ('route', 'stage'))
+REQUEST_SECONDS = Histogram(
+    'psbr_request_seconds', "Durasi total request dalam detik", ('route', 'status'))
+ABSENSI_OUTCOMES = Counter(
+    'psbr_absensi_outcomes_total', "Hasil absensi (/api/absensi dan kiosk) per jenis", ('outcome',))
+KIOSK_FRAMES = Counter(
+    'psbr_kiosk_frames_total', "Pekerjaan mode kiosk kontinu: detect, track, encode, rejected (gerbang kualitas)", ('action',))
+
+
+def observe_stages(route, timings):
+    """Masukkan ``g.timings`` (``[(tahap, ms), ...]``) ke histogram tahap."""
+    for name, ms in timings:
+        STAGE_SECONDS.observe(route, name, value=ms / 1000.0)
@@ -0,0 +1,67 @@
+"""Migrasi satu kali: ubah encoding pickle lama di wbs.face_encoding ke format biner v1.
+
+Jalankan sekali setelah backup database, lalu set ALLOW_LEGACY_PICKLE = False di app.py.
+
+    python migrate_encodings.py            # migrasi
+    python migrate_encodings.py --dry-run  # hanya hitung baris yang perlu diubah
+"""
+import argparse
+import pickle
+
+import mysql.connector
+
+from db_pool import PoolTimeout, db_connection
+from face_codec import encode_encoding, is_encoded
+
+BATCH_SIZE = 500
+
+
+def migrate(dry_run=False):
+    try:
+        with db_connection() as db:
+            _migrate(db, dry_run)
+    except (mysql.connector.Error, PoolTimeout) as err:
+        print(f"❌ Gagal konek ke database: {err}")
+
+
+def _migrate(db, dry_run):
+    cursor = db.cursor()
+    try:
+        cursor.execute("SELECT id_wbs, face_encoding FROM wbs WHERE face_encoding IS NOT NULL")
+        rows = cursor.fetchall()
+
+        updates = []
+        sudah = 0
+        gagal = 0
+        for id_wbs, blob in rows:
+            if is_encoded(blob):
+                sudah += 1
+                continue
+            try:
+                # Data lama berasal dari database sendiri; pickle dibaca sekali di sini saja
+                updates.append((encode_encoding(pickle.loads(blob)), id_wbs))
+            except Exception as e:
+                print(f"   ❌ WBS {id_wbs}: tidak bisa dibaca ({e})")
+                gagal += 1
+
+        print(f"📦 {len(rows)} baris: {len(updates)} perlu migrasi, {sudah} sudah format baru, {gagal} gagal.")
+        if dry_run or not updates:
+            return
+
+        for start in range(0, len(updates), BATCH_SIZE):
+            cursor.executemany("UPDATE wbs SET face_encoding = %s WHERE id_wbs = %s",
+                               updates[start:start + BATCH_SIZE])
+            db.commit()
+            print(f"   ✅ {min(start + BATCH_SIZE, len(updates))}/{len(updates)} baris dimigrasi")
+        print("\n✅ Migrasi selesai! Set ALLOW_LEGACY_PICKLE = False di app.py.")
+    except Exception as e:
+        print(f"❌ Migrasi gagal: {e}")
+        db.rollback()
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrasi encoding pickle ke format biner v1")
+    parser.add_argument('--dry-run', action='store_true', help="Hanya hitung, tanpa menulis ke database")
+    migrate(parser.parse_args().dry_run)
@@ -0,0 +1,288 @@
+import argparse
+import sys
+
+import mysql.connector
+
+from db_pool import PoolTimeout, db_connection
+
+# Migrasi skema bernomor. Versi yang sudah dijalankan dicatat di tabel
+# schema_migrations. DDL MySQL tidak transaksional, jadi setiap langkah
+# memeriksa dulu apakah kolom/index/tabelnya sudah ada; menjalankan ulang
+# setelah gagal di tengah jalan aman.
+#
+#   python migrations.py status     # versi sekarang + migrasi yang belum jalan
+#   python migrations.py up         # jalankan semua migrasi yang belum jalan
+#   python migrations.py explain    # cek query utama memakai index (EXPLAIN)
+
+
+class MigrationError(Exception):
+    """Satu langkah migrasi gagal; versi sebelumnya tetap tercatat."""
+
+    def __init__(self, version, name, cause):
+        super().__init__(f"migrasi {version:03d} {name} gagal: {cause}")
+        self.version = version
+        self.name = name
+        self.cause = cause
+
+
+def _column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return cursor.fetchone()[0] > 0
+
+
+def _index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, index))
+    return cursor.fetchone()[0] > 0
+
+
+def _add_index(cursor, table, name, columns, unique=False):
+    if not _index_exists(cursor, table, name):
+        jenis = "UNIQUE INDEX" if unique else "INDEX"
+        print(f"   + {jenis} {table}.{name} ({columns})")
+        cursor.execute(f"ALTER TABLE {table} ADD {jenis} {name} ({columns})")
+
+
+def _m001_wbs_updated_at(db, cursor):
+    # Poll galeri (refresh_gallery_if_stale) dan MAX(updated_at) di _read_gallery_version
+    if not _column_exists(cursor, 'wbs', 'updated_at'):
+        cursor.execute("""
+            ALTER TABLE wbs ADD COLUMN updated_at TIMESTAMP NOT NULL
+                DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        """)
+    _add_index(cursor, 'wbs', 'idx_wbs_updated_at', 'updated_at')
+
+
+def _m002_absensi_indexes(db, cursor):
+    # Laporan: filter/urut (tanggal, waktu_absensi) + keyset id_wbs, id_kegiatan
+    _add_index(cursor, 'absensi', 'idx_absensi_tanggal_waktu', 'tanggal, waktu_absensi, id_wbs, id_kegiatan')
+    # Filter kegiatan_id dan rekap harian per kegiatan
+    _add_index(cursor, 'absensi', 'idx_absensi_kegiatan_tanggal', 'id_kegiatan, tanggal')
+    # Dedupe absensi: satu baris per (id_wbs, id_kegiatan, tanggal). UNIQUE hanya
+    # jika data lama bersih; jika tidak, index biasa dan duplikat dilaporkan.
+    cursor.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT 1 FROM absensi GROUP BY id_wbs, id_kegiatan, tanggal HAVING COUNT(*) > 1
+        ) d
+    """)
+    duplikat = cursor.fetchone()[0]
+    if duplikat:
+        print(f"   ⚠️ {duplikat} kombinasi (id_wbs, id_kegiatan, tanggal) ganda di absensi; "
+              f"index dedupe dibuat tanpa UNIQUE.")
+    _add_index(cursor, 'absensi', 'uq_absensi_wbs_kegiatan_tanggal', 'id_wbs, id_kegiatan, tanggal',
+               unique=not duplikat)
+
+
+def _m003_wbs_is_registered(db, cursor):
+    # Flag tersimpan agar daftar WBS & hitungan wajah tidak perlu membaca kolom BLOB
+    if not _column_exists(cursor, 'wbs', 'is_registered'):
+        cursor.execute("""
+            ALTER TABLE wbs ADD COLUMN is_registered TINYINT(1)
+                AS (face_encoding IS NOT NULL) STORED
+        """)
+    _add_index(cursor, 'wbs', 'idx_wbs_registered', 'is_registered, updated_at')
+    _add_index(cursor, 'wbs', 'idx_wbs_nama', 'nama, id_wbs, is_registered')
+
+
+def _m004_wbs_face_sample(db, cursor):
+    # Sampel wajah per WBS (face_samples.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS wbs_face_sample (
+            id_sample INT AUTO_INCREMENT PRIMARY KEY,
+            id_wbs INT NOT NULL,
+            encoding BLOB NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_sample_wbs (id_wbs, id_sample),
+            FOREIGN KEY (id_wbs) REFERENCES wbs (id_wbs) ON DELETE CASCADE
+        )
+    """)
+
+
+def _m005_rekap_absensi(db, cursor):
+    # Tabel rekap (attendance_summary.py); pengisian dari data lama di migrasi 7
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rekap_kegiatan_harian (
+            tanggal DATE NOT NULL,
+            id_kegiatan INT NOT NULL,
+            jumlah_wbs INT NOT NULL,
+            PRIMARY KEY (tanggal, id_kegiatan)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rekap_wbs_bulanan (
+            periode CHAR(7) NOT NULL,
+            id_wbs INT NOT NULL,
+            jumlah_absensi INT NOT NULL,
+            hari_hadir INT NOT NULL,
+            PRIMARY KEY (periode, id_wbs)
+        )
+    """)
+
+
+def _m006_lokasi_peserta(db, cursor):
+    # Partisi galeri (gallery_shards.py): roster WBS per lokasi dan peserta per kegiatan
+    if not _column_exists(cursor, 'wbs', 'id_lokasi'):
+        cursor.execute("ALTER TABLE wbs ADD COLUMN id_lokasi INT NULL")
+    _add_index(cursor, 'wbs', 'idx_wbs_lokasi', 'id_lokasi, is_registered')
+    if not _column_exists(cursor, 'kegiatan', 'id_lokasi'):
+        cursor.execute("ALTER TABLE kegiatan ADD COLUMN id_lokasi INT NULL")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS kegiatan_peserta (
+            id_kegiatan INT NOT NULL,
+            id_wbs INT NOT NULL,
+            PRIMARY KEY (id_kegiatan, id_wbs),
+            KEY idx_peserta_wbs (id_wbs)
+        )
+    """)
+
+
+def _m007_rekap_backfill(db, cursor):
+    # Isi tabel rekap dari tabel absensi. Langkah terpisah (satu transaksi,
+    # DELETE + INSERT) sehingga aman diulang jika gagal di tengah jalan.
+    from attendance_summary import rebuild_summary
+    jumlah_kegiatan, jumlah_wbs = rebuild_summary(db)
+    print(f"   + rekap: {jumlah_kegiatan} baris kegiatan harian, {jumlah_wbs} baris WBS bulanan")
+
+
+MIGRATIONS = [
+    (1, 'wbs_updated_at', _m001_wbs_updated_at),
+    (2, 'absensi_indexes', _m002_absensi_indexes),
+    (3, 'wbs_is_registered', _m003_wbs_is_registered),
+    (4, 'wbs_face_sample', _m004_wbs_face_sample),
+    (5, 'rekap_absensi', _m005_rekap_absensi),
+    (6, 'lokasi_peserta', _m006_lokasi_peserta),
+    (7, 'rekap_backfill', _m007_rekap_backfill),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(cursor):
+    """Versi skema yang sudah dijalankan (0 jika belum pernah migrasi)."""
+    try:
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    except mysql.connector.errors.ProgrammingError:
+        return 0
+    row = cursor.fetchone()
+    return int(row[0] if not isinstance(row, dict) else next(iter(row.values())))
+
+
+def migrate(db, target=None):
+    """Jalankan migrasi yang belum jalan sampai ``target`` (default: terbaru)."""
+    cursor = db.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    versi = current_version(cursor)
+    dijalankan = []
+    for version, name, step in MIGRATIONS:
+        if version <= versi or (target is not None and version > target):
+            continue
+        print(f"▶️ Migrasi {version:03d} {name}")
+        try:
+            step(db, cursor)
+        except Exception as e:
+            db.rollback()
+            cursor.close()
+            raise MigrationError(version, name, e) from e
+        cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+        db.commit()
+        dijalankan.append(version)
+    cursor.close()
+    return dijalankan
+
+
+# --- CEK EXPLAIN ---
+# (nama, query, params, index yang diharapkan dipakai untuk tabel utama)
+EXPLAIN_CHECKS = [
+    ("laporan per tanggal", """
+        SELECT a.tanggal, a.waktu_absensi, w.nama, k.nama_kegiatan, a.narasumber
+        FROM absensi a JOIN wbs w ON a.id_wbs = w.id_wbs JOIN kegiatan k ON a.id_kegiatan = k.id_kegiatan
+        WHERE a.tanggal >= %s AND a.tanggal <= %s
+        ORDER BY a.tanggal DESC, a.waktu_absensi DESC, a.id_wbs DESC, a.id_kegiatan DESC LIMIT 500
+    """, ('2025-10-01', '2025-10-01'), 'a', {'idx_absensi_tanggal_waktu'}),
+    ("laporan keyset halaman berikutnya", """
+        SELECT a.tanggal, a.waktu_absensi, w.nama
+        FROM absensi a JOIN wbs w ON a.id_wbs = w.id_wbs
+        WHERE a.tanggal <= %s AND (a.tanggal, a.waktu_absensi, a.id_wbs, a.id_kegiatan) < (%s, %s, %s, %s)
+        ORDER BY a.tanggal DESC, a.waktu_absensi DESC, a.id_wbs DESC, a.id_kegiatan DESC LIMIT 500
+    """, ('2025-10-01', '2025-10-01', '08:00:00', 1, 1), 'a', {'idx_absensi_tanggal_waktu'}),
+    ("laporan per kegiatan", """
+        SELECT a.tanggal FROM absensi a WHERE a.id_kegiatan = %s AND a.tanggal >= %s AND a.tanggal <= %s
+    """, (1, '2025-10-01', '2025-10-31'), 'a', {'idx_absensi_kegiatan_tanggal'}),
+    ("dedupe absensi (check-in)", """
+        SELECT 1 FROM absensi WHERE id_wbs = %s AND id_kegiatan = %s AND tanggal = %s
+    """, (1, 1, '2025-10-01'), 'absensi', {'uq_absensi_wbs_kegiatan_tanggal'}),
+    ("absensi hari ini (preload dedupe)", """
+        SELECT id_wbs, id_kegiatan FROM absensi WHERE tanggal = %s
+    """, ('2025-10-01',), 'absensi', {'idx_absensi_tanggal_waktu'}),
+    ("poll galeri", """
+        SELECT id_wbs, nama, face_encoding, updated_at FROM wbs WHERE updated_at >= %s
+    """, ('2025-10-01 00:00:00',), 'wbs', {'idx_wbs_updated_at', 'idx_wbs_registered'}),
+    ("versi galeri", """
+        SELECT MAX(updated_at), COALESCE(SUM(is_registered), 0) FROM wbs
+    """, (), 'wbs', {'idx_wbs_registered'}),
+    ("daftar WBS", """
+        SELECT id_wbs, nama, is_registered FROM wbs ORDER BY nama
+    """, (), 'wbs', {'idx_wbs_nama'}),
+    ("roster lokasi (partisi galeri)", """
+        SELECT id_wbs FROM wbs WHERE id_lokasi = %s AND is_registered = 1
+    """, (1,), 'wbs', {'idx_wbs_lokasi'}),
+]
+
+
+def explain_check(db, checks=EXPLAIN_CHECKS):
+    """Jalankan EXPLAIN untuk query utama; ``True`` jika semuanya memakai index yang diharapkan."""
+    cursor = db.cursor(dictionary=True)
+    semua_ok = True
+    for name, query, params, alias, expected in checks:
+        cursor.execute("EXPLAIN " + query, params)
+        plan = cursor.fetchall()
+        row = next((r for r in plan if r['table'] == alias), plan[0])
+        key = row.get('key')
+        ok = key in expected and row.get('type') != 'ALL'
+        semua_ok &= ok
+        print(f"{'✅' if ok else '❌'} {name:<36} type={row.get('type'):<6} key={key} rows={row.get('rows')}")
+    cursor.close()
+    return semua_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrasi skema database absensi.")
+    parser.add_argument('command', choices=['status', 'up', 'explain'])
+    parser.add_argument('--target', type=int, help="Berhenti di versi ini (untuk 'up')")
+    args = parser.parse_args()
+    try:
+        with db_connection() as db:
+            if args.command == 'status':
+                cursor = db.cursor()
+                versi = current_version(cursor)
+                cursor.close()
+                print(f"Versi skema: {versi} (terbaru {LATEST_VERSION})")
+                for version, name, _ in MIGRATIONS:
+                    print(f"   {'✔' if version <= versi else '·'} {version:03d} {name}")
+            elif args.command == 'up':
+                dijalankan = migrate(db, args.target)
+                print(f"✅ {len(dijalankan)} migrasi dijalankan." if dijalankan else "✅ Skema sudah terbaru.")
+            else:
+                if not explain_check(db):
+                    sys.exit(1)
+    except MigrationError as err:
+        print(f"❌ Migrasi {err.version:03d} {err.name} gagal: {err.cause}")
+        print(f"   Versi sebelum {err.version:03d} sudah tercatat; perbaiki lalu jalankan 'up' lagi.")
+        sys.exit(1)
+    except (mysql.connector.Error, PoolTimeout) as err:
+        print(f"❌ Migrasi gagal: {err}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Profiler sampling sederhana untuk satu request: thread terpisah mengambil
+# stack thread request setiap ``interval`` detik. Hasilnya format "collapsed"
+# (satu baris ``fungsi_luar;...;fungsi_dalam jumlah``) yang bisa langsung
+# dibuka dengan flamegraph.pl atau speedscope. Waktu di worker inference_pool
+# terlihat sebagai menunggu ``future.result``; profil worker tidak diambil.
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id=None, interval=0.005, max_depth=64):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._t0 = 0.0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._t0 = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.duration = time.perf_counter() - self._t0
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def collapsed(self):
+        """Stack dalam format collapsed, yang paling sering lebih dulu."""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + '\n'
+
+    def top(self, n=10):
+        """``[(fungsi, fraksi sampel), ...]`` berdasarkan waktu sendiri (frame teratas)."""
+        self_time = Counter()
+        for stack, count in self.stacks.items():
+            self_time[stack.rsplit(';', 1)[-1]] += count
+        total = max(1, self.samples)
+        return [(name, count / total) for name, count in self_time.most_common(n)]
+
+    def save(self, directory, label):
+        """Tulis hasil ke ``directory``; mengembalikan nama file."""
+        os.makedirs(directory, exist_ok=True)
+        filename = f"{label}-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}-{os.getpid()}.collapsed"
+        with open(os.path.join(directory, filename), 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+        return filename
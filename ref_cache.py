@@ -0,0 +1,86 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Cache kecil dalam proses: entri kedaluwarsa setelah ``ttl`` detik,
+    entri paling lama tidak dipakai dibuang saat melebihi ``maxsize``.
+
+    Dipakai untuk tabel referensi yang jarang berubah (kegiatan, daftar WBS).
+    """
+
+    def __init__(self, name, ttl=300.0, maxsize=256):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING and item[1] > time.monotonic():
+                self._data.move_to_end(key)
+                self.stats['hits'] += 1
+                return item[0]
+            if item is not _MISSING:
+                del self._data[key]
+            self.stats['misses'] += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def get_or_load(self, key, loader):
+        """Ambil dari cache; jika tidak ada, panggil ``loader()`` lalu simpan hasilnya."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key=_MISSING):
+        """Hapus satu key, atau seluruh isi cache jika key tidak diberikan."""
+        with self._lock:
+            if key is _MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+            self.stats['invalidations'] += 1
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self.stats)
+            data['size'] = len(self._data)
+        return data
+
+
+KEGIATAN_CACHE = TTLCache('kegiatan', ttl=600.0, maxsize=256)
+WBS_LIST_CACHE = TTLCache('wbs_list', ttl=60.0, maxsize=4)
+LOKASI_CACHE = TTLCache('lokasi', ttl=300.0, maxsize=1)
+ALL_CACHES = (KEGIATAN_CACHE, WBS_LIST_CACHE, LOKASI_CACHE)
+
+
+def invalidate_kegiatan(id_kegiatan=_MISSING):
+    KEGIATAN_CACHE.invalidate(id_kegiatan)
+
+
+def invalidate_wbs_list():
+    WBS_LIST_CACHE.invalidate()
+
+
+def invalidate_lokasi():
+    LOKASI_CACHE.invalidate()
+
+
+def cache_metrics():
+    return {cache.name: cache.metrics() for cache in ALL_CACHES}
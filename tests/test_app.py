@@ -0,0 +1,133 @@
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip('face_recognition')
+
+from bench import sqlite_db
+from gallery import ENCODING_DIM, GalleryMatcher
+from gallery_shards import GalleryShards
+
+
+@pytest.fixture(scope='module')
+def app_module(tmp_path_factory):
+    import db_pool
+    asli = db_pool.db_connection
+    # Seperti bench/serve_app.py: import app memuat galeri dari database kosong
+    sqlite_db.install(tmp_path_factory.mktemp('app') / 'kosong.sqlite')
+    import app as A
+    yield A
+    db_pool.db_connection = asli
+
+
+class RecordingWriter:
+    def __init__(self, sudah=()):
+        self.sudah = set(sudah)
+        self.calls = []
+
+    def submit_many(self, pairs, narasumber, now=None):
+        self.calls.append((list(pairs), narasumber))
+        return [id_wbs not in self.sudah for id_wbs, _ in pairs]
+
+
+def jpeg():
+    ok, buf = cv2.imencode('.jpg', np.full((48, 64, 3), 128, dtype=np.uint8))
+    return buf.tobytes()
+
+
+@pytest.fixture
+def group(app_module, monkeypatch):
+    A = app_module
+    gallery = GalleryMatcher(np.eye(3, ENCODING_DIM), [1, 2, 3], ['Ani', 'Budi', 'Citra'])
+    writer = RecordingWriter(sudah={2})
+    boxes = [(0, 40, 40, 0), (0, 80, 40, 40), (40, 40, 80, 0), (40, 80, 80, 40)]
+    encodings = [np.eye(1, ENCODING_DIM, 0)[0], np.eye(1, ENCODING_DIM, 1)[0], None, np.full(ENCODING_DIM, 3.0)]
+    reasons = [None, None, 'closer', None]
+    monkeypatch.setattr(A, 'refresh_gallery_if_stale', lambda: None)
+    monkeypatch.setattr(A, 'gallery_for', lambda kegiatan_id, lokasi_id=None: gallery)
+    monkeypatch.setattr(A, 'run_group_inference', lambda rgb: (boxes, encodings, reasons))
+    monkeypatch.setattr(A, 'get_nama_kegiatan', lambda kegiatan_id: 'Senam Pagi')
+    monkeypatch.setattr(A, 'ATTENDANCE_WRITER', writer)
+    return A.app.test_client(), writer
+
+
+def test_group_route_matches_each_face(group):
+    client, writer = group
+    resp = client.post('/api/absensi/grup?kegiatan_id=7&narasumber_nama=Bu+Sari', data=jpeg(),
+                       content_type='image/jpeg')
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body['status'] == 'success' and body['kegiatan'] == 'Senam Pagi'
+    faces = body['faces']
+    assert [f['status'] for f in faces] == ['success', 'success', 'failed', 'failed']
+    assert [f.get('nama') for f in faces[:2]] == ['Ani', 'Budi']
+    assert [f['duplikat'] for f in faces[:2]] == [False, True]
+    assert faces[2]['reason'] == 'closer'
+    assert 'tidak dikenali' in faces[3]['message']
+    # Semua absensi satu frame diantrekan sekaligus
+    assert writer.calls == [([(1, '7'), (2, '7')], 'PPTK: PPTK Tidak Diketahui | Narasumber: Bu Sari')]
+
+
+def test_group_route_requires_kegiatan(group):
+    client, writer = group
+    resp = client.post('/api/absensi/grup', data=jpeg(), content_type='image/jpeg')
+    assert resp.status_code == 400
+    assert writer.calls == []
+
+
+@pytest.fixture
+def shards(app_module, monkeypatch):
+    A = app_module
+    keys = []
+
+    def load_ids(key):
+        keys.append(key)
+        return {1, 2} if key[0] == 3 else None
+
+    monkeypatch.setattr(A, 'SCHEMA_VERSION', 6)
+    monkeypatch.setattr(A, 'GALLERY', GalleryMatcher(np.eye(3, ENCODING_DIM), [1, 2, 3], ['Ani', 'Budi', 'Citra']))
+    monkeypatch.setattr(A, 'GALLERY_SHARDS', GalleryShards(load_ids))
+    monkeypatch.setattr(A, 'known_lokasi', lambda: {3, 4})
+    monkeypatch.setattr(A, 'refresh_gallery_if_stale', lambda: None)
+    # gallery_for mencatat durasi tahap di flask.g
+    with A.app.test_request_context():
+        yield A, keys
+
+
+def test_gallery_for_normalizes_keys(shards):
+    A, keys = shards
+    part = A.gallery_for('7', '3')
+    assert sorted(part.ids) == [1, 2]
+    assert A.gallery_for(7, 3) is part
+    assert A.gallery_for(7, ' 3 ') is part
+    assert A.gallery_for(7, None) is A.GALLERY
+    assert A.gallery_for(7, '') is A.GALLERY
+    assert keys == [(3, '7'), (None, '7')]
+
+
+@pytest.mark.parametrize('lokasi_id', ['99', 'x', '3; DROP', 3.5])
+def test_gallery_for_rejects_unknown_lokasi(shards, lokasi_id):
+    A, keys = shards
+    with pytest.raises(ValueError):
+        A.gallery_for(7, lokasi_id)
+    assert keys == [] and A.GALLERY_SHARDS.metrics()['size'] == 0
+
+
+def test_unknown_lokasi_is_bad_request(shards):
+    A, keys = shards
+    client = A.app.test_client()
+    resp = client.post('/api/absensi?kegiatan_id=7&lokasi_id=99', data=jpeg(), content_type='image/jpeg')
+    assert resp.status_code == 400
+    resp = client.post('/api/kiosk/session', json={'kegiatan_id': 7, 'lokasi_id': 'junk'})
+    assert resp.status_code == 400
+    assert keys == []
+
+
+def test_apply_gallery_updates_invalidates_partitions(shards, monkeypatch):
+    A, keys = shards
+    monkeypatch.setattr(A, 'GALLERY_STAMP', None)
+    A.gallery_for(7, 3)
+    A.apply_gallery_updates([(2, 'Budi', np.full(ENCODING_DIM, 0.5))])
+    part = A.gallery_for(7, 3)
+    assert keys == [(3, '7'), (3, '7')]
+    assert part.match(np.full(ENCODING_DIM, 0.5), tolerance=0.1)[0]['id_wbs'] == 2
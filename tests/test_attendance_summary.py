@@ -0,0 +1,103 @@
+import sqlite3
+from datetime import date
+
+import pytest
+from mysql.connector.conversion import MySQLConverter
+from mysql.connector.cursor import RE_PY_PARAM, _ParamSubstitutor
+
+from attendance_summary import REFRESH_KEGIATAN, REFRESH_WBS, month_range, months_between, rebuild_summary
+from bench import sqlite_db
+
+REKAP_SCHEMA = [
+    """CREATE TABLE rekap_kegiatan_harian (tanggal TEXT NOT NULL, id_kegiatan INTEGER NOT NULL,
+       jumlah_wbs INTEGER NOT NULL, PRIMARY KEY (tanggal, id_kegiatan))""",
+    """CREATE TABLE rekap_wbs_bulanan (periode TEXT NOT NULL, id_wbs INTEGER NOT NULL,
+       jumlah_absensi INTEGER NOT NULL, hari_hadir INTEGER NOT NULL, PRIMARY KEY (periode, id_wbs))""",
+]
+
+
+def driver_sql(query, params=()):
+    """Teks SQL yang benar-benar dikirim mysql-connector ke server (substitusi parameter asli driver)."""
+    conv = MySQLConverter()
+    values = [conv.quote(conv.escape(conv.to_mysql(v))) for v in params]
+    psub = _ParamSubstitutor(values)
+    sql = RE_PY_PARAM.sub(psub, query.encode('utf-8')).decode('utf-8')
+    assert psub.remaining == 0
+    return sql
+
+
+class DriverCheckedCursor:
+    """Cursor SQLite yang juga memeriksa setiap query lewat substitusi parameter mysql-connector."""
+
+    def __init__(self, cursor, sent):
+        self._cursor = cursor
+        self._sent = sent
+
+    def execute(self, query, params=()):
+        self._sent.append(driver_sql(query, params))
+        self._cursor.execute(query, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class DriverCheckedConnection(sqlite_db.Connection):
+    def __init__(self, path):
+        super().__init__(path)
+        self.sent = []
+
+    def cursor(self, dictionary=False, **kwargs):
+        return DriverCheckedCursor(super().cursor(dictionary), self.sent)
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / 'rekap.sqlite')
+    sqlite_db.create_schema(path)
+    conn = sqlite3.connect(path)
+    for ddl in REKAP_SCHEMA:
+        conn.execute(ddl)
+    rows = [(1, 1, '2025-10-30'), (1, 1, '2025-10-31'), (2, 1, '2025-10-31'), (1, 2, '2025-10-31'),
+            (2, 1, '2025-12-02')]
+    conn.executemany("INSERT INTO absensi (id_wbs, id_kegiatan, tanggal, waktu_absensi) VALUES (?, ?, ?, '08:00:00')",
+                     rows)
+    conn.commit()
+    conn.close()
+    db = DriverCheckedConnection(path)
+    yield db
+    db.close()
+
+
+def test_month_helpers():
+    assert month_range('2025-12') == (date(2025, 12, 1), date(2026, 1, 1))
+    assert list(months_between(date(2025, 11, 30), '2026-02-01')) == ['2025-11', '2025-12', '2026-01', '2026-02']
+
+
+def test_refresh_queries_have_no_literal_percent():
+    for query, params in ((REFRESH_KEGIATAN, (date(2025, 10, 1), 1)),
+                          (REFRESH_WBS, ('2025-10', 1, date(2025, 10, 1), date(2025, 11, 1)))):
+        assert '%' not in driver_sql(query, params)
+
+
+def test_rebuild_summary(db):
+    jumlah_kegiatan, jumlah_wbs = rebuild_summary(db)
+    assert all('%' not in sql for sql in db.sent)
+
+    cur = db.cursor()
+    cur.execute("SELECT tanggal, id_kegiatan, jumlah_wbs FROM rekap_kegiatan_harian ORDER BY tanggal, id_kegiatan")
+    assert cur.fetchall() == [('2025-10-30', 1, 1), ('2025-10-31', 1, 2), ('2025-10-31', 2, 1), ('2025-12-02', 1, 1)]
+    cur.execute("SELECT periode, id_wbs, jumlah_absensi, hari_hadir FROM rekap_wbs_bulanan ORDER BY periode, id_wbs")
+    assert cur.fetchall() == [('2025-10', 1, 3, 2), ('2025-10', 2, 1, 1), ('2025-12', 2, 1, 1)]
+    assert (jumlah_kegiatan, jumlah_wbs) == (4, 3)
+
+
+def test_rebuild_summary_date_range(db):
+    rebuild_summary(db, date(2025, 12, 1), date(2025, 12, 31))
+    cur = db.cursor()
+    cur.execute("SELECT periode FROM rekap_wbs_bulanan")
+    assert cur.fetchall() == [('2025-12',)]
+
+
+def test_rebuild_summary_empty_table(db):
+    db.cursor().execute("DELETE FROM absensi")
+    assert rebuild_summary(db) == (0, 0)
@@ -0,0 +1,102 @@
+import time
+from contextlib import contextmanager
+
+import pytest
+
+import attendance_writer
+from attendance_writer import AttendanceWriter
+from bench import sqlite_db
+from db_pool import PoolTimeout
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'absensi.sqlite')
+    sqlite_db.create_schema(path)
+    monkeypatch.setattr(sqlite_db, '_path', path)
+    monkeypatch.setattr(attendance_writer, 'db_connection', sqlite_db.db_connection)
+    return path
+
+
+def absensi_rows(path):
+    db = sqlite_db.Connection(path)
+    cursor = db.cursor()
+    cursor.execute("SELECT id_wbs, id_kegiatan, narasumber FROM absensi ORDER BY id_wbs, id_kegiatan")
+    rows = cursor.fetchall()
+    db.close()
+    return rows
+
+
+def wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@contextmanager
+def database_down():
+    raise PoolTimeout('database mati')
+    yield
+
+
+def test_submit_dedupes_same_day(db_path):
+    writer = AttendanceWriter(flush_interval=0.05, summary=False)
+    assert writer.submit(1, 7, 'Pak Budi') is True
+    assert writer.submit(1, 7, 'Pak Budi') is False
+    assert writer.submit_many([(1, 7), (2, 7), (2, 7)], 'Pak Budi') == [False, True, False]
+    writer.stop()
+    assert absensi_rows(db_path) == [(1, 7, 'Pak Budi'), (2, 7, 'Pak Budi')]
+    assert writer.metrics()['duplicates'] == 3
+
+
+def test_preload_dedupes_after_restart(db_path):
+    first = AttendanceWriter(flush_interval=0.05, summary=False)
+    first.submit(1, 7, None)
+    first.stop()
+    second = AttendanceWriter(flush_interval=0.05, summary=False)
+    assert second.submit(1, 7, None) is False
+    second.stop()
+    assert len(absensi_rows(db_path)) == 1
+
+
+def test_full_batch_is_flushed_without_waiting_for_interval(db_path):
+    writer = AttendanceWriter(batch_size=3, flush_interval=60.0, summary=False)
+    writer.submit_many([(1, 7), (2, 7)], None)
+    writer.submit(3, 7, None)
+    wait_for(lambda: writer.metrics()['written'] == 3)
+    assert writer.metrics()['batches'] == 1
+    writer.stop()
+
+
+def test_stop_flushes_pending_rows_and_returns(db_path):
+    writer = AttendanceWriter(flush_interval=60.0, summary=False)
+    writer.submit(1, 7, None)
+    # Baris sudah diambil thread penulis dan menunggu flush_interval
+    wait_for(lambda: writer.metrics()['queued'] == 0)
+    time.sleep(0.05)
+    t0 = time.monotonic()
+    writer.stop(timeout=5.0)
+    assert time.monotonic() - t0 < 2.0
+    assert not writer._thread.is_alive()
+    assert absensi_rows(db_path) == [(1, 7, None)]
+
+
+def test_spool_is_replayed_on_next_start(db_path, tmp_path, monkeypatch):
+    spool = str(tmp_path / 'spool' / 'absensi.jsonl')
+    monkeypatch.setattr(attendance_writer, 'db_connection', database_down)
+    down = AttendanceWriter(flush_interval=60.0, spool_path=spool, summary=False)
+    assert down.submit_many([(1, 7), (2, 7)], 'Bu Sari') == [True, True]
+    down.stop(timeout=5.0)
+    assert not down._thread.is_alive()
+    assert absensi_rows(db_path) == []
+
+    monkeypatch.setattr(attendance_writer, 'db_connection', sqlite_db.db_connection)
+    up = AttendanceWriter(flush_interval=0.05, spool_path=spool, summary=False)
+    up.start()
+    wait_for(lambda: up.metrics()['written'] == 2)
+    # Baris dari spool juga masuk daftar dedupe
+    assert up.submit(1, 7, 'Bu Sari') is False
+    up.stop()
+    assert absensi_rows(db_path) == [(1, 7, 'Bu Sari'), (2, 7, 'Bu Sari')]
+    assert not (tmp_path / 'spool' / 'absensi.jsonl').exists()
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import mysql.connector
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    unread_result = False
+    in_transaction = False
+
+    def __init__(self):
+        self.connected = True
+        self.ping_fails = False
+
+    def is_connected(self):
+        return self.connected
+
+    def ping(self, reconnect=False):
+        if not self.connected or self.ping_fails:
+            raise mysql.connector.errors.InterfaceError("putus")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.connected = False
+
+
+@pytest.fixture(autouse=True)
+def fake_connect(monkeypatch):
+    monkeypatch.setattr(mysql.connector, 'connect', lambda **config: FakeConnection())
+
+
+def test_reuses_idle_connection():
+    pool = ConnectionPool({}, size=1, max_overflow=0, timeout=1)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert pool.metrics()['created'] == 1
+
+
+def test_times_out_when_full():
+    pool = ConnectionPool({}, size=1, max_overflow=0, timeout=0.2)
+    with pool.connection():
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+    assert pool.metrics()['timeouts'] == 1
+
+
+def test_discard_wakes_waiter():
+    pool = ConnectionPool({}, size=1, max_overflow=0, timeout=5)
+    ctx = pool.connection()
+    conn = ctx.__enter__()
+    waited = {}
+
+    def waiter():
+        t0 = time.monotonic()
+        with pool.connection() as db:
+            waited['seconds'] = time.monotonic() - t0
+            waited['conn'] = db
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    while pool.metrics()['waiting'] == 0:
+        time.sleep(0.01)
+    conn.connected = False           # koneksi rusak: dibuang saat dikembalikan
+    ctx.__exit__(None, None, None)
+    thread.join(timeout=5)
+
+    assert waited['seconds'] < 1.0   # tidak menunggu sampai timeout pool
+    assert waited['conn'] is not conn
+    data = pool.metrics()
+    assert data['discarded'] == 1 and data['open'] == 1 and data['timeouts'] == 0
+
+
+def test_waiter_replaces_unhealthy_connection_within_limit():
+    pool = ConnectionPool({}, size=1, max_overflow=0, timeout=5, ping_after=0)
+    ctx = pool.connection()
+    conn = ctx.__enter__()
+    seen = {}
+
+    def waiter():
+        with pool.connection() as db:
+            seen['conn'] = db
+            seen['metrics'] = pool.metrics()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    while pool.metrics()['waiting'] == 0:
+        time.sleep(0.01)
+    conn.ping_fails = True           # lolos saat dikembalikan, gagal saat di-ping penunggu
+    ctx.__exit__(None, None, None)
+    thread.join(timeout=5)
+
+    assert seen['conn'] is not conn
+    data = seen['metrics']
+    assert data['open'] == 1 and data['in_use'] == 1 and data['idle'] == 0
+    assert data['discarded'] == 1 and data['created'] == 2
+
+
+def test_metrics_ignore_wakeup_tokens():
+    pool = ConnectionPool({}, size=2, max_overflow=0, timeout=5)
+    held = pool.connection()
+    broken = held.__enter__()
+    with pool.connection():
+        pass
+    # Koneksi rusak dibuang saat ada penunggu: tanda slot kosong masuk antrean,
+    # tapi bukan koneksi menganggur
+    pool._waiting = 1
+    broken.connected = False
+    held.__exit__(None, None, None)
+    pool._waiting = 0
+    data = pool.metrics()
+    assert data['open'] == 1 and data['idle'] == 1 and data['in_use'] == 0
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('face_recognition')
+
+import enrollment_script
+from bench import sqlite_db
+from enrollment_script import save_encodings
+from face_codec import encode_encoding
+from face_samples import add_sample
+from gallery import ENCODING_DIM
+
+
+def blob(value):
+    return encode_encoding(np.full(ENCODING_DIM, value, dtype=np.float32))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / 'enroll.sqlite')
+    sqlite_db.create_schema(path)
+    monkeypatch.setattr(sqlite_db, '_path', path)
+    monkeypatch.setattr(enrollment_script, 'db_connection', sqlite_db.db_connection)
+    conn = sqlite_db.Connection(path)
+    cur = conn.cursor()
+    cur.execute("INSERT INTO wbs (nama) VALUES ('Ani')")
+    cur.execute("INSERT INTO wbs (nama) VALUES ('Budi')")
+    cur.execute("CREATE TABLE schema_migrations (version INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+    cur.execute("INSERT INTO schema_migrations (version, name) VALUES (4, 'wbs_face_sample')")
+    # Ani punya dua sampel dari /api/daftar_wajah
+    add_sample(cur, 1, np.full(ENCODING_DIM, 0.1, dtype=np.float32))
+    add_sample(cur, 1, np.full(ENCODING_DIM, 0.3, dtype=np.float32))
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def samples_of(db, id_wbs):
+    cur = db.cursor()
+    cur.execute("SELECT encoding FROM wbs_face_sample WHERE id_wbs = %s ORDER BY id_sample", (id_wbs,))
+    return [bytes(row[0]) for row in cur.fetchall()]
+
+
+def encoding_of(db, id_wbs):
+    cur = db.cursor()
+    cur.execute("SELECT face_encoding FROM wbs WHERE id_wbs = %s", (id_wbs,))
+    row = cur.fetchone()[0]
+    return None if row is None else bytes(row)
+
+
+def test_script_photo_replaces_samples(db):
+    save_encodings([(blob(0.5), 1, 'Ani'), (blob(0.7), 2, 'Budi'), (blob(0.9), 2, 'Salah Nama')])
+    assert encoding_of(db, 1) == blob(0.5)
+    assert samples_of(db, 1) == [blob(0.5)]
+    assert samples_of(db, 2) == [blob(0.7)]
+
+
+def test_name_mismatch_keeps_samples(db):
+    sebelum = samples_of(db, 1)
+    save_encodings([(blob(0.5), 1, 'Bukan Ani')])
+    assert samples_of(db, 1) == sebelum
+
+
+def test_clear_removes_samples(db):
+    save_encodings([(blob(0.5), 1, 'Ani')])
+    save_encodings([(1, blob(0.5))], clear=True)
+    assert encoding_of(db, 1) is None
+    assert samples_of(db, 1) == []
+
+
+def test_clear_skips_encoding_changed_by_web(db):
+    # Centroid dari web tidak sama dengan encoding script: tidak dikosongkan
+    sebelum = samples_of(db, 1)
+    save_encodings([(1, blob(0.5))], clear=True)
+    assert encoding_of(db, 1) is not None
+    assert samples_of(db, 1) == sebelum
+
+
+def test_without_sample_migration_only_updates_wbs(db):
+    db.cursor().execute("DELETE FROM schema_migrations")
+    db.commit()
+    sebelum = samples_of(db, 1)
+    save_encodings([(blob(0.5), 1, 'Ani')])
+    assert encoding_of(db, 1) == blob(0.5)
+    assert samples_of(db, 1) == sebelum
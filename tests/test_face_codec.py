@@ -0,0 +1,46 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from face_codec import RECORD_SIZE, decode_encoding, decode_many, encode_encoding, is_encoded
+from gallery import ENCODING_DIM
+
+
+def test_round_trip():
+    enc = np.random.default_rng(0).normal(size=ENCODING_DIM)
+    blob = encode_encoding(enc)
+    assert len(blob) == RECORD_SIZE
+    assert is_encoded(blob)
+    decoded = decode_encoding(blob)
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, enc.astype(np.float32))
+
+
+def test_legacy_pickle_needs_flag():
+    enc = np.arange(ENCODING_DIM, dtype=np.float64) / ENCODING_DIM
+    blob = pickle.dumps(enc)
+    assert not is_encoded(blob)
+    with pytest.raises(ValueError):
+        decode_encoding(blob)
+    np.testing.assert_allclose(decode_encoding(blob, allow_pickle=True), enc, rtol=1e-6)
+
+
+def test_decode_many_mask():
+    rng = np.random.default_rng(1)
+    encs = rng.normal(size=(3, ENCODING_DIM)).astype(np.float32)
+    legacy = pickle.dumps(encs[2].astype(np.float64))
+    blobs = [encode_encoding(encs[0]), None, b'rusak', encode_encoding(encs[1]), legacy]
+
+    matrix, ok = decode_many(blobs)
+    assert ok.tolist() == [True, False, False, True, False]
+    np.testing.assert_array_equal(matrix[ok], encs[:2])
+
+    matrix, ok = decode_many(blobs, allow_pickle=True)
+    assert ok.tolist() == [True, False, False, True, True]
+    np.testing.assert_array_equal(matrix[ok], encs)
+
+
+def test_decode_many_empty():
+    matrix, ok = decode_many([])
+    assert matrix.shape == (0, ENCODING_DIM) and len(ok) == 0
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from face_index import build_index, load_or_build_index
+from gallery import ENCODING_DIM, GalleryMatcher
+
+
+@pytest.fixture(scope='module')
+def data():
+    """Galeri berkelompok (mirip encoding wajah) + query = anggota galeri yang diberi noise."""
+    rng = np.random.default_rng(0)
+    centers = rng.normal(scale=0.3, size=(40, ENCODING_DIM))
+    matrix = centers[rng.integers(len(centers), size=3000)] + rng.normal(scale=0.08, size=(3000, ENCODING_DIM))
+    targets = rng.choice(len(matrix), 200, replace=False)
+    queries = matrix[targets] + rng.normal(scale=0.02, size=(len(targets), ENCODING_DIM))
+    return matrix, queries
+
+
+def recall_at_1(matrix, queries, index):
+    ids = list(range(len(matrix)))
+    exact = GalleryMatcher(matrix, ids, ids)
+    approx = GalleryMatcher(matrix, ids, ids, index=index)
+    hits = 0
+    for q in queries:
+        truth = exact.match(q, tolerance=10.0)[0]['id_wbs']
+        got = approx.match(q, tolerance=10.0)
+        hits += bool(got) and got[0]['id_wbs'] == truth
+    return hits / len(queries)
+
+
+@pytest.mark.parametrize('backend, params, minimum', [
+    ('brute', {}, 1.0),
+    ('ivf', {'nprobe': 8}, 0.95),
+    ('rptree', {'n_trees': 8, 'leaf_size': 32}, 0.95),
+])
+def test_recall_fixed_seed(data, backend, params, minimum):
+    matrix, queries = data
+    index = build_index(backend, matrix, **params)
+    assert recall_at_1(matrix, queries, index) >= minimum
+
+
+def test_rptree_recall_grows_with_trees(data):
+    matrix, queries = data
+    low = recall_at_1(matrix, queries, build_index('rptree', matrix, n_trees=1, leaf_size=8))
+    high = recall_at_1(matrix, queries, build_index('rptree', matrix, n_trees=8, leaf_size=8))
+    assert low < 1.0  # satu pohon kecil memang melewatkan tetangga terdekat
+    assert high > low
+
+
+def test_saved_index_follows_params(data, tmp_path):
+    matrix, _ = data
+    ids = list(range(len(matrix)))
+    path = str(tmp_path / 'face_index.npz')
+
+    first = load_or_build_index('ivf', matrix, ids, path, nlist=20, nprobe=4)
+    assert first.centroids.shape[0] == 20
+    # Parameter query berubah: index dari file dipakai, nprobe dari konfigurasi
+    reused = load_or_build_index('ivf', matrix, ids, path, nlist=20, nprobe=12)
+    np.testing.assert_array_equal(reused.centroids, first.centroids)
+    assert reused.nprobe == 12
+    # Parameter build berubah: index dibangun ulang
+    rebuilt = load_or_build_index('ivf', matrix, ids, path, nlist=30, nprobe=12)
+    assert rebuilt.centroids.shape[0] == 30
+    # Backend lain dengan file yang sama: dibangun ulang juga
+    forest = load_or_build_index('rptree', matrix, ids, path, n_trees=2)
+    assert forest.backend == 'rptree' and len(forest.roots) == 2
+    assert load_or_build_index('rptree', matrix, ids, path, n_trees=2, search_k=50).search_k == 50
@@ -0,0 +1,71 @@
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip('face_recognition')
+
+import face_quality  # noqa: E402
+from face_quality import REASON_MESSAGES, LowQualityFace, check_face, thresholds_version  # noqa: E402
+
+BOX = (20, 220, 220, 20)  # (top, right, bottom, left), wajah 200 px
+
+
+def frame(mean=128.0, contrast=40.0, blur=0):
+    rng = np.random.default_rng(0)
+    gray = np.clip(rng.normal(mean, contrast, size=(240, 240)), 0, 255).astype(np.uint8)
+    if blur:
+        gray = cv2.GaussianBlur(gray, (0, 0), blur)
+    return np.ascontiguousarray(np.repeat(gray[:, :, None], 3, axis=2))
+
+
+def landmarks(nose_x):
+    return [{'left_eye': [(80, 80), (90, 80)], 'right_eye': [(150, 80), (160, 80)],
+             'nose_tip': [(nose_x, 130)]}]
+
+
+@pytest.fixture
+def frontal(monkeypatch):
+    monkeypatch.setattr(face_quality.face_recognition, 'face_landmarks', lambda *a, **k: landmarks(120))
+
+
+def reason(rgb, box=BOX, **thresholds):
+    with pytest.raises(LowQualityFace) as err:
+        check_face(rgb, box, thresholds)
+    return err.value.reason
+
+
+def test_good_face_passes(frontal):
+    scores = check_face(frame(), BOX)
+    assert scores['size'] == 200
+    assert set(scores) >= {'brightness', 'sharpness', 'yaw', 'roll'}
+    assert abs(scores['yaw']) < 0.05 and abs(scores['roll']) < 1
+
+
+def test_reason_codes(frontal):
+    assert reason(frame(), box=(20, 80, 80, 20)) == 'closer'
+    assert reason(frame(mean=20, contrast=5)) == 'too_dark'
+    assert reason(frame(mean=240, contrast=5)) == 'too_bright'
+    assert reason(frame(blur=8)) == 'hold_still'
+
+
+def test_turned_face(monkeypatch):
+    monkeypatch.setattr(face_quality.face_recognition, 'face_landmarks', lambda *a, **k: landmarks(160))
+    assert reason(frame()) == 'face_camera'
+    # max_yaw None mematikan cek pose
+    check_face(frame(), BOX, {'max_yaw': None})
+
+
+def test_missing_landmarks_skip_pose(monkeypatch):
+    monkeypatch.setattr(face_quality.face_recognition, 'face_landmarks', lambda *a, **k: [])
+    assert 'yaw' not in check_face(frame(), BOX)
+
+
+def test_every_reason_has_message():
+    for code in ('closer', 'too_dark', 'too_bright', 'hold_still', 'face_camera'):
+        assert LowQualityFace(code).message == REASON_MESSAGES[code]
+
+
+def test_thresholds_version_tracks_effective_values():
+    assert thresholds_version(None) == thresholds_version({})
+    assert thresholds_version({'min_face': 80}) == thresholds_version({})  # sama dengan default
+    assert thresholds_version({'min_face': 120}) != thresholds_version({})
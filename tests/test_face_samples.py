@@ -0,0 +1,92 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from bench import sqlite_db
+from face_codec import decode_encoding, encode_encoding
+from face_samples import add_sample, build_store
+from gallery import ENCODING_DIM
+
+
+@pytest.fixture
+def cursor(tmp_path):
+    path = str(tmp_path / 'samples.sqlite')
+    sqlite_db.create_schema(path)
+    conn = sqlite_db.Connection(path)
+    cur = conn.cursor()
+    cur.execute("INSERT INTO wbs (nama) VALUES ('Ani')")
+    yield cur
+    conn.close()
+
+
+def vec(value):
+    return np.full(ENCODING_DIM, value, dtype=np.float32)
+
+
+def stored_centroid(cur, id_wbs=1):
+    cur.execute("SELECT face_encoding FROM wbs WHERE id_wbs = %s", (id_wbs,))
+    return decode_encoding(cur.fetchone()[0])
+
+
+def sample_count(cur, id_wbs=1):
+    cur.execute("SELECT COUNT(*) FROM wbs_face_sample WHERE id_wbs = %s", (id_wbs,))
+    return cur.fetchone()[0]
+
+
+def test_centroid_is_mean_of_samples(cursor):
+    for value in (0.1, 0.2, 0.6):
+        samples, centroid = add_sample(cursor, 1, vec(value))
+    assert len(samples) == 3
+    np.testing.assert_allclose(centroid, vec(0.3), rtol=1e-6)
+    np.testing.assert_allclose(stored_centroid(cursor), vec(0.3), rtol=1e-6)
+
+
+def test_keeps_only_newest_samples(cursor):
+    for value in range(1, 8):
+        samples, centroid = add_sample(cursor, 1, vec(value), max_samples=3)
+    assert sample_count(cursor) == 3
+    np.testing.assert_allclose(centroid, vec(6.0), rtol=1e-6)  # rata-rata 5, 6, 7
+
+
+def test_replace_drops_old_samples(cursor):
+    add_sample(cursor, 1, vec(1.0))
+    add_sample(cursor, 1, vec(2.0))
+    samples, centroid = add_sample(cursor, 1, vec(5.0), replace=True)
+    assert len(samples) == 1 and sample_count(cursor) == 1
+    np.testing.assert_allclose(centroid, vec(5.0))
+
+
+def test_existing_encoding_seeds_first_sample(cursor):
+    cursor.execute("UPDATE wbs SET face_encoding = %s WHERE id_wbs = 1", (encode_encoding(vec(1.0)),))
+    samples, centroid = add_sample(cursor, 1, vec(3.0))
+    assert len(samples) == 2
+    np.testing.assert_allclose(centroid, vec(2.0))
+
+
+def test_legacy_pickle_follows_flag(cursor):
+    cursor.execute("UPDATE wbs SET face_encoding = %s WHERE id_wbs = 1", (pickle.dumps(vec(1.0)),))
+    samples, _ = add_sample(cursor, 1, vec(3.0))
+    assert len(samples) == 1  # pickle lama tidak dibaca tanpa allow_pickle
+
+    cursor.execute("DELETE FROM wbs_face_sample")
+    cursor.execute("UPDATE wbs SET face_encoding = %s WHERE id_wbs = 1", (pickle.dumps(vec(1.0)),))
+    samples, centroid = add_sample(cursor, 1, vec(3.0), allow_pickle=True)
+    assert len(samples) == 2
+    np.testing.assert_allclose(centroid, vec(2.0))
+
+
+def test_undecodable_sample_is_skipped(cursor):
+    add_sample(cursor, 1, vec(1.0))
+    cursor.execute("INSERT INTO wbs_face_sample (id_wbs, encoding) VALUES (1, %s)", (b'rusak',))
+    samples, centroid = add_sample(cursor, 1, vec(3.0))
+    assert len(samples) == 2
+    np.testing.assert_allclose(centroid, vec(2.0))
+
+
+def test_build_store_groups_by_wbs():
+    rows = [(1, encode_encoding(vec(1.0))), (2, encode_encoding(vec(2.0))), (1, b'rusak'),
+            (1, encode_encoding(vec(3.0)))]
+    store = build_store(rows)
+    assert len(store) == 3
+    assert store.count(1) == 2 and store.count(2) == 1
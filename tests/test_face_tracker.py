@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('face_recognition')  # face_tracker -> face_quality
+
+from face_tracker import FaceTracker, iou  # noqa: E402
+
+BOX = (40, 140, 140, 40)
+
+
+def frame(seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 255, size=(200, 200, 3), dtype=np.uint8)
+
+
+def test_iou():
+    assert iou(BOX, BOX) == 1.0
+    assert iou(BOX, (0, 20, 20, 0)) == 0.0
+    assert 0 < iou(BOX, (60, 160, 160, 60)) < 1
+
+
+def test_one_encoding_per_track_and_follow_between_detections():
+    tracker = FaceTracker(detect_every=3, max_encodes=1)
+    calls = {'detect': 0, 'encode': 0}
+
+    def detect(rgb):
+        calls['detect'] += 1
+        return [BOX]
+
+    def encode(rgb, boxes):
+        calls['encode'] += 1
+        return [np.zeros(128) for _ in boxes], [None] * len(boxes)
+
+    rgb = frame()
+    encoded = [tracker.update(rgb, detect, encode) for _ in range(6)]
+    assert len(encoded[0]) == 1 and not any(encoded[1:])
+    assert calls == {'detect': 2, 'encode': 1}
+    assert tracker.stats['track'] == 4 and len(tracker.tracks) == 1
+
+
+def test_rejected_face_keeps_hint_and_retries():
+    tracker = FaceTracker(detect_every=1, max_encodes=1)
+    reasons = iter(['hold_still', None])
+
+    def encode(rgb, boxes):
+        reason = next(reasons)
+        return [None if reason else np.zeros(128)], [reason]
+
+    rgb = frame()
+    assert tracker.update(rgb, lambda rgb: [BOX], encode) == []
+    track = tracker.tracks[0]
+    assert track.hint == 'hold_still' and track.encodes == 0
+    assert tracker.stats['rejected'] == 1
+
+    hasil = tracker.update(rgb, lambda rgb: [BOX], encode)
+    assert [t.id for t, _ in hasil] == [track.id]
+    assert track.hint is None and track.encodes == 1
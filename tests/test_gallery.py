@@ -0,0 +1,165 @@
+import numpy as np
+import pytest
+
+from gallery import ENCODING_DIM, GalleryMatcher, SampleStore
+
+
+def brute_force(encodings, tolerance, query, top_k):
+    """Hasil acuan: ``[(id_wbs, jarak)]`` dari ``{id_wbs: encoding}`` yang aktif."""
+    hasil = sorted((float(np.linalg.norm(enc - query)), id_wbs) for id_wbs, enc in encodings.items())
+    return [(id_wbs, d) for d, id_wbs in hasil[:top_k] if d <= tolerance]
+
+
+def random_gallery(rng, n):
+    matrix = rng.normal(scale=0.1, size=(n, ENCODING_DIM))
+    ids = list(range(1, n + 1))
+    return matrix, ids, [f"wbs{i}" for i in ids]
+
+
+def assert_same(gallery, encodings, query, tolerance=1.5, top_k=5):
+    expected = brute_force(encodings, tolerance, query, top_k)
+    got = [(m['id_wbs'], m['distance']) for m in gallery.match(query, tolerance=tolerance, top_k=top_k)]
+    assert [i for i, _ in got] == [i for i, _ in expected]
+    np.testing.assert_allclose([d for _, d in got], [d for _, d in expected], rtol=1e-9)
+
+
+def test_match_equals_brute_force():
+    rng = np.random.default_rng(1)
+    matrix, ids, names = random_gallery(rng, 200)
+    gallery = GalleryMatcher(matrix, ids, names)
+    encodings = dict(zip(ids, matrix))
+    for _ in range(20):
+        query = matrix[rng.integers(len(ids))] + rng.normal(scale=0.02, size=ENCODING_DIM)
+        assert_same(gallery, encodings, query)
+
+
+def test_match_respects_tolerance():
+    gallery = GalleryMatcher(np.zeros((1, ENCODING_DIM)), [1], ['a'])
+    query = np.full(ENCODING_DIM, 0.1)  # jarak = 0.1 * sqrt(128) ~ 1.13
+    assert gallery.match(query, tolerance=1.0) == []
+    assert gallery.match(query, tolerance=1.2)[0]['id_wbs'] == 1
+
+
+def test_with_updates_equals_brute_force():
+    rng = np.random.default_rng(2)
+    matrix, ids, names = random_gallery(rng, 50)
+    gallery = GalleryMatcher(matrix, ids, names)
+    encodings = dict(zip(ids, matrix))
+
+    upserts = [(5, 'baru5', rng.normal(scale=0.1, size=ENCODING_DIM)),       # ganti baris lama
+               (100, 'baru100', rng.normal(scale=0.1, size=ENCODING_DIM))]   # baris baru
+    removals = [7, 8]
+    updated = gallery.with_updates(upserts, removals)
+    for id_wbs, _, enc in upserts:
+        encodings[id_wbs] = enc
+    for id_wbs in removals:
+        del encodings[id_wbs]
+
+    assert len(updated) == len(encodings)
+    assert len(gallery) == 50  # copy-on-write: galeri lama tidak berubah
+    for id_wbs in (5, 100, 1):
+        assert_same(updated, encodings, encodings[id_wbs])
+    assert all(m['id_wbs'] not in removals for m in updated.match(matrix[6], tolerance=10, top_k=60))
+
+
+def test_with_updates_duplicate_ids_last_wins():
+    gallery = GalleryMatcher(np.zeros((1, ENCODING_DIM)), [1], ['a'])
+    updated = gallery.with_updates([(2, 'b', np.ones(ENCODING_DIM)),
+                                    (2, 'b2', np.full(ENCODING_DIM, 2.0))])
+    assert updated.ids == [1, 2]
+    assert updated.matrix.shape == (2, ENCODING_DIM)
+    assert np.all(np.isfinite(updated.sq_norms))
+    match = updated.match(np.full(ENCODING_DIM, 2.0), tolerance=0.1)
+    assert [(m['id_wbs'], m['nama']) for m in match] == [(2, 'b2')]
+
+
+def test_removed_then_reenrolled():
+    gallery = GalleryMatcher(np.eye(2, ENCODING_DIM), [1, 2], ['a', 'b'])
+    removed = gallery.with_updates(removals=[1])
+    assert len(removed) == 1
+    assert removed.match(np.eye(1, ENCODING_DIM)[0], tolerance=0.5) == []
+    back = removed.with_updates([(1, 'a', np.eye(1, ENCODING_DIM)[0])])
+    assert len(back) == 2
+    assert back.match(np.eye(1, ENCODING_DIM)[0], tolerance=0.5)[0]['id_wbs'] == 1
+
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test_compact_keeps_matches(dtype):
+    rng = np.random.default_rng(3)
+    matrix, ids, names = random_gallery(rng, 30)
+    gallery = GalleryMatcher(matrix, ids, names, dtype=dtype).with_updates(removals=[3, 4, 5])
+    compact = gallery.compact()
+    assert len(compact) == len(gallery) == 27
+    query = matrix[10]
+    assert ([m['id_wbs'] for m in compact.match(query, tolerance=2, top_k=5)]
+            == [m['id_wbs'] for m in gallery.match(query, tolerance=2, top_k=5)])
+
+
+def per_query(gallery, queries, tolerance, use_templates=False):
+    """Hasil acuan ``match_many``: ``match``/``match_templates`` per wajah."""
+    hasil = []
+    for q in queries:
+        found = (gallery.match_templates(q, tolerance=tolerance) if use_templates
+                 else gallery.match(q, tolerance=tolerance))
+        hasil.append((found[0]['id_wbs'], found[0]['distance']) if found else None)
+    return hasil
+
+
+def assert_many_same(got, expected):
+    assert [m and m['id_wbs'] for m in got] == [e and e[0] for e in expected]
+    for m, e in zip(got, expected):
+        if m is not None:
+            assert m['distance'] == pytest.approx(e[1], rel=1e-9, abs=1e-12)
+
+
+def test_match_many_equals_match_per_query():
+    rng = np.random.default_rng(4)
+    matrix, ids, names = random_gallery(rng, 100)
+    gallery = GalleryMatcher(matrix, ids, names)
+    rows = rng.choice(len(ids), size=6, replace=False)
+    queries = [matrix[r] + rng.normal(scale=0.02, size=ENCODING_DIM) for r in rows]
+    queries.append(np.full(ENCODING_DIM, 5.0))  # tidak dikenali
+    got = gallery.match_many(queries, tolerance=0.6)
+    assert_many_same(got, per_query(gallery, queries, 0.6))
+    assert got[-1] is None
+
+
+def test_match_many_with_samples_equals_match_templates():
+    rng = np.random.default_rng(5)
+    matrix, ids, names = random_gallery(rng, 40)
+    sample_ids = [i for i in ids for _ in range(3)]
+    samples = SampleStore(np.repeat(matrix, 3, axis=0) + rng.normal(scale=0.05, size=(120, ENCODING_DIM)),
+                          sample_ids, dtype=np.float64)
+    gallery = GalleryMatcher(matrix, ids, names, samples=samples)
+    queries = [samples.matrix[r] + rng.normal(scale=0.01, size=ENCODING_DIM) for r in (0, 31, 62, 119)]
+    got = gallery.match_many(queries, tolerance=0.6)
+    assert_many_same(got, per_query(gallery, queries, 0.6, use_templates=True))
+    assert all('centroid_distance' in m for m in got)
+
+
+def test_match_many_tolerance_edges():
+    gallery = GalleryMatcher(np.zeros((1, ENCODING_DIM)), [1], ['a'])
+    tepat = np.eye(1, ENCODING_DIM)[0] * 0.5          # jarak tepat 0.5
+    dekat = np.full(ENCODING_DIM, 0.1)                # jarak ~1.1314
+    for query, tolerance in ((tepat, 0.5), (tepat, 0.4999), (dekat, 1.13), (dekat, 1.14)):
+        assert_many_same(gallery.match_many([query], tolerance=tolerance),
+                         per_query(gallery, [query], tolerance))
+    assert gallery.match_many([tepat], tolerance=0.5)[0]['distance'] == pytest.approx(0.5)
+    assert gallery.match_many([tepat], tolerance=0.4999) == [None]
+
+
+def test_match_many_empty_input():
+    rng = np.random.default_rng(6)
+    gallery = GalleryMatcher(*random_gallery(rng, 5))
+    assert gallery.match_many([]) == []
+    assert gallery.match_many(np.empty((0, ENCODING_DIM))) == []
+    assert GalleryMatcher.empty().match_many([np.zeros(ENCODING_DIM)] * 2) == [None, None]
+
+
+def test_match_many_one_face_per_wbs():
+    gallery = GalleryMatcher(np.eye(2, ENCODING_DIM), [1, 2], ['a', 'b'])
+    dekat = np.eye(1, ENCODING_DIM)[0] * 0.95       # paling mirip WBS 1
+    kedua = np.eye(1, ENCODING_DIM)[0] * 0.7        # juga paling mirip WBS 1, tapi lebih jauh
+    got = gallery.match_many([kedua, dekat], tolerance=1.5)
+    assert [m['id_wbs'] for m in got] == [2, 1]
+    assert got[0]['distance'] == pytest.approx(np.sqrt(0.7 ** 2 + 1))
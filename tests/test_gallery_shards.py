@@ -0,0 +1,99 @@
+import numpy as np
+
+from gallery import ENCODING_DIM, GalleryMatcher
+from gallery_shards import GalleryShards
+
+
+def make_gallery(n):
+    ids = list(range(1, n + 1))
+    return GalleryMatcher(np.eye(n, ENCODING_DIM), ids, [f"wbs{i}" for i in ids])
+
+
+class Roster:
+    """``load_ids`` palsu: anggota per key, mencatat setiap pemanggilan."""
+
+    def __init__(self, members):
+        self.members = members
+        self.calls = []
+
+    def __call__(self, key):
+        self.calls.append(key)
+        return self.members.get(key)
+
+
+def test_partition_only_contains_roster():
+    gallery = make_gallery(6)
+    roster = Roster({'a': {1, 2}})
+    shards = GalleryShards(roster)
+    part = shards.get('a', gallery)
+    assert sorted(part.ids) == [1, 2]
+    assert part.match(np.eye(1, ENCODING_DIM, 4)[0], tolerance=0.1) == []
+    assert shards.get('a', gallery) is part
+    assert roster.calls == ['a']
+    assert shards.metrics()['hits'] == 1
+
+
+def test_key_without_roster_uses_full_gallery():
+    gallery = make_gallery(3)
+    shards = GalleryShards(Roster({}))
+    assert shards.get('tanpa-lokasi', gallery) is gallery
+    assert shards.metrics()['bytes'] == 0
+
+
+def test_new_full_gallery_rebuilds_without_reload():
+    gallery = make_gallery(4)
+    roster = Roster({'a': {1, 4}})
+    shards = GalleryShards(roster)
+    shards.get('a', gallery)
+    updated = gallery.with_updates([(4, 'baru', np.full(ENCODING_DIM, 0.5))])
+    part = shards.get('a', updated)
+    assert roster.calls == ['a']
+    assert shards.metrics()['rebuilds'] == 1
+    assert part.match(np.full(ENCODING_DIM, 0.5), tolerance=0.1)[0]['nama'] == 'baru'
+
+
+def test_invalidate_reloads_members():
+    gallery = make_gallery(4)
+    roster = Roster({'a': {1}})
+    shards = GalleryShards(roster)
+    shards.get('a', gallery)
+    roster.members['a'] = {1, 2}
+    shards.invalidate()
+    assert sorted(shards.get('a', gallery).ids) == [1, 2]
+    assert roster.calls == ['a', 'a']
+
+
+def test_ttl_reloads_members():
+    gallery = make_gallery(2)
+    roster = Roster({'a': {1}})
+    shards = GalleryShards(roster, ttl=0.0)
+    shards.get('a', gallery)
+    shards.get('a', gallery)
+    assert roster.calls == ['a', 'a']
+
+
+def test_lru_eviction_by_bytes():
+    gallery = make_gallery(6)
+    roster = Roster({'a': {1, 2}, 'b': {3, 4}, 'c': {5, 6}})
+    satu = gallery.subset({1, 2}).nbytes
+    shards = GalleryShards(roster, max_bytes=2 * satu)
+    shards.get('a', gallery)
+    shards.get('b', gallery)
+    shards.get('a', gallery)      # a baru dipakai; b yang paling lama
+    shards.get('c', gallery)
+    assert shards.metrics()['evictions'] == 1
+    shards.get('a', gallery)
+    shards.get('b', gallery)
+    assert roster.calls == ['a', 'b', 'c', 'b']
+
+
+def test_lru_eviction_by_count_for_empty_partitions():
+    gallery = make_gallery(2)
+    roster = Roster({})
+    shards = GalleryShards(roster, max_partitions=2)
+    for key in ('a', 'b', 'c'):
+        shards.get(key, gallery)
+    data = shards.metrics()
+    assert data['size'] == 2 and data['evictions'] == 1
+    shards.get('a', gallery)
+    assert roster.calls == ['a', 'b', 'c', 'a']
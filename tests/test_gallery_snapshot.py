@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+import gallery_snapshot
+from gallery import ENCODING_DIM, GalleryMatcher
+from gallery_snapshot import load_snapshot, write_snapshot
+
+
+def make_gallery(n, seed):
+    rng = np.random.default_rng(seed)
+    ids = list(range(1, n + 1))
+    return GalleryMatcher(rng.normal(scale=0.1, size=(n, ENCODING_DIM)), ids, [f"wbs{i}" for i in ids])
+
+
+def matrix_files(folder):
+    return sorted(name for name in os.listdir(folder) if name.endswith('.npy'))
+
+
+def test_roundtrip_and_old_files_removed(tmp_path):
+    folder = str(tmp_path)
+    write_snapshot(folder, make_gallery(3, 1), 'v1', 3)
+    gallery = make_gallery(4, 2)
+    write_snapshot(folder, gallery, 'v2', 4)
+    assert len(matrix_files(folder)) == 1
+    assert load_snapshot(folder, 'v1', 3) is None
+    loaded = load_snapshot(folder, 'v2', 4)
+    assert loaded.ids == gallery.ids
+    np.testing.assert_allclose(loaded.matrix, gallery.matrix, rtol=1e-6)
+
+
+class InterleavedGallery:
+    """Galeri worker B: worker A menulis snapshot lengkap tepat setelah matriks B tersimpan."""
+
+    def __init__(self, gallery, on_ids):
+        self.matrix = gallery.matrix
+        self.names = gallery.names
+        self.samples = None
+        self._ids = gallery.ids
+        self._on_ids = on_ids
+
+    @property
+    def ids(self):
+        self._on_ids()
+        return self._ids
+
+
+def test_two_writers_keep_each_others_files(tmp_path, monkeypatch):
+    folder = str(tmp_path)
+    pid = {'now': 111}
+    monkeypatch.setattr(gallery_snapshot.os, 'getpid', lambda: pid['now'])
+    write_snapshot(folder, make_gallery(2, 0), 'v0', 2)
+
+    def worker_a_writes():
+        pid['now'] = 111
+        write_snapshot(folder, make_gallery(3, 1), 'v1', 3)
+        pid['now'] = 222
+
+    pid['now'] = 222
+    gallery_b = make_gallery(3, 2)
+    write_snapshot(folder, InterleavedGallery(gallery_b, worker_a_writes), 'v1', 3)
+
+    # Snapshot seq 1 terhapus; file seq 2 milik kedua worker tetap ada
+    assert matrix_files(folder) == ['gallery_000002_111.npy', 'gallery_000002_222.npy']
+    loaded = load_snapshot(folder, 'v1', 3)
+    assert loaded is not None
+    np.testing.assert_allclose(loaded.matrix, gallery_b.matrix, rtol=1e-6)
@@ -0,0 +1,41 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import numpy as np
+import pytest
+
+import inference_pool
+from inference_pool import InferenceBusy, InferencePool
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    lepas = threading.Event()
+
+    def worker_call(op, shm_name, shape, kwargs):
+        # Pengganti worker dlib: menunggu sampai tes melepasnya
+        lepas.wait(timeout=5)
+        return (op, shape), {'detect': 0.0}
+
+    monkeypatch.setattr(inference_pool, '_worker_call', worker_call)
+    pool = InferencePool(workers=1, max_pending=1, timeout=0.1)
+    pool._executor = ThreadPoolExecutor(max_workers=1)
+    pool.lepas = lepas
+    yield pool
+    lepas.set()
+    pool._executor.shutdown(wait=True)
+
+
+def test_timed_out_call_keeps_slot_until_worker_finishes(pool):
+    rgb = np.zeros((8, 8, 3), dtype=np.uint8)
+    with pytest.raises(FutureTimeout):
+        pool.detect_faces(rgb)
+    # Worker masih sibuk dengan request yang timeout: antrean tetap dianggap penuh
+    with pytest.raises(InferenceBusy):
+        pool.detect_faces(rgb)
+    assert pool.metrics()['rejected'] == 1
+
+    pool.lepas.set()
+    pool._executor.submit(lambda: None).result(timeout=5)
+    assert pool.detect_faces(rgb) == ('detect', (8, 8, 3))
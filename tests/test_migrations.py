@@ -0,0 +1,41 @@
+import pytest
+
+import migrations
+from bench import sqlite_db
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / 'migrasi.sqlite')
+    sqlite_db.create_schema(path)
+    db = sqlite_db.Connection(path)
+    yield db
+    db.close()
+
+
+def test_failed_step_reports_version_and_resumes(db, monkeypatch):
+    jalan = []
+    rusak = {'aktif': True}
+
+    def ok(name):
+        def step(db, cursor):
+            jalan.append(name)
+        return step
+
+    def gagal(db, cursor):
+        if rusak['aktif']:
+            raise RuntimeError('tabel rekap belum ada')
+        jalan.append('b')
+
+    monkeypatch.setattr(migrations, 'MIGRATIONS', [(1, 'a', ok('a')), (2, 'b', gagal), (3, 'c', ok('c'))])
+
+    with pytest.raises(migrations.MigrationError) as info:
+        migrations.migrate(db)
+    assert (info.value.version, info.value.name) == (2, 'b')
+    assert isinstance(info.value.cause, RuntimeError)
+    assert migrations.current_version(db.cursor()) == 1
+
+    rusak['aktif'] = False
+    assert migrations.migrate(db) == [2, 3]
+    assert jalan == ['a', 'b', 'c']
+    assert migrations.migrate(db) == []